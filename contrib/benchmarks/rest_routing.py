@@ -0,0 +1,52 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the routing of REST requests.
+
+Compare routing through the cached dispatch tables with building them on
+every request, as was originally done.  Set the $MAILMAN_CONFIG_FILE
+environment variable if needed, and run this with:
+
+    python contrib/benchmarks/rest_routing.py
+"""
+
+import timeit
+
+from mailman.core.initialize import initialize
+
+
+def main(number=2000):
+    initialize()
+    # The resource tree can only be imported once Mailman is configured.
+    from mailman.rest.root import Root
+    from mailman.rest.wsgiapp import ObjectRouter
+    router = ObjectRouter(Root())
+    uri = '/3.1/system/configuration/mailman'
+    def uncached():                                         # noqa: E306
+        router._tables.clear()
+        router.find(uri)
+    router.find(uri)
+    cached = timeit.timeit(lambda: router.find(uri), number=number)
+    uncached = timeit.timeit(uncached, number=number)
+    print('{} requests for {}'.format(number, uri))
+    print('uncached: {:.1f} us per request'.format(uncached / number * 1e6))
+    print('cached:   {:.1f} us per request'.format(cached / number * 1e6))
+    print('speedup: {:.1f}x'.format(uncached / cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the organizational domain lookups of the DMARC rule.
+
+Compare walking the suffix trie with the original linear search through the
+rules of the shipped public suffix list.  Run this from a development
+environment with:
+
+    python contrib/benchmarks/suffix_trie.py
+"""
+
+import timeit
+
+from mailman.rules import dmarc
+from mailman.rules.tests.test_dmarc import (
+    TestOrganizationalDomainTrie, _linear_organizational_domain)
+from pkg_resources import resource_filename
+
+
+def main(number=100):
+    dmarc.parse_suffix_list(resource_filename(
+        'mailman.rules.data', dmarc.LOCAL_FILE_NAME))
+    # Flatten the trie into the original map of rules to exceptions.
+    rules = {}
+    def flatten(node, labels):                              # noqa: E306
+        for label, child in node.items():
+            if label == dmarc.RULE:
+                rules['.'.join(labels)] = child
+            else:
+                flatten(child, labels + [label])
+    flatten(dmarc.suffix_cache, [])
+    domains = TestOrganizationalDomainTrie.domains
+    linear = timeit.timeit(
+        lambda: [_linear_organizational_domain(rules, domain)
+                 for domain in domains],
+        number=number)
+    trie = timeit.timeit(
+        lambda: [dmarc.get_organizational_domain(domain)
+                 for domain in domains],
+        number=number)
+    lookups = number * len(domains)
+    print('{} rules, {} lookups'.format(len(rules), lookups))
+    print('linear: {:.1f} us per lookup'.format(linear / lookups * 1e6))
+    print('trie:   {:.1f} us per lookup'.format(trie / lookups * 1e6))
+    print('speedup: {:.0f}x'.format(linear / trie))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Feed the change log from the list lifecycle and membership events."""
+
+from mailman.interfaces.changes import ChangeAction, ChangeKind, IChangeLog
+from mailman.interfaces.listmanager import ListCreatedEvent, ListDeletingEvent
+from mailman.interfaces.member import (
+    MembershipChangeEvent, SubscriptionEvent)
+from public import public
+from zope.component import getUtility
+
+
+def _action(created):
+    return (ChangeAction.created if created else ChangeAction.deleted)
+
+
+@public
+def handle_ListEvent(event):
+    if not isinstance(event, (ListCreatedEvent, ListDeletingEvent)):
+        return
+    list_id = event.mailing_list.list_id
+    getUtility(IChangeLog).record(
+        ChangeKind.mailing_list,
+        _action(isinstance(event, ListCreatedEvent)),
+        list_id, list_id)
+
+
+@public
+def handle_MembershipChangeEvent(event):
+    if not isinstance(event, MembershipChangeEvent):
+        return
+    member = event.member
+    getUtility(IChangeLog).record(
+        ChangeKind.member,
+        _action(isinstance(event, SubscriptionEvent)),
+        event.mlist.list_id, member.member_id.hex,
+        email=member.address.email, role=member.role)
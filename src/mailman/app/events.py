@@ -17,9 +17,11 @@
 
 """Global events."""
 
-from mailman.app import domain, membership, moderator, subscriptions
+from mailman.app import (
+    changes, domain, membership, moderator, subscriptions)
 from mailman.core import i18n, switchboard
 from mailman.languages import manager as language_manager
+from mailman.rest import cache as rest_cache
 from mailman.styles import manager as style_manager
 from mailman.utilities import passwords
 from public import public
@@ -30,12 +32,19 @@ from zope import event
 def initialize():
     """Initialize global event subscribers."""
     event.subscribers.extend([
+        changes.handle_ListEvent,
+        changes.handle_MembershipChangeEvent,
         domain.handle_DomainDeletingEvent,
         i18n.handle_ConfigurationUpdatedEvent,
         language_manager.handle_ConfigurationUpdatedEvent,
         membership.handle_SubscriptionEvent,
         moderator.handle_ListDeletingEvent,
         passwords.handle_ConfigurationUpdatedEvent,
+        rest_cache.handle_DomainCreatedEvent,
+        rest_cache.handle_DomainDeletedEvent,
+        rest_cache.handle_ListCreatedEvent,
+        rest_cache.handle_ListDeletedEvent,
+        rest_cache.handle_MembershipChangeEvent,
         style_manager.handle_ConfigurationUpdatedEvent,
         subscriptions.handle_ListDeletingEvent,
         subscriptions.handle_SubscriptionConfirmationNeededEvent,
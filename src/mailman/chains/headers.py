@@ -33,6 +33,8 @@ from zope.interface import implementer
 
 log = logging.getLogger('mailman.error')
 _RULE_COUNTER = count(1)
+# The compiled header matcher of each mailing list, by list-id.
+_matchers = {}
 
 
 def _make_rule_name(suffix):
@@ -64,9 +66,10 @@ def make_link(header, pattern, chain=None, suffix=None):
     :rtype: `ILink`
     """
     rule_name = _make_rule_name(suffix)
-    if rule_name in config.rules:
-        rule = config.rules[rule_name]
-    else:
+    rule = config.rules.get(rule_name)
+    if rule is None or (rule.header, rule.pattern) != (header, pattern):
+        # The header match at this position has changed.
+        config.rules.pop(rule_name, None)
         rule = HeaderMatchRule(header, pattern, suffix)
     if chain is None:
         return Link(rule)
@@ -95,32 +98,130 @@ class HeaderMatchRule:
                 self.name, self.header, self.pattern))
         config.rules[self.name] = self
 
+        # Compile the pattern once.  An invalid pattern is logged whenever
+        # the rule is checked.
+        try:
+            self._regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as error:
+            self._regex = None
+            self._error = error
+
+    def _search(self, msg):
+        # Return the first header value matching the pattern, or None.
+        for value in _collect_headers(msg, [self.header.lower()]).get(
+                self.header.lower(), []):
+            if self._regex.search(value) is not None:
+                return value
+        return None
+
     def check(self, mlist, msg, msgdata):
         """See `IRule`."""
-        # Collect all the headers in all subparts.
-        headers = []
-        for p in msg.walk():
-            headers.extend(p.get_all(self.header, []))
-        for value in headers:
-            if isinstance(value, Header):
-                value = value.encode()
-            try:
-                mo = re.search(self.pattern, value, re.IGNORECASE)
-            except re.error as error:
-                log.error(
-                    "Invalid regexp '{}' in header_matches for {}: {}".format(
-                        self.pattern, mlist.list_id, error.msg))
-                return False
-            else:
-                if mo:
-                    msgdata['moderation_sender'] = msg.sender
-                    with _.defer_translation():
-                        # This will be translated at the point of use.
-                        msgdata.setdefault('moderation_reasons', []).append(
-                            (_('Header "{}" matched a header rule'),
-                             str(value)))
-                    return True
-        return False
+        if self._regex is None:
+            log.error(
+                "Invalid regexp '{}' in header_matches for {}: {}".format(
+                    self.pattern, mlist.list_id, self._error.msg))
+            return False
+        # Use the list's header matcher when this message is being run
+        # through the header-match chain; it tests all the rules at once.
+        rules, matcher = _matchers.get(mlist.list_id, ((), None))
+        if self in rules:
+            value = matcher.search(msg).get(self.name)
+        else:
+            value = self._search(msg)
+        if value is None:
+            return False
+        msgdata['moderation_sender'] = msg.sender
+        with _.defer_translation():
+            # This will be translated at the point of use.
+            msgdata.setdefault('moderation_reasons', []).append(
+                (_('Header "{}" matched a header rule'), str(value)))
+        return True
+
+
+def _collect_headers(msg, names):
+    # Collect the values of the named headers in all subparts, in one walk
+    # over the message.
+    headers = {}
+    for part in msg.walk():
+        for name, value in part.items():
+            name = name.lower()
+            if name in names:
+                if isinstance(value, Header):
+                    value = value.encode()
+                headers.setdefault(name, []).append(value)
+    return headers
+
+
+class _HeaderMatcher:
+    """All the header match rules of a mailing list, compiled together.
+
+    The patterns for each header are combined into one regular expression
+    which weeds out the header values matching none of them, so that in the
+    common case each value is searched only once.
+    """
+
+    def __init__(self, rules):
+        self._rules = set()
+        # header -> (combined regex or None, all rules, separate rules)
+        self._headers = {}
+        by_header = {}
+        for rule in rules:
+            self._rules.add(rule)
+            if rule._regex is not None:
+                by_header.setdefault(rule.header.lower(), []).append(rule)
+        for header, header_rules in by_header.items():
+            # Patterns with groups (and thus maybe backreferences) or any
+            # extension notation, such as inline flags, could change meaning
+            # when combined with the others.
+            combinable = [
+                rule.pattern for rule in header_rules
+                if rule._regex.groups == 0 and '(?' not in rule.pattern
+                ]
+            separate = [
+                rule for rule in header_rules
+                if rule.pattern not in combinable
+                ]
+            combined = (re.compile(
+                '|'.join('(?:{})'.format(pattern) for pattern in combinable),
+                re.IGNORECASE)
+                if len(combinable) > 0 else None)
+            self._headers[header] = (combined, header_rules, separate)
+        self.forget()
+
+    def __contains__(self, rule):
+        return rule in self._rules
+
+    def forget(self):
+        """Forget the results for the last message searched."""
+        self._msg = None
+        self._hits = None
+
+    def search(self, msg):
+        """Map the names of the rules matching the message to the values.
+
+        The results are kept until the next message is searched, or they
+        are forgotten.
+        """
+        if self._msg is not msg:
+            self._msg = msg
+            self._hits = self._search(msg)
+        return self._hits
+
+    def _search(self, msg):
+        hits = {}
+        headers = _collect_headers(msg, self._headers)
+        for header, values in headers.items():
+            combined, header_rules, separate = self._headers[header]
+            for value in values:
+                if combined is None or combined.search(value) is None:
+                    candidates = separate
+                else:
+                    candidates = header_rules
+                for rule in candidates:
+                    if (rule.name not in hits and
+                            rule._regex.search(value) is not None):
+                        hits[rule.name] = value
+        return hits
 
 
 @public
@@ -155,9 +256,11 @@ class HeaderMatchChain(Chain):
             if rule_name.startswith('header-match-'):
                 del config.rules[rule_name]
         self._extended_links = []
+        _matchers.clear()
 
     def get_links(self, mlist, msg, msgdata):
         """See `IChain`."""
+        links = []
         # First return all the configuration file links.
         for index, line in enumerate(
                 config.antispam.header_checks.splitlines()):
@@ -169,19 +272,39 @@ class HeaderMatchChain(Chain):
                           'contains bogus line: {}'.format(line))
                 continue
             rule_name = 'config-{}'.format(index)
-            yield make_link(parts[0], parts[1].lstrip(), suffix=rule_name)
+            links.append(
+                make_link(parts[0], parts[1].lstrip(), suffix=rule_name))
         # Then return all the explicitly added links.
-        yield from self._extended_links
+        links.extend(self._extended_links)
         # If any of the above rules matched, they will have deferred their
         # action until now, so jump to the chain defined in the configuration
         # file.  For security considerations, this takes precedence over
         # list-specific matches.
-        yield Link('any', LinkAction.jump, config.antispam.jump_chain)
+        any_link = Link('any', LinkAction.jump, config.antispam.jump_chain)
         # Then return all the list-specific header matches.
+        list_links = []
         for index, entry in enumerate(mlist.header_matches):
             # Jump to the default antispam chain if the entry chain is None.
             chain = (config.antispam.jump_chain
                      if entry.chain is None
                      else entry.chain)
             rule_name = '{}-{}'.format(mlist.list_id, index)
-            yield make_link(entry.header, entry.pattern, chain, rule_name)
+            list_links.append(
+                make_link(entry.header, entry.pattern, chain, rule_name))
+        # Compile all the rules into the list's header matcher, unless they
+        # are the same as the last time.
+        rules = tuple(link.rule for link in links + list_links)
+        rules_and_matcher = _matchers.get(mlist.list_id)
+        if rules_and_matcher is None or rules_and_matcher[0] != rules:
+            rules_and_matcher = (rules, _HeaderMatcher(rules))
+            _matchers[mlist.list_id] = rules_and_matcher
+        matcher = rules_and_matcher[1]
+        matcher.forget()
+        try:
+            yield from links
+            yield any_link
+            yield from list_links
+        finally:
+            # Don't hold on to the message once the chain is done with it,
+            # or has jumped to another chain.
+            matcher.forget()
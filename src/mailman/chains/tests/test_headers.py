@@ -18,10 +18,12 @@
 """Test the header chain."""
 
 import unittest
+import warnings
 
 from email import message_from_bytes
 from mailman.app.lifecycle import create_list
-from mailman.chains.headers import HeaderMatchRule, make_link
+from mailman.chains.headers import (
+    HeaderMatchRule, _collect_headers, _matchers, make_link)
 from mailman.config import config
 from mailman.core.chains import process
 from mailman.email.message import Message
@@ -32,6 +34,7 @@ from mailman.testing.helpers import (
     LogFileMark, configuration, event_subscribers,
     specialized_message_from_string as mfs)
 from mailman.testing.layers import ConfigLayer
+from unittest.mock import patch
 
 
 class TestHeaderChain(unittest.TestCase):
@@ -425,3 +428,96 @@ body
         self.assertEqual(msgdata['moderation_reasons'],
                          [('Header "{}" matched a header rule',
                            'Bad subject')])
+
+
+class TestHeaderMatcher(unittest.TestCase):
+    """Test the compiled header matcher of the header chain."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._mlist = create_list('test@example.com')
+        self._header_matches = IHeaderMatchList(self._mlist)
+        self._msg = mfs("""\
+From: anne@example.com
+To: test@example.com
+Subject: Cheap pills
+X-Spam-Score: ***
+Message-ID: <ant>
+
+body
+""")
+
+    def _process(self, msg):
+        msgdata = {}
+        with event_subscribers(lambda event: None):
+            process(self._mlist, msg, msgdata, start_chain='header-match')
+        return msgdata
+
+    @configuration('antispam', header_checks="""
+    X-Spam-Score: [*]{3,}
+    Subject: pills
+    Subject: viagra
+    """, jump_chain='discard')
+    def test_headers_collected_once(self):
+        for i in range(50):
+            self._header_matches.append('Subject', 'spam-{}'.format(i))
+        with patch('mailman.chains.headers._collect_headers',
+                   wraps=_collect_headers) as collect:
+            msgdata = self._process(self._msg)
+        self.assertEqual(collect.call_count, 1)
+        # Both matching configuration rules are recorded.
+        self.assertEqual(msgdata['rule_hits'], [
+            'header-match-config-1', 'header-match-config-2'])
+        self.assertEqual(msgdata['moderation_reasons'], [
+            ('Header "{}" matched a header rule', '***'),
+            ('Header "{}" matched a header rule', 'Cheap pills'),
+            ])
+
+    def test_changed_header_matches(self):
+        self._header_matches.append('Subject', 'cheap', 'discard')
+        msgdata = self._process(self._msg)
+        self.assertEqual(msgdata['rule_hits'],
+                         ['header-match-test.example.com-0'])
+        self._header_matches.remove('Subject', 'cheap')
+        self._header_matches.append('Subject', 'expensive', 'discard')
+        msgdata = self._process(self._msg)
+        self.assertEqual(msgdata['rule_hits'], [])
+
+    def test_pattern_with_backreference(self):
+        # Patterns with groups are tested on their own.
+        self._header_matches.append('Subject', '(l)\\1', 'discard')
+        self._header_matches.append('Subject', 'bargain', 'discard')
+        self.assertEqual(self._process(self._msg)['rule_hits'],
+                         ['header-match-test.example.com-0'])
+        del self._msg['Subject']
+        self._msg['Subject'] = 'Cheap bargain'
+        self.assertEqual(self._process(self._msg)['rule_hits'],
+                         ['header-match-test.example.com-1'])
+
+    def test_pattern_with_inline_flags(self):
+        # Patterns with inline flags are tested on their own, since the flags
+        # must stay at the start of the pattern.
+        self._header_matches.append('Subject', '(?i)cheap', 'discard')
+        self._header_matches.append('Subject', 'costly', 'discard')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertEqual(self._process(self._msg)['rule_hits'],
+                             ['header-match-test.example.com-0'])
+            del self._msg['Subject']
+            self._msg['Subject'] = 'Costly pills'
+            self.assertEqual(self._process(self._msg)['rule_hits'],
+                             ['header-match-test.example.com-1'])
+
+    def test_message_forgotten(self):
+        # The header matcher doesn't keep the message once the chain is done
+        # with it, whether the chain ran to its end or jumped elsewhere.
+        self._header_matches.append('Subject', 'expensive', 'discard')
+        self._process(self._msg)
+        matcher = _matchers[self._mlist.list_id][1]
+        self.assertIsNone(matcher._msg)
+        self._header_matches.append('Subject', 'cheap', 'discard')
+        self.assertEqual(self._process(self._msg)['rule_hits'],
+                         ['header-match-test.example.com-1'])
+        matcher = _matchers[self._mlist.list_id][1]
+        self.assertIsNone(matcher._msg)
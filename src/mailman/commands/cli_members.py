@@ -27,7 +27,8 @@ from mailman.interfaces.command import ICLISubCommand
 from mailman.interfaces.listmanager import IListManager
 from mailman.interfaces.member import (
     AlreadySubscribedError, DeliveryMode, DeliveryStatus, MemberRole)
-from mailman.interfaces.subscriptions import RequestRecord
+from mailman.interfaces.subscriptions import (
+    ISubscriptionService, RequestRecord)
 from mailman.utilities.options import I18nCommand
 from operator import attrgetter
 from public import public
@@ -36,7 +37,10 @@ from zope.interface import implementer
 
 
 def display_members(ctx, mlist, role, regular, digest, nomail, outfp):
-    # Which type of digest recipients should we display?
+    # Which delivery modes should we display?
+    delivery_modes = None
+    if regular:
+        delivery_modes = {DeliveryMode.regular}
     if digest == 'any':
         digest_types = [
             DeliveryMode.plaintext_digests,
@@ -48,7 +52,11 @@ def display_members(ctx, mlist, role, regular, digest, nomail, outfp):
     else:
         # Don't filter on digest type.
         pass
+    if digest is not None:
+        delivery_modes = (set(digest_types) if delivery_modes is None
+                          else delivery_modes.intersection(digest_types))
     # Which members with delivery disabled should we display?
+    status_types = None
     if nomail is None:
         # Don't filter on delivery status.
         pass
@@ -74,31 +82,38 @@ def display_members(ctx, mlist, role, regular, digest, nomail, outfp):
     if role is None:
         # By default, filter on members.
         roster = mlist.members
+        roles = [MemberRole.member]
     elif role == 'administrator':
         roster = mlist.administrators
+        roles = [MemberRole.owner, MemberRole.moderator]
     elif role == 'any':
         roster = mlist.subscribers
+        roles = list(MemberRole)
     else:
         # click should enforce a valid member role.
         roster = mlist.get_roster(MemberRole[role])
+        roles = [MemberRole[role]]
     # Print; outfp will be either the file or stdout to print to.
-    addresses = list(roster.addresses)
-    if len(addresses) == 0:
+    if roster.member_count == 0:
         print(_('$mlist.list_id has no members'), file=outfp)
         return
+    if delivery_modes is None and status_types is None:
+        addresses = roster.addresses
+    elif delivery_modes is not None and len(delivery_modes) == 0:
+        # Both --regular and --digest were given.
+        addresses = []
+    else:
+        # Let the database pick out the members with the requested delivery
+        # mode and status.
+        service = getUtility(ISubscriptionService)
+        addresses = set()
+        for member_role in roles:
+            addresses.update(
+                member.address for member in service.find_members(
+                    list_id=mlist.list_id, role=member_role,
+                    delivery_mode=delivery_modes,
+                    delivery_status=status_types))
     for address in sorted(addresses, key=attrgetter('email')):
-        if regular:
-            member = roster.get_member(address.email)
-            if member.delivery_mode != DeliveryMode.regular:
-                continue
-        if digest is not None:
-            member = roster.get_member(address.email)
-            if member.delivery_mode not in digest_types:
-                continue
-        if nomail is not None:
-            member = roster.get_member(address.email)
-            if member.delivery_status not in status_types:
-                continue
         print(formataddr((address.display_name, address.original_email)),
               file=outfp)
 
@@ -0,0 +1,79 @@
+"""Address search index
+
+Revision ID: 227c4f1d4a85
+Revises: 3f31035ed0d7
+Create Date: 2017-11-02 10:12:37.418219
+
+Add an indexed domain column to the address table, and a table of the
+trigrams of every address, and fill them in for the existing addresses.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import SAUnicode
+from mailman.utilities.string import trigrams
+
+
+# Revision identifiers, used by Alembic.
+revision = '227c4f1d4a85'
+down_revision = '3f31035ed0d7'
+
+
+# The number of trigrams inserted at once.
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('address') as batch_op:
+        batch_op.add_column(sa.Column('domain', SAUnicode(), nullable=True))
+        batch_op.create_index(
+            op.f('ix_address_domain'), ['domain'], unique=False)
+    trigram_table = op.create_table(
+        'addresstrigram',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('address_id', sa.Integer(), nullable=True),
+        sa.Column('trigram', SAUnicode(), nullable=True),
+        sa.ForeignKeyConstraint(['address_id'], ['address.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        op.f('ix_addresstrigram_address_id'), 'addresstrigram',
+        ['address_id'], unique=False)
+    op.create_index(
+        op.f('ix_addresstrigram_trigram'), 'addresstrigram',
+        ['trigram'], unique=False)
+    # Don't import the table definition from the models, it may break this
+    # migration when the model is updated in the future (see the Alembic doc).
+    address_table = sa.sql.table(
+        'address',
+        sa.sql.column('id', sa.Integer),
+        sa.sql.column('email', SAUnicode),
+        sa.sql.column('domain', SAUnicode),
+        )
+    connection = op.get_bind()
+    rows = []
+    for address_id, email in connection.execute(
+            sa.select([address_table.c.id, address_table.c.email])
+            ).fetchall():
+        connection.execute(address_table.update().where(
+            address_table.c.id == address_id).values(
+            domain=email.rpartition('@')[2]))
+        rows.extend(dict(address_id=address_id, trigram=trigram)
+                    for trigram in trigrams(email))
+        if len(rows) >= BATCH_SIZE:
+            connection.execute(trigram_table.insert(), rows)
+            rows = []
+    if len(rows) > 0:
+        connection.execute(trigram_table.insert(), rows)
+
+
+def downgrade():
+    op.drop_index(
+        op.f('ix_addresstrigram_trigram'), table_name='addresstrigram')
+    op.drop_index(
+        op.f('ix_addresstrigram_address_id'), table_name='addresstrigram')
+    op.drop_table('addresstrigram')
+    with op.batch_alter_table('address') as batch_op:
+        batch_op.drop_index(op.f('ix_address_domain'))
+        batch_op.drop_column('domain')
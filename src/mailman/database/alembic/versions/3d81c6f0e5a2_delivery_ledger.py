@@ -0,0 +1,43 @@
+"""Delivery ledger
+
+Revision ID: 3d81c6f0e5a2
+Revises: b7c3e94a1f20
+Create Date: 2017-11-23 15:42:09.118273
+
+Add the site-wide ledger of the addresses recently sent each message, used to
+deliver crossposted messages once per member.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import SAUnicode
+
+
+# Revision identifiers, used by Alembic.
+revision = '3d81c6f0e5a2'
+down_revision = 'b7c3e94a1f20'
+
+
+def upgrade():
+    op.create_table(
+        'delivery',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id_hash', SAUnicode(), nullable=True),
+        sa.Column('email', SAUnicode(), nullable=True),
+        sa.Column('delivered_on', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        'ix_delivery_message_id_hash_email', 'delivery',
+        ['message_id_hash', 'email'], unique=True)
+    op.create_index(
+        op.f('ix_delivery_delivered_on'), 'delivery', ['delivered_on'],
+        unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_delivery_delivered_on'), table_name='delivery')
+    op.drop_index(
+        'ix_delivery_message_id_hash_email', table_name='delivery')
+    op.drop_table('delivery')
@@ -0,0 +1,44 @@
+"""Change log
+
+Revision ID: 4e747225870f
+Revises: 227c4f1d4a85
+Create Date: 2017-11-09 14:26:05.731942
+
+Add the table of changes to lists, rosters and moderation requests.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import Enum, SAUnicode
+from mailman.interfaces.changes import ChangeAction, ChangeKind
+from mailman.interfaces.member import MemberRole
+from mailman.interfaces.requests import RequestType
+
+
+# Revision identifiers, used by Alembic.
+revision = '4e747225870f'
+down_revision = '227c4f1d4a85'
+
+
+def upgrade():
+    op.create_table(
+        'change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_on', sa.DateTime(), nullable=True),
+        sa.Column('kind', Enum(ChangeKind), nullable=True),
+        sa.Column('action', Enum(ChangeAction), nullable=True),
+        sa.Column('list_id', SAUnicode(), nullable=True),
+        sa.Column('object_id', SAUnicode(), nullable=True),
+        sa.Column('email', SAUnicode(), nullable=True),
+        sa.Column('role', Enum(MemberRole), nullable=True),
+        sa.Column('request_type', Enum(RequestType), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        op.f('ix_change_created_on'), 'change', ['created_on'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_change_created_on'), table_name='change')
+    op.drop_table('change')
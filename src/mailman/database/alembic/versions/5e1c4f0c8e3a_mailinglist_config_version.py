@@ -0,0 +1,28 @@
+"""mailinglist_config_version
+
+Revision ID: 5e1c4f0c8e3a
+Revises: 4e747225870f
+Create Date: 2017-11-14 10:42:31.118204
+
+Add a counter bumped on every write to a mailing list, used to revalidate
+cached copies of the list.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+
+# Revision identifiers, used by Alembic.
+revision = '5e1c4f0c8e3a'
+down_revision = '4e747225870f'
+
+
+def upgrade():
+    op.add_column('mailinglist', sa.Column(
+        'config_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('mailinglist') as batch_op:
+        batch_op.drop_column('config_version')
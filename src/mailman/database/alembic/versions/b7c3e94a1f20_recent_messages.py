@@ -0,0 +1,46 @@
+"""Recent messages
+
+Revision ID: b7c3e94a1f20
+Revises: e2d1f1c5a3b7
+Create Date: 2017-11-22 10:17:38.402915
+
+Add the table of messages recently accepted for each mailing list, used to
+drop duplicate deliveries.  Its index is unique, so that concurrent copies of
+a message are recognized as duplicates.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import SAUnicode
+
+
+# Revision identifiers, used by Alembic.
+revision = 'b7c3e94a1f20'
+down_revision = 'e2d1f1c5a3b7'
+
+
+def upgrade():
+    op.create_table(
+        'recentmessage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('list_id', SAUnicode(), nullable=True),
+        sa.Column('message_id_hash', SAUnicode(), nullable=True),
+        sa.Column('accepted_on', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        'ix_recentmessage_list_id_message_id_hash', 'recentmessage',
+        ['list_id', 'message_id_hash'], unique=True)
+    op.create_index(
+        op.f('ix_recentmessage_accepted_on'), 'recentmessage',
+        ['accepted_on'], unique=False)
+
+
+def downgrade():
+    op.drop_index(
+        op.f('ix_recentmessage_accepted_on'), table_name='recentmessage')
+    op.drop_index(
+        'ix_recentmessage_list_id_message_id_hash',
+        table_name='recentmessage')
+    op.drop_table('recentmessage')
@@ -0,0 +1,75 @@
+"""json_list_settings
+
+Revision ID: c6a2ba9bde52
+Revises: 5e1c4f0c8e3a
+Create Date: 2017-11-16 09:12:47.502391
+
+Store the mailing list settings which used to be pickled as JSON text.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import JSON
+
+
+# Revision identifiers, used by Alembic.
+revision = 'c6a2ba9bde52'
+down_revision = '5e1c4f0c8e3a'
+
+
+COLUMNS = (
+    'accept_these_nonmembers',
+    'discard_these_nonmembers',
+    'hold_these_nonmembers',
+    'reject_these_nonmembers',
+    'topics',
+    )
+
+
+def _convert(from_type, to_type, convert):
+    # The data can't be migrated offline because we need to read the old
+    # values in Python.  Don't import the table definition from the models,
+    # it may break this migration when the model is updated in the future
+    # (see the Alembic doc).
+    connection = op.get_bind()
+    old_table = sa.sql.table(
+        'mailinglist',
+        sa.sql.column('id', sa.Integer),
+        *(sa.sql.column(name, from_type) for name in COLUMNS))
+    rows = connection.execute(old_table.select()).fetchall()
+    # Replace the columns, then write the values back in their new type.
+    with op.batch_alter_table('mailinglist') as batch_op:
+        for name in COLUMNS:
+            batch_op.drop_column(name)
+    for name in COLUMNS:
+        op.add_column('mailinglist', sa.Column(name, to_type, nullable=True))
+    new_table = sa.sql.table(
+        'mailinglist',
+        sa.sql.column('id', sa.Integer),
+        *(sa.sql.column(name, to_type) for name in COLUMNS))
+    for row in rows:
+        connection.execute(new_table.update().where(
+            new_table.c.id == row['id']).values({
+                name: (None if row[name] is None else convert(name, row[name]))
+                for name in COLUMNS
+                }))
+
+
+def _to_json(name, value):
+    # Topics are lists of tuples, which JSON turns into lists of lists.
+    return list(value)
+
+
+def _from_json(name, value):
+    if name == 'topics':
+        return [tuple(topic) for topic in value]
+    return value
+
+
+def upgrade():
+    _convert(sa.PickleType, JSON, _to_json)
+
+
+def downgrade():
+    _convert(JSON, sa.PickleType, _from_json)
@@ -0,0 +1,38 @@
+"""Ban versions
+
+Revision ID: e2d1f1c5a3b7
+Revises: c6a2ba9bde52
+Create Date: 2017-11-20 11:03:52.664120
+
+Add the table of ban versions, used to invalidate the compiled bans.  There
+is one version per mailing list, with the global one under an empty list-id
+rather than NULL so that the unique index covers it too.
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from mailman.database.types import SAUnicode
+
+
+# Revision identifiers, used by Alembic.
+revision = 'e2d1f1c5a3b7'
+down_revision = 'c6a2ba9bde52'
+
+
+def upgrade():
+    op.create_table(
+        'banversion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('list_id', SAUnicode(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        op.f('ix_banversion_list_id'), 'banversion', ['list_id'],
+        unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_banversion_list_id'), table_name='banversion')
+    op.drop_table('banversion')
@@ -24,7 +24,7 @@ from mailman.interfaces.database import IDatabase
 from mailman.utilities.string import expand
 from public import public
 from sqlalchemy import create_engine, event, exc, select
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from zope.interface import implementer
 
 
@@ -55,6 +55,10 @@ class SABaseDatabase:
         """See `IDatabase`."""
         self.store.rollback()
 
+    def release(self):
+        """See `IDatabase`."""
+        self.store.remove()
+
     def _pre_reset(self, store):
         """Clean up method for testing.
 
@@ -104,8 +108,10 @@ class SABaseDatabase:
         # half dozen and all...
         self.url = url
         self.engine = create_engine(url, isolation_level='READ UNCOMMITTED')
-        session = sessionmaker(bind=self.engine)
-        self.store = session()
+        # The store hands out a separate session to each thread, so that a
+        # multithreaded server can handle requests concurrently without the
+        # threads sharing any ORM state.
+        self.store = scoped_session(sessionmaker(bind=self.engine))
         self.store.commit()
         # This is from the Dealing with Disconnects section at
         # <http://docs.sqlalchemy.org/en/latest/core/pooling.html>.  It
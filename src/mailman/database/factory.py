@@ -112,6 +112,11 @@ def _reset(self):
     # Avoid a circular import at module level.
     from mailman.database.model import Model
     self.store.rollback()
+    # Forget the objects cached in the session, since their rows are going.
+    # Objects which are still referenced, e.g. from the traceback of a
+    # caught database error, would otherwise stay in its identity map.
+    self.store.info.clear()
+    self.store.expunge_all()
     self._pre_reset(self.store)
     Model._reset(self)
     self._post_reset(self.store)
@@ -28,13 +28,13 @@ from mailman.database.alembic import alembic_cfg
 from mailman.database.helpers import exists_in_db
 from mailman.database.model import Model
 from mailman.database.transaction import transaction
-from mailman.database.types import Enum, SAUnicode
+from mailman.database.types import Enum, JSON, SAUnicode
 from mailman.interfaces.action import Action
 from mailman.interfaces.cache import ICacheManager
 from mailman.interfaces.member import MemberRole
 from mailman.interfaces.template import ITemplateManager
-from mailman.interfaces.usermanager import IUserManager
 from mailman.testing.layers import ConfigLayer
+from mailman.utilities.string import trigrams
 from warnings import catch_warnings, simplefilter
 from zope.component import getUtility
 
@@ -260,29 +260,35 @@ class TestMigrations(unittest.TestCase):
             sa.sql.column('role', Enum(MemberRole)),
             sa.sql.column('moderation_action', Enum(Action)),
             )
-        user_manager = getUtility(IUserManager)
+        address_table = sa.sql.table(
+            'address',
+            sa.sql.column('id', sa.Integer),
+            sa.sql.column('email', SAUnicode),
+            )
         with transaction():
             # Start at the previous revision.
             alembic.command.downgrade(alembic_cfg, 'd4fbb4fd34ca')
-            # Create some members.
-            anne = user_manager.create_address('anne@example.com')
-            bart = user_manager.create_address('bart@example.com')
-            cris = user_manager.create_address('cris@example.com')
-            dana = user_manager.create_address('dana@example.com')
-            # Flush the database to get the last auto-increment id.
-            config.db.store.flush()
+            # Create some members.  The address model doesn't match the
+            # schema at this revision, so the addresses are inserted
+            # directly.
+            emails = ('anne@example.com', 'bart@example.com',
+                      'cris@example.com', 'dana@example.com')
+            config.db.store.execute(address_table.insert().values([
+                {'id': address_id, 'email': email}
+                for address_id, email in enumerate(emails, 1)]))
+            anne, bart, cris, dana = range(1, 5)
             # Assign some moderation actions to the members created above.
             config.db.store.execute(member_table.insert().values([
-                {'address_id': anne.id, 'role': MemberRole.owner,
+                {'address_id': anne, 'role': MemberRole.owner,
                  'list_id': 'ant.example.com',
                  'moderation_action': Action.accept},
-                {'address_id': bart.id, 'role': MemberRole.moderator,
+                {'address_id': bart, 'role': MemberRole.moderator,
                  'list_id': 'ant.example.com',
                  'moderation_action': Action.accept},
-                {'address_id': cris.id, 'role': MemberRole.member,
+                {'address_id': cris, 'role': MemberRole.member,
                  'list_id': 'ant.example.com',
                  'moderation_action': Action.defer},
-                {'address_id': dana.id, 'role': MemberRole.nonmember,
+                {'address_id': dana, 'role': MemberRole.nonmember,
                  'list_id': 'ant.example.com',
                  'moderation_action': Action.hold},
                 ]))
@@ -315,10 +321,10 @@ class TestMigrations(unittest.TestCase):
             member_table.c.address_id, member_table.c.moderation_action,
             ])).fetchall()
         self.assertEqual(members, [
-            (anne.id, Action.accept),
-            (bart.id, Action.accept),
-            (cris.id, None),
-            (dana.id, None),
+            (anne, Action.accept),
+            (bart, Action.accept),
+            (cris, None),
+            (dana, None),
             ])
         # Downgrade and check that Cris's and Dana's actions have been set
         # explicitly.
@@ -327,10 +333,10 @@ class TestMigrations(unittest.TestCase):
             member_table.c.address_id, member_table.c.moderation_action,
             ])).fetchall()
         self.assertEqual(members, [
-            (anne.id, Action.accept),
-            (bart.id, Action.accept),
-            (cris.id, Action.defer),
-            (dana.id, Action.hold),
+            (anne, Action.accept),
+            (bart, Action.accept),
+            (cris, Action.defer),
+            (dana, Action.hold),
             ])
 
     def test_fa0d96e28631_upgrade_uris(self):
@@ -495,3 +501,67 @@ class TestMigrations(unittest.TestCase):
         self.assertEqual(
             len(list(config.db.store.execute(mlist_table.select()))),
             0)
+
+    def test_227c4f1d4a85_address_search_index(self):
+        address_table = sa.sql.table(
+            'address',
+            sa.sql.column('id', sa.Integer),
+            sa.sql.column('email', SAUnicode),
+            sa.sql.column('domain', SAUnicode),
+            )
+        trigram_table = sa.sql.table(
+            'addresstrigram',
+            sa.sql.column('address_id', sa.Integer),
+            sa.sql.column('trigram', SAUnicode),
+            )
+        with transaction():
+            # Start at the previous revision.
+            with catch_warnings():
+                simplefilter('ignore', UserWarning)
+                alembic.command.downgrade(alembic_cfg, '3f31035ed0d7')
+            config.db.store.execute(address_table.insert().values(
+                id=1, email='anne@example.com'))
+        alembic.command.upgrade(alembic_cfg, '227c4f1d4a85')
+        domains = config.db.store.execute(sa.select(
+            [address_table.c.id, address_table.c.domain])).fetchall()
+        self.assertEqual(domains, [(1, 'example.com')])
+        grams = config.db.store.execute(sa.select(
+            [trigram_table.c.address_id, trigram_table.c.trigram])).fetchall()
+        self.assertEqual(
+            sorted(grams),
+            sorted((1, gram) for gram in trigrams('anne@example.com')))
+
+    def test_c6a2ba9bde52_json_list_settings(self):
+        topics = [('cats', 'meow', 'Cat talk', False)]
+        nonmembers = ['anne@example.com', '^bart-.*@example.com']
+        with transaction():
+            # Start at the previous revision.
+            with catch_warnings():
+                simplefilter('ignore', UserWarning)
+                alembic.command.downgrade(alembic_cfg, '5e1c4f0c8e3a')
+            pickled_table = sa.sql.table(
+                'mailinglist',
+                sa.sql.column('id', sa.Integer),
+                sa.sql.column('accept_these_nonmembers', sa.PickleType),
+                sa.sql.column('topics', sa.PickleType),
+                )
+            config.db.store.execute(pickled_table.insert().values(
+                id=1, accept_these_nonmembers=nonmembers, topics=topics))
+        alembic.command.upgrade(alembic_cfg, 'c6a2ba9bde52')
+        json_table = sa.sql.table(
+            'mailinglist',
+            sa.sql.column('accept_these_nonmembers', JSON),
+            sa.sql.column('hold_these_nonmembers', JSON),
+            sa.sql.column('topics', JSON),
+            )
+        results = config.db.store.execute(json_table.select()).fetchall()
+        self.assertEqual(results, [
+            (nonmembers, None, [['cats', 'meow', 'Cat talk', False]])])
+        config.db.store.commit()
+        # Downgrading pickles the values again.
+        with catch_warnings():
+            simplefilter('ignore', UserWarning)
+            alembic.command.downgrade(alembic_cfg, '5e1c4f0c8e3a')
+        results = config.db.store.execute(
+            pickled_table.select()).fetchall()
+        self.assertEqual(results, [(1, nonmembers, topics)])
@@ -17,13 +17,14 @@
 
 """Database type conversions."""
 
+import json
 import uuid
 
 from public import public
 from sqlalchemy import Integer
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.compiler import compiles
-from sqlalchemy.types import CHAR, TypeDecorator, Unicode
+from sqlalchemy.types import CHAR, TypeDecorator, Unicode, UnicodeText
 
 
 @public
@@ -50,6 +51,26 @@ class Enum(TypeDecorator):
         return self.enum(value)
 
 
+@public
+class JSON(TypeDecorator):
+    """Store JSON-serializable values as text.
+
+    Unlike pickles, loading these doesn't run arbitrary code.  Tuples come
+    back as lists.
+    """
+    impl = UnicodeText
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return json.loads(value)
+
+
 @public
 class UUID(TypeDecorator):
     """Platform-independent GUID type.
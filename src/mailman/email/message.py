@@ -44,9 +44,47 @@ class Message(email.message.Message):
     def __repr__(self):
         return self.__str__()
 
+    def __getstate__(self):
+        # Don't pickle the cached senders.
+        values = self.__dict__.copy()
+        values.pop('_senders', None)
+        return values
+
     def __setstate__(self, values):
         self.__dict__ = values
 
+    # The senders are cached until one of the headers they are taken from is
+    # changed, so all the ways of changing the headers are intercepted.
+
+    def _forget_senders(self, name):
+        cached = self.__dict__.get('_senders')
+        if cached is not None and name.lower() in cached[1]:
+            del self._senders
+
+    def __setitem__(self, name, val):
+        self._forget_senders(name)
+        super().__setitem__(name, val)
+
+    def __delitem__(self, name):
+        self._forget_senders(name)
+        super().__delitem__(name)
+
+    def set_raw(self, name, value):
+        self._forget_senders(name)
+        super().set_raw(name, value)
+
+    def add_header(self, _name, _value, **_params):
+        self._forget_senders(_name)
+        super().add_header(_name, _value, **_params)
+
+    def replace_header(self, _name, _value):
+        self._forget_senders(_name)
+        super().replace_header(_name, _value)
+
+    def set_unixfrom(self, unixfrom):
+        self._forget_senders('from_')
+        super().set_unixfrom(unixfrom)
+
     def as_string(self):
         # Work around for https://bugs.python.org/issue27321 and
         # https://bugs.python.org/issue32330.
@@ -91,14 +129,26 @@ class Message(email.message.Message):
         originator headers above can appear multiple times in the message, or
         contain multiple values.
 
+        The addresses are only parsed the first time; they are cached on the
+        message until one of the sender headers is changed.
+
         :return: The list of email addresses that can be considered the sender
             of the message.
         :rtype: A list of email addresses or Nones
         """
+        sender_headers = config.mailman.sender_headers
+        cached = self.__dict__.get('_senders')
+        if cached is None or cached[0] != sender_headers:
+            headers = [header.lower() for header in sender_headers.split()]
+            cached = (sender_headers, frozenset(headers),
+                      tuple(self._find_senders(headers)))
+            self._senders = cached
+        return list(cached[2])
+
+    def _find_senders(self, headers):
         envelope_sender = self.get_unixfrom()
         senders = []
-        for header in config.mailman.sender_headers.split():
-            header = header.lower()
+        for header in headers:
             if header == 'from_':
                 senders.append(envelope_sender.lower()
                                if envelope_sender is not None
@@ -17,6 +17,8 @@
 
 """Test the message API."""
 
+import email
+import pickle
 import unittest
 
 from email import message_from_binary_file
@@ -24,9 +26,12 @@ from email.header import Header
 from email.parser import FeedParser
 from mailman.app.lifecycle import create_list
 from mailman.email.message import Message, UserNotification
-from mailman.testing.helpers import get_queue_messages
+from mailman.testing.helpers import (
+    configuration, get_queue_messages,
+    specialized_message_from_string as mfs)
 from mailman.testing.layers import ConfigLayer
 from pkg_resources import resource_filename
+from unittest.mock import patch
 
 
 class TestMessage(unittest.TestCase):
@@ -116,3 +121,77 @@ Test content
             fp.seek(0)
             text = fp.read().decode('ascii', 'replace')
         self.assertEqual(msg.as_string(), text)
+
+
+class TestSenders(unittest.TestCase):
+    """Test the caching of the message senders."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._msg = mfs("""\
+From: Anne Person <anne@example.com>
+Reply-To: bart@example.com
+Sender: cris@example.com
+X-Other: dave@example.com
+
+""")
+        self._msg.set_unixfrom('elly@example.com')
+        patcher = patch('mailman.email.message.email.utils.parseaddr',
+                        wraps=email.utils.parseaddr)
+        self._parseaddr = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_senders_are_cached(self):
+        senders = ['anne@example.com', 'elly@example.com',
+                   'bart@example.com', 'cris@example.com']
+        self.assertEqual(self._msg.senders, senders)
+        self.assertEqual(self._parseaddr.call_count, 3)
+        self.assertEqual(self._msg.sender, 'anne@example.com')
+        self.assertEqual(self._msg.senders, senders)
+        self.assertEqual(self._parseaddr.call_count, 3)
+
+    def test_returned_list_is_a_copy(self):
+        self._msg.senders.clear()
+        self.assertEqual(self._msg.sender, 'anne@example.com')
+
+    def test_other_header_changes(self):
+        self._msg.senders
+        self._msg['X-Other'] = 'fred@example.com'
+        del self._msg['To']
+        self._msg.add_header('X-Other', 'gwen@example.com')
+        self._msg.senders
+        self.assertEqual(self._parseaddr.call_count, 3)
+
+    def test_set_header(self):
+        self.assertEqual(self._msg.sender, 'anne@example.com')
+        del self._msg['from']
+        self.assertEqual(self._msg.sender, 'elly@example.com')
+        self._msg['FROM'] = 'fred@example.com'
+        self.assertEqual(self._msg.sender, 'fred@example.com')
+
+    def test_replace_header(self):
+        self.assertEqual(self._msg.senders[-1], 'cris@example.com')
+        self._msg.replace_header('Sender', 'fred@example.com')
+        self.assertEqual(self._msg.senders[-1], 'fred@example.com')
+
+    def test_add_header(self):
+        self.assertEqual(self._msg.senders[-1], 'cris@example.com')
+        self._msg.add_header('Sender', 'fred@example.com')
+        self.assertEqual(self._msg.senders[-1], 'fred@example.com')
+
+    def test_set_unixfrom(self):
+        self.assertEqual(self._msg.senders[1], 'elly@example.com')
+        self._msg.set_unixfrom('fred@example.com')
+        self.assertEqual(self._msg.senders[1], 'fred@example.com')
+
+    def test_sender_headers_changed(self):
+        self.assertEqual(self._msg.sender, 'anne@example.com')
+        with configuration('mailman', sender_headers='sender'):
+            self.assertEqual(self._msg.senders, ['cris@example.com'])
+
+    def test_senders_are_not_pickled(self):
+        self._msg.senders
+        msg = pickle.loads(pickle.dumps(self._msg))
+        self.assertNotIn('_senders', msg.__dict__)
+        self.assertEqual(msg.sender, 'anne@example.com')
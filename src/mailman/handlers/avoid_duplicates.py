@@ -17,16 +17,24 @@
 
 """If the user wishes it, do not send duplicates of the same message.
 
-This module keeps an in-memory dictionary of Message-ID: and recipient pairs.
-If a message with an identical Message-ID: is about to be sent to someone who
-has already received a copy, we either drop the message, add a duplicate
-warning header, or pass it through, depending on the user's preferences.
+If a message is about to be sent to someone who is explicitly named as one
+of its recipients, we either drop the list copy, add a duplicate warning
+header, or pass it through, depending on the user's preferences.
+
+When the site-wide delivery ledger is enabled, it keeps the Message-ID-Hash
+and recipient pairs of recently sent list copies, so that a message
+crossposted to several lists is only sent once to members of more than one of
+them.
 """
 
 from email.utils import getaddresses, formataddr
+from lazr.config import as_boolean
+from mailman.config import config
 from mailman.core.i18n import _
 from mailman.interfaces.handler import IHandler
+from mailman.interfaces.ledger import IDeliveryLedger
 from public import public
+from zope.component import getUtility
 from zope.interface import implementer
 
 
@@ -47,6 +55,11 @@ class AvoidDuplicates:
         # Short circuit
         if not recips:
             return
+        self._avoid_explicit_recipients(mlist, msg, msgdata, recips)
+        if as_boolean(config.mailman.delivery_ledger):
+            self._avoid_crossposted_copies(msg, msgdata)
+
+    def _avoid_explicit_recipients(self, mlist, msg, msgdata, recips):
         # Seed this set with addresses we don't care about dup avoiding.
         listaddrs = set((mlist.posting_address,
                          mlist.bounces_address,
@@ -105,3 +118,15 @@ class AvoidDuplicates:
         if cc_addresses:
             del msg['cc']
             msg['CC'] = COMMASPACE.join(cc_addresses.values())
+
+    def _avoid_crossposted_copies(self, msg, msgdata):
+        message_id_hash = msg.get('message-id-hash')
+        if message_id_hash is None:
+            return
+        recips = msgdata['recipients']
+        # Members explicitly named as recipients who still want a list copy
+        # get it from the first list only, like everyone else.
+        delivered = getUtility(IDeliveryLedger).claim(message_id_hash, recips)
+        if delivered:
+            msgdata['recipients'] = [r for r in recips if r not in delivered]
+            msgdata.get('add-dup-header', set()).difference_update(delivered)
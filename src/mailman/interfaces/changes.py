@@ -0,0 +1,163 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The log of changes to lists, rosters and moderation requests."""
+
+from enum import Enum
+from mailman.interfaces.errors import MailmanError
+from public import public
+from zope.interface import Attribute, Interface
+
+
+@public
+class ChangesEvictedError(MailmanError):
+    """Changes after the given token have been evicted from the log."""
+
+    def __init__(self, token):
+        super().__init__()
+        self.token = token
+
+    def __str__(self):
+        return 'Changes after {} are no longer available'.format(self.token)
+
+
+@public
+class ChangeKind(Enum):
+    # A mailing list was created or deleted.
+    mailing_list = 1
+    # A member was subscribed to or unsubscribed from a mailing list.
+    member = 2
+    # A request was held for moderator approval or disposed of.
+    request = 3
+
+
+@public
+class ChangeAction(Enum):
+    created = 1
+    deleted = 2
+
+
+@public
+class IChange(Interface):
+    """A single entry in the change log."""
+
+    token = Attribute(
+        """The unique, monotonically increasing token of this change.""")
+
+    created_on = Attribute(
+        """The date and time this change was recorded.""")
+
+    kind = Attribute(
+        """A `ChangeKind` enum value describing what changed.""")
+
+    action = Attribute(
+        """A `ChangeAction` enum value describing how it changed.""")
+
+    list_id = Attribute(
+        """The list-id of the mailing list the change happened on.""")
+
+    object_id = Attribute(
+        """A string identifying the changed object within its kind.
+
+        This is the list-id for mailing lists, the member id for members and
+        the request id for moderation requests.
+        """)
+
+    email = Attribute(
+        """The member's email address, or None for other kinds.""")
+
+    role = Attribute(
+        """The member's `MemberRole`, or None for other kinds.""")
+
+    request_type = Attribute(
+        """The request's `RequestType`, or None for other kinds.""")
+
+
+@public
+class IChangeLog(Interface):
+    """The log of changes to lists, rosters and moderation requests.
+
+    Clients which need to keep a copy of these collections in sync remember
+    the token of the last change they have seen, and only ask for the changes
+    recorded after it.
+    """
+
+    latest = Attribute(
+        """The token of the most recent change, or 0 if there are none.""")
+
+    def record(kind, action, list_id, object_id, *,
+               email=None, role=None, request_type=None):
+        """Record a change.
+
+        :param kind: What changed.
+        :type kind: `ChangeKind`
+        :param action: How it changed.
+        :type action: `ChangeAction`
+        :param list_id: The list-id of the mailing list.
+        :type list_id: str
+        :param object_id: The identifier of the changed object.
+        :type object_id: str
+        :param email: For members, the subscribed email address.
+        :type email: str
+        :param role: For members, the role of the membership.
+        :type role: `MemberRole`
+        :param request_type: For requests, the type of the request.
+        :type request_type: `RequestType`
+        :return: The recorded change.
+        :rtype: `IChange`
+        """
+
+    def settled(token):
+        """Return the token up to which the changes after `token` are final.
+
+        Tokens are handed out as changes are recorded, but the transactions
+        recording them commit in any order, so a change can show up after
+        changes with greater tokens.  Missing tokens which are recent enough
+        to still be committed end the settled range.
+
+        :param token: The token of the last change the client has seen.
+        :type token: int
+        :return: The greatest token such that no change with a token between
+            `token` and it can still be committed.
+        :rtype: int
+        :raises ChangesEvictedError: if changes after `token` may have been
+            evicted after the retention period, or if `token` is greater than
+            the tokens of all the changes in the log.  Changes compacted away
+            are not missed, since the most recent change to each object is
+            kept.
+        """
+
+    def since(token, until=None):
+        """Return the changes recorded after the given token.
+
+        :param token: Only changes with a greater token are returned.
+        :type token: int
+        :param until: If given, only changes with a token less than or equal
+            to this one are returned.
+        :type until: int
+        :return: The changes, in the order they were recorded.
+        :rtype: `QuerySequence` of `IChange`
+        """
+
+    def evict():
+        """Evict expired changes and compact the log.
+
+        Changes older than the retention period are deleted, except for the
+        most recent of them, which marks how far the eviction went.  Of the
+        changes older than the compaction period, only the most recent one
+        for each object is kept, since it reflects the object's final state,
+        along with the oldest change in the log.
+        """
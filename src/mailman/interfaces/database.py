@@ -49,6 +49,15 @@ class IDatabase(Interface):
     def abort():
         """Abort the current transaction."""
 
+    def release():
+        """Discard the calling thread's database session.
+
+        Every thread works with its own session, which is created on first
+        use.  Threads which are done with the database, such as the worker
+        threads of a multithreaded server, should call this once they have
+        completed the current transaction.
+        """
+
     store = Attribute(
         """The underlying database object on which you can do queries.""")
 
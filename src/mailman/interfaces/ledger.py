@@ -0,0 +1,46 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The site-wide ledger of message deliveries."""
+
+from public import public
+from zope.interface import Interface
+
+
+@public
+class IDeliveryLedger(Interface):
+    """The addresses recently sent a list copy of each message.
+
+    A message crossposted to several mailing lists is processed once for each
+    list.  The ledger lets the later lists skip the addresses which already
+    got a copy from an earlier one.
+    """
+
+    def claim(message_id_hash, emails):
+        """Record the delivery of a message to some addresses.
+
+        :param message_id_hash: The `Message-ID-Hash` of the message.
+        :type message_id_hash: str
+        :param emails: The addresses the message is about to be sent to.
+        :type emails: iterable of str
+        :return: The addresses which were already sent the message within the
+            last `[mailman]delivery_ledger_lifetime`.  The other addresses are
+            recorded as having been sent the message.
+        :rtype: set of str
+        """
+
+    def evict():
+        """Forget the deliveries older than the ledger's lifetime."""
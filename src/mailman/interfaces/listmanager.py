@@ -157,6 +157,10 @@ class IListManager(Interface):
         """An iterator over the 2-tuple of (list_name, mail_host) for all
         mailing lists managed by this list manager.""")
 
+    names_and_list_ids = Attribute(
+        """An iterator over the 2-tuple of (fqdn_listname, list_id) for all
+        mailing lists managed by this list manager.""")
+
     def find(*, advertised=None, mail_host=None, owner=None):
         """Search for mailing lists matching some criteria.
 
@@ -0,0 +1,51 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The index of recently accepted messages."""
+
+from public import public
+from zope.interface import Interface
+
+
+@public
+class IRecentMessages(Interface):
+    """The messages recently accepted for each mailing list.
+
+    Mail servers redeliver a message when they time out waiting for an answer
+    to a delivery which actually succeeded, and some senders resend the same
+    message.  Remembering the `Message-ID-Hash` of each accepted message for
+    a while lets such copies be recognized and dropped.
+    """
+
+    def record(list_id, message_id_hash):
+        """Record that a message was accepted for a mailing list.
+
+        :param list_id: The list-id of the mailing list.
+        :type list_id: str
+        :param message_id_hash: The `Message-ID-Hash` of the message.
+        :type message_id_hash: str
+        :return: False if the message was already accepted for the mailing
+            list within the last `[mta]lmtp_duplicate_window`, otherwise
+            True.
+        :rtype: bool
+        """
+
+    def evict():
+        """Forget the messages accepted before the window.
+
+        Of the messages still in the window, only the most recent
+        `[mta]lmtp_duplicate_limit` ones of each mailing list are kept.
+        """
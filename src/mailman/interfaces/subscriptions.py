@@ -20,7 +20,8 @@
 from collections import namedtuple
 from enum import Enum
 from mailman.interfaces.errors import MailmanError
-from mailman.interfaces.member import DeliveryMode, MembershipError
+from mailman.interfaces.member import (
+    DeliveryMode, MemberRole, MembershipError)
 from public import public
 from zope.interface import Interface
 
@@ -130,7 +131,9 @@ class ISubscriptionService(Interface):
         :rtype: `IMember`
         """
 
-    def find_members(subscriber=None, list_id=None, role=None):
+    def find_members(subscriber=None, list_id=None, role=None, domain=None,
+                     delivery_mode=None, delivery_status=None,
+                     moderation_action=None):
         """Search for members matching some criteria.
 
         The members are sorted first by list-id, then by subscribed
@@ -148,6 +151,21 @@ class ISubscriptionService(Interface):
         :type list_id: string
         :param role: The member role.
         :type role: `MemberRole`
+        :param domain: Only return the memberships of subscribers whose email
+            address is in this domain.
+        :type domain: string
+        :param delivery_mode: Only return the memberships whose effective
+            delivery mode, taking the address, user, and system preferences
+            into account, is this one, or one of these.
+        :type delivery_mode: `DeliveryMode` or sequence of `DeliveryMode`
+        :param delivery_status: Only return the memberships whose effective
+            delivery status is this one, or one of these.
+        :type delivery_status: `DeliveryStatus` or sequence of
+            `DeliveryStatus`
+        :param moderation_action: Only return the memberships whose effective
+            moderation action, taking the mailing list's defaults into
+            account, is this one, or one of these.
+        :type moderation_action: `Action` or sequence of `Action`
         :return: A sequence of all memberships, which may be empty.
         :rtype: A `QuerySequence` of `IMember`
         """
@@ -173,6 +191,21 @@ class ISubscriptionService(Interface):
             more than one membership.
         """
 
+    def count_members(list_ids=None, role=MemberRole.member):
+        """Count the members of many mailing lists at once.
+
+        :param list_ids: The list ids of the mailing lists to count the
+            members of.  When None, the members of all mailing lists are
+            counted.
+        :type list_ids: sequence of strings
+        :param role: The member role.
+        :type role: `MemberRole`
+        :return: A mapping from list ids to the number of members of the
+            mailing list with the given role.  Mailing lists without any
+            such members are omitted.
+        :rtype: dict
+        """
+
     def __iter__():
         """See `get_members()`."""
 
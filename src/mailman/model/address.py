@@ -23,6 +23,7 @@ from mailman.database.types import SAUnicode
 from mailman.interfaces.address import (
     AddressVerificationEvent, IAddress, IEmailValidator)
 from mailman.utilities.datetime import now
+from mailman.utilities.string import trigrams
 from public import public
 from sqlalchemy import Column, DateTime, ForeignKey, Integer
 from sqlalchemy.orm import backref, relationship
@@ -45,6 +46,13 @@ class Address(Model):
     _verified_on = Column('verified_on', DateTime)
     registered_on = Column(DateTime)
 
+    # The domain part of the email address, and the trigrams of the address.
+    # These are only used to search for addresses more efficiently than with
+    # LIKE patterns.
+    _domain = Column('domain', SAUnicode, index=True)
+    _trigrams = relationship(
+        'AddressTrigram', cascade='all, delete-orphan')
+
     user_id = Column(Integer, ForeignKey('user.id'), index=True)
 
     preferences_id = Column(Integer, ForeignKey('preferences.id'), index=True)
@@ -59,6 +67,9 @@ class Address(Model):
         self.display_name = display_name
         self._original = (None if lower_case == email else email)
         self.registered_on = now()
+        self._domain = lower_case.rpartition('@')[2]
+        self._trigrams = [
+            AddressTrigram(trigram) for trigram in trigrams(lower_case)]
 
     def __str__(self):
         addr = (self.email if self._original is None else self._original)
@@ -86,3 +97,18 @@ class Address(Model):
     @property
     def original_email(self):
         return (self.email if self._original is None else self._original)
+
+
+@public
+class AddressTrigram(Model):
+    """A three character substring of an email address."""
+
+    __tablename__ = 'addresstrigram'
+
+    id = Column(Integer, primary_key=True)
+    address_id = Column(Integer, ForeignKey('address.id'), index=True)
+    trigram = Column(SAUnicode, index=True)
+
+    def __init__(self, trigram):
+        super().__init__()
+        self.trigram = trigram
@@ -18,6 +18,7 @@
 """Ban manager."""
 
 import re
+import random
 
 from mailman.database.model import Model
 from mailman.database.transaction import dbconnection
@@ -26,9 +27,19 @@ from mailman.interfaces.bans import IBan, IBanManager
 from mailman.utilities.queries import QuerySequence
 from public import public
 from sqlalchemy import Column, Integer
+from sqlalchemy.exc import IntegrityError
 from zope.interface import implementer
 
 
+# The compiled bans of each mailing list (by list-id) and the global bans
+# (under None) in this process, checked against the ban versions.
+_indexes = {}
+
+# The list-id under which the version of the global bans is kept, since a NULL
+# list-id would escape the unique constraint.
+GLOBAL_BANS = ''
+
+
 @public
 @implementer(IBan)
 class Ban(Model):
@@ -46,6 +57,64 @@ class Ban(Model):
         self.list_id = list_id
 
 
+@public
+class BanVersion(Model):
+    """The version of the bans of a mailing list, or of the global bans.
+
+    Each change to the bans picks a new random version rather than
+    incrementing it, so that an index built in a transaction which is later
+    rolled back can't match a version committed by another process.  The
+    version of the global bans is kept under `GLOBAL_BANS`.
+    """
+
+    __tablename__ = 'banversion'
+
+    id = Column(Integer, primary_key=True)
+    list_id = Column(SAUnicode, index=True, unique=True, nullable=False)
+    version = Column(Integer, nullable=False)
+
+    def __init__(self, list_id):
+        super().__init__()
+        self.list_id = list_id
+        self.bump()
+
+    def bump(self):
+        version = random.randrange(1 << 30)
+        while version == self.version:
+            version = random.randrange(1 << 30)
+        self.version = version
+
+
+class _BanIndex:
+    """The compiled bans of a mailing list, or the global bans."""
+
+    def __init__(self, version, bans):
+        self.version = version
+        self._emails = set()
+        combinable = []
+        self._patterns = []
+        for email in bans:
+            self._emails.add(email)
+            if not email.startswith('^'):
+                continue
+            pattern = re.compile(email, re.IGNORECASE)
+            # Patterns with groups (and thus maybe backreferences) or any
+            # extension notation, such as inline flags, could change meaning
+            # when combined with the others.
+            if pattern.groups == 0 and '(?' not in email:
+                combinable.append(email)
+            else:
+                self._patterns.append(pattern)
+        if len(combinable) > 0:
+            self._patterns.insert(0, re.compile(
+                '|'.join('(?:{})'.format(email) for email in combinable),
+                re.IGNORECASE))
+
+    def match(self, email):
+        return email in self._emails or any(
+            pattern.match(email) is not None for pattern in self._patterns)
+
+
 @public
 @implementer(IBanManager)
 class BanManager:
@@ -62,6 +131,7 @@ class BanManager:
         if bans.count() == 0:
             ban = Ban(email, self._list_id)
             store.add(ban)
+            self._bump_version(store)
 
     @dbconnection
     def unban(self, store, email):
@@ -70,45 +140,45 @@ class BanManager:
             email=email, list_id=self._list_id).first()
         if ban is not None:
             store.delete(ban)
+            self._bump_version(store)
+
+    def _bump_version(self, store):
+        scope = GLOBAL_BANS if self._list_id is None else self._list_id
+        query = store.query(BanVersion).filter_by(list_id=scope)
+        version = query.first()
+        if version is not None:
+            version.bump()
+            return
+        # Another process may be adding the first version concurrently, in
+        # which case the unique constraint keeps only one of them.
+        try:
+            with store.begin_nested():
+                store.add(BanVersion(scope))
+        except IntegrityError:
+            query.one().bump()
+
+    def _index(self, store, list_id, version):
+        index = _indexes.get(list_id)
+        if index is None or index.version != version:
+            bans = store.query(Ban.email).filter_by(list_id=list_id)
+            index = _BanIndex(version, [email for (email,) in bans])
+            _indexes[list_id] = index
+        return index
 
     @dbconnection
     def is_banned(self, store, email):
         """See `IBanManager`."""
-        list_id = self._list_id
-        if list_id is None:
-            # The client is asking for global bans.  Look up bans on the
-            # specific email address first.
-            bans = store.query(Ban).filter_by(email=email, list_id=None)
-            if bans.count() > 0:
-                return True
-            # And now look for global pattern bans.
-            bans = store.query(Ban).filter_by(list_id=None)
-            for ban in bans:
-                if (ban.email.startswith('^') and
-                        re.match(ban.email, email, re.IGNORECASE) is not None):
-                    return True
-        else:
-            # This is a list-specific ban.
-            bans = store.query(Ban).filter_by(email=email, list_id=list_id)
-            if bans.count() > 0:
-                return True
-            # Try global bans next.
-            bans = store.query(Ban).filter_by(email=email, list_id=None)
-            if bans.count() > 0:
-                return True
-            # Now try specific mailing list bans, but with a pattern.
-            bans = store.query(Ban).filter_by(list_id=list_id)
-            for ban in bans:
-                if (ban.email.startswith('^') and
-                        re.match(ban.email, email, re.IGNORECASE) is not None):
-                    return True
-            # And now try global pattern bans.
-            bans = store.query(Ban).filter_by(list_id=None)
-            for ban in bans:
-                if (ban.email.startswith('^') and
-                        re.match(ban.email, email, re.IGNORECASE) is not None):
-                    return True
-        return False
+        # Both the list-specific and the global bans apply.  Only their
+        # versions are read; the bans themselves are only loaded when they
+        # have changed since this process last compiled them.
+        scopes = {self._list_id: None, None: None}
+        for list_id, version in store.query(
+                BanVersion.list_id, BanVersion.version).filter(
+                    BanVersion.list_id.in_((self._list_id, GLOBAL_BANS))):
+            scopes[None if list_id == GLOBAL_BANS else list_id] = version
+        return any(
+            self._index(store, list_id, version).match(email)
+            for list_id, version in scopes.items())
 
     @property
     @dbconnection
@@ -20,7 +20,8 @@
 import os
 import hashlib
 
-from contextlib import ExitStack
+from contextlib import ExitStack, suppress
+from datetime import timedelta
 from lazr.config import as_timedelta
 from mailman.config import config
 from mailman.database.model import Model
@@ -28,11 +29,25 @@ from mailman.database.transaction import dbconnection
 from mailman.database.types import SAUnicode
 from mailman.interfaces.cache import ICacheManager
 from mailman.utilities.datetime import now
+from mailman.utilities.lru import LRUCache
 from public import public
 from sqlalchemy import Boolean, Column, DateTime, Integer
 from zope.interface import implementer
 
 
+# How often the expired files are evicted from the cache.
+EVICTION_INTERVAL = timedelta(hours=1)
+# How many entries are deleted per statement, which keeps the number of
+# parameters within what all databases accept.
+EVICTION_BATCH = 500
+
+# The in-memory tier in front of the file cache.  Its entries never outlive
+# the cached files, but changes made by other processes go unseen until the
+# entries expire.
+memory_cache = LRUCache('mailman', 'cache_memory_size', 'cache_memory_life')
+public(memory_cache=memory_cache)
+
+
 class CacheEntry(Model):
     __tablename__ = 'file_cache'
 
@@ -67,6 +82,9 @@ class CacheEntry(Model):
 class CacheManager:
     """Manages a cache of files on the file system."""
 
+    def __init__(self):
+        self._next_eviction = None
+
     @staticmethod
     def _id_to_path(file_id):
         dir_1 = file_id[0:2]
@@ -116,46 +134,80 @@ class CacheManager:
         else:
             entry.update(is_bytes, lifetime)
         self._write_contents(file_id, contents, is_bytes)
+        memory_cache.put(('files', key), contents, entry.expires_on)
+        # Rather than having a separate process do it, adding files evicts
+        # the expired ones now and then.
+        if self._next_eviction is None or self._next_eviction <= now():
+            self.evict()
         return file_id
 
     @dbconnection
     def get(self, store, key, *, expunge=False):
         """See `ICacheManager`."""
+        if expunge:
+            memory_cache.discard(('files', key))
+        else:
+            contents = memory_cache.get(('files', key))
+            if contents is not None:
+                return contents
         entry = store.query(CacheEntry).filter(
             CacheEntry.key == key).one_or_none()
-        if entry is None:
+        if entry is None or entry.is_expired:
             return None
         file_path, dir_path = self._id_to_path(entry.file_id)
         with ExitStack() as resources:
-            if entry.is_bytes:
-                fp = resources.enter_context(open(file_path, 'rb'))
-            else:
-                fp = resources.enter_context(
-                    open(file_path, 'r', encoding='utf-8'))
+            try:
+                if entry.is_bytes:
+                    fp = resources.enter_context(open(file_path, 'rb'))
+                else:
+                    fp = resources.enter_context(
+                        open(file_path, 'r', encoding='utf-8'))
+            except FileNotFoundError:
+                # Another process evicted the file in the meantime.
+                return None
             contents = fp.read()
         # Do we expunge the cache file?
         if expunge:
             store.delete(entry)
             os.remove(file_path)
+        else:
+            memory_cache.put(('files', key), contents, entry.expires_on)
         return contents
 
+    def _remove_files(self, file_ids):
+        for file_id in file_ids:
+            file_path, dir_path = self._id_to_path(file_id)
+            # The file may already be gone, e.g. if another process evicted
+            # it at the same time.
+            with suppress(FileNotFoundError):
+                os.remove(file_path)
+
     @dbconnection
     def evict(self, store):
         """See `ICacheManager`."""
-        # Find all the cache entries which have expired.  We can probably do
-        # this more efficiently, but for now there probably aren't that many
-        # cached files.
-        for entry in store.query(CacheEntry):
-            if entry.is_expired:
-                file_path, dir_path = self._id_to_path(entry.file_id)
-                os.remove(file_path)
-                store.delete(entry)
+        right_now = now()
+        expired = store.query(CacheEntry.id, CacheEntry.file_id).filter(
+            CacheEntry.expires_on <= right_now).all()
+        for start in range(0, len(expired), EVICTION_BATCH):
+            batch = dict(expired[start:start + EVICTION_BATCH])
+            # An entry refreshed by another process in the meantime is
+            # neither deleted, nor are its contents removed.
+            deleted = store.query(CacheEntry).filter(
+                CacheEntry.id.in_(batch),
+                CacheEntry.expires_on <= right_now
+                ).delete(synchronize_session=False)
+            if deleted < len(batch):
+                for (entry_id,) in store.query(CacheEntry.id).filter(
+                        CacheEntry.id.in_(batch)):
+                    del batch[entry_id]
+            self._remove_files(batch.values())
+        self._next_eviction = right_now + EVICTION_INTERVAL
 
     @dbconnection
     def clear(self, store):
-        # Delete all the entries.  We can probably do this more efficiently,
-        # but for now there probably aren't that many cached files.
-        for entry in store.query(CacheEntry):
-            file_path, dir_path = self._id_to_path(entry.file_id)
-            os.remove(file_path)
-            store.delete(entry)
+        """See `ICacheManager`."""
+        file_ids = [file_id for (file_id,) in store.query(
+            CacheEntry.file_id)]
+        store.query(CacheEntry).delete(synchronize_session=False)
+        self._remove_files(file_ids)
+        memory_cache.invalidate('files')
@@ -0,0 +1,172 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The change log."""
+
+from datetime import timedelta
+from lazr.config import as_timedelta
+from mailman.config import config
+from mailman.database.model import Model
+from mailman.database.transaction import dbconnection
+from mailman.database.types import Enum, SAUnicode
+from mailman.interfaces.changes import (
+    ChangeAction, ChangeKind, ChangesEvictedError, IChange, IChangeLog)
+from mailman.interfaces.member import MemberRole
+from mailman.interfaces.requests import RequestType
+from mailman.utilities.datetime import now
+from mailman.utilities.queries import QuerySequence
+from public import public
+from sqlalchemy import Column, DateTime, Integer, func, select
+from zope.interface import implementer
+
+
+# A missing token this recent may belong to a transaction which has not
+# committed yet.  Older ones belong to rolled back or evicted changes.
+SETTLE_TIME = timedelta(minutes=1)
+
+
+@public
+@implementer(IChange)
+class Change(Model):
+    """See `IChange`."""
+
+    __tablename__ = 'change'
+
+    id = Column(Integer, primary_key=True)
+    created_on = Column(DateTime, index=True)
+    kind = Column(Enum(ChangeKind))
+    action = Column(Enum(ChangeAction))
+    list_id = Column(SAUnicode)
+    object_id = Column(SAUnicode)
+    email = Column(SAUnicode)
+    role = Column(Enum(MemberRole))
+    request_type = Column(Enum(RequestType))
+
+    def __init__(self, kind, action, list_id, object_id,
+                 email=None, role=None, request_type=None):
+        super().__init__()
+        self.created_on = now()
+        self.kind = kind
+        self.action = action
+        self.list_id = list_id
+        self.object_id = object_id
+        self.email = email
+        self.role = role
+        self.request_type = request_type
+
+    @property
+    def token(self):
+        return self.id
+
+
+@public
+@implementer(IChangeLog)
+class ChangeLog:
+    """See `IChangeLog`."""
+
+    def __init__(self):
+        self._next_eviction = None
+
+    @property
+    @dbconnection
+    def latest(self, store):
+        """See `IChangeLog`."""
+        token = store.query(func.max(Change.id)).scalar()
+        return (0 if token is None else token)
+
+    @dbconnection
+    def record(self, store, kind, action, list_id, object_id, *,
+               email=None, role=None, request_type=None):
+        """See `IChangeLog`."""
+        change = Change(kind, action, list_id, object_id,
+                        email, role, request_type)
+        store.add(change)
+        # Callers want the token, so flush the change to get its id.
+        store.flush()
+        # Keep the log from growing without bounds.  Rather than having a
+        # separate process do it, the recording of changes does the eviction
+        # now and then.
+        if self._next_eviction is None or self._next_eviction <= now():
+            self.evict()
+        return change
+
+    @dbconnection
+    def settled(self, store, token):
+        """See `IChangeLog`."""
+        if token > self.latest:
+            raise ChangesEvictedError(token)
+        if token > 0:
+            # Eviction keeps the most recent of the changes it expires, and
+            # compaction keeps the oldest change, so the changes before the
+            # oldest one are gone for good.  A client which hasn't seen them
+            # all may have missed some.  Gaps left by compaction or rolled
+            # back transactions after the oldest change lose nothing.
+            oldest = store.query(func.min(Change.id)).scalar()
+            if oldest is not None and token < oldest - 1:
+                raise ChangesEvictedError(token)
+        # The changes recorded long enough ago are final, whatever gaps they
+        # leave.  Only the gaps before recent changes may still be filled.
+        right_now = now()
+        settled = store.query(func.max(Change.id)).filter(
+            Change.id > token,
+            Change.created_on <= right_now - SETTLE_TIME).scalar()
+        if settled is None:
+            settled = token
+        for change_id, in store.query(Change.id).filter(
+                Change.id > settled).order_by(Change.id):
+            if change_id != settled + 1:
+                # The missing changes may still be committed.
+                break
+            settled = change_id
+        return settled
+
+    @dbconnection
+    def since(self, store, token, until=None):
+        """See `IChangeLog`."""
+        query = store.query(Change).filter(Change.id > token)
+        if until is not None:
+            query = query.filter(Change.id <= until)
+        return QuerySequence(query.order_by(Change.id))
+
+    @dbconnection
+    def evict(self, store):
+        """See `IChangeLog`."""
+        right_now = now()
+        compaction = as_timedelta(config.mailman.change_compaction)
+        retention = as_timedelta(config.mailman.change_retention)
+        # The most recent of the expired changes is kept, to mark how far the
+        # eviction went.
+        horizon = store.query(func.max(Change.id)).filter(
+            Change.created_on < right_now - retention).scalar()
+        if horizon is not None:
+            store.query(Change).filter(
+                Change.id < horizon
+                ).delete(synchronize_session=False)
+        oldest = store.query(func.min(Change.id)).scalar()
+        # The most recent change to each object.  This is wrapped in a
+        # derived table, because some databases do not allow a subquery on
+        # the table being deleted from.
+        latest = store.query(
+            func.max(Change.id).label('id')
+            ).group_by(
+                Change.kind, Change.list_id, Change.object_id
+            ).subquery()
+        store.query(Change).filter(
+            Change.created_on < right_now - compaction,
+            Change.id != oldest,
+            ~Change.id.in_(select([latest.c.id]))
+            ).delete(synchronize_session=False)
+        self._next_eviction = right_now + compaction
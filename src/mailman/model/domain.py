@@ -27,13 +27,17 @@ from mailman.interfaces.user import IUser
 from mailman.interfaces.usermanager import IUserManager
 from mailman.model.mailinglist import MailingList
 from public import public
-from sqlalchemy import Column, Integer
+from sqlalchemy import Column, Integer, inspect
 from sqlalchemy.orm import relationship
 from zope.component import getUtility
 from zope.event import notify
 from zope.interface import implementer
 
 
+# The key of the domain cache in the session's info dictionary.
+DOMAIN_CACHE = 'mailman.domains'
+
+
 @public
 @implementer(IDomain)
 class Domain(Model):
@@ -133,18 +137,30 @@ class DomainManager:
         domain = self[mail_host]
         notify(DomainDeletingEvent(domain))
         store.delete(domain)
+        store.info.get(DOMAIN_CACHE, {}).pop(mail_host, None)
         notify(DomainDeletedEvent(mail_host))
         return domain
 
     @dbconnection
     def get(self, store, mail_host, default=None):
         """See `IDomainManager`."""
-        domains = store.query(Domain).filter_by(mail_host=mail_host)
-        if domains.count() < 1:
+        cache = store.info.setdefault(DOMAIN_CACHE, {})
+        domain = cache.get(mail_host)
+        if domain is not None:
+            state = inspect(domain)
+            # Expired domains are reloaded below, along with any domain that
+            # was deleted or renamed.
+            if (state.persistent and 'mail_host' not in state.unloaded
+                    and domain.mail_host == mail_host):
+                return domain
+            del cache[mail_host]
+        domains = store.query(Domain).filter_by(mail_host=mail_host).all()
+        if len(domains) < 1:
             return default
-        assert domains.count() == 1, (
+        assert len(domains) == 1, (
             'Too many matching domains: %s' % mail_host)
-        return domains.one()
+        cache[mail_host] = domains[0]
+        return domains[0]
 
     def __getitem__(self, mail_host):
         """See `IDomainManager`."""
@@ -0,0 +1,122 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The site-wide ledger of message deliveries."""
+
+from datetime import timedelta
+from lazr.config import as_timedelta
+from mailman.config import config
+from mailman.database.model import Model
+from mailman.database.transaction import dbconnection
+from mailman.database.types import SAUnicode
+from mailman.interfaces.ledger import IDeliveryLedger
+from mailman.utilities.datetime import now
+from public import public
+from sqlalchemy import Column, DateTime, Index, Integer
+from sqlalchemy.exc import IntegrityError
+from zope.interface import implementer
+
+
+EVICTION_INTERVAL = timedelta(minutes=5)
+
+
+@public
+class Delivery(Model):
+    """A message sent to an address."""
+
+    __tablename__ = 'delivery'
+    __table_args__ = (
+        Index('ix_delivery_message_id_hash_email',
+              'message_id_hash', 'email', unique=True),
+        )
+
+    id = Column(Integer, primary_key=True)
+    message_id_hash = Column(SAUnicode)
+    email = Column(SAUnicode)
+    delivered_on = Column(DateTime, index=True)
+
+
+@public
+@implementer(IDeliveryLedger)
+class DeliveryLedger:
+    """See `IDeliveryLedger`."""
+
+    def __init__(self):
+        self._next_eviction = None
+
+    @dbconnection
+    def claim(self, store, message_id_hash, emails):
+        """See `IDeliveryLedger`."""
+        right_now = now()
+        lifetime = as_timedelta(config.mailman.delivery_ledger_lifetime)
+        emails = set(emails)
+        delivered = set()
+        expired = set()
+        # A message goes to a handful of lists, so this reads at most a few
+        # times as many rows as there are recipients.
+        for email, delivered_on in store.query(
+                Delivery.email, Delivery.delivered_on).filter(
+                    Delivery.message_id_hash == message_id_hash):
+            if email in emails:
+                if delivered_on >= right_now - lifetime:
+                    delivered.add(email)
+                else:
+                    expired.add(email)
+        # A delivery made before the lifetime, but not yet evicted, is
+        # claimed again.  Otherwise the unique index decides, even when
+        # another process claims the same addresses concurrently.
+        unclaimed = emails - delivered - expired
+        for email in expired:
+            updated = store.query(Delivery).filter(
+                Delivery.message_id_hash == message_id_hash,
+                Delivery.email == email,
+                Delivery.delivered_on < right_now - lifetime
+                ).update(dict(delivered_on=right_now),
+                         synchronize_session=False)
+            if updated == 0:
+                unclaimed.add(email)
+        rows = [
+            dict(message_id_hash=message_id_hash, email=email,
+                 delivered_on=right_now)
+            for email in sorted(unclaimed)
+            ]
+        if len(rows) > 0:
+            try:
+                with store.begin_nested():
+                    store.bulk_insert_mappings(Delivery, rows)
+            except IntegrityError:
+                # Find out which of the addresses were claimed elsewhere.
+                for row in rows:
+                    try:
+                        with store.begin_nested():
+                            store.bulk_insert_mappings(Delivery, [row])
+                    except IntegrityError:
+                        delivered.add(row['email'])
+        # As with the change log, the recording of deliveries does the
+        # eviction now and then.
+        if self._next_eviction is None or self._next_eviction <= right_now:
+            self.evict()
+        return delivered
+
+    @dbconnection
+    def evict(self, store):
+        """See `IDeliveryLedger`."""
+        right_now = now()
+        lifetime = as_timedelta(config.mailman.delivery_ledger_lifetime)
+        store.query(Delivery).filter(
+            Delivery.delivered_on < right_now - lifetime
+            ).delete(synchronize_session=False)
+        self._next_eviction = right_now + EVICTION_INTERVAL
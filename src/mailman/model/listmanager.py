@@ -17,6 +17,7 @@
 
 """A mailing list manager."""
 
+from copy import deepcopy
 from mailman.database.transaction import dbconnection
 from mailman.interfaces.address import InvalidEmailAddressError
 from mailman.interfaces.listmanager import (
@@ -25,19 +26,67 @@ from mailman.interfaces.listmanager import (
 from mailman.interfaces.member import MemberRole
 from mailman.interfaces.requests import IListRequests
 from mailman.model.autorespond import AutoResponseRecord
-from mailman.model.bans import Ban
+from mailman.model.bans import Ban, BanVersion
 from mailman.model.mailinglist import (
     IAcceptableAliasSet, ListArchiver, MailingList)
 from mailman.model.address import Address
 from mailman.model.member import Member
 from mailman.model.mime import ContentFilter
+from mailman.model.recentmessages import RecentMessage
 from mailman.utilities.datetime import now
+from mailman.utilities.lru import LRUCache
 from mailman.utilities.queries import QuerySequence
 from public import public
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
 from zope.event import notify
 from zope.interface import implementer
 
 
+# The key of the list cache in the session's info dictionary.  The store
+# hands out one session per thread, so a runner shares the cache across all
+# the queue entries it processes.
+LIST_CACHE = 'mailman.lists'
+
+
+def _list_cache(store):
+    cache = store.info.get(LIST_CACHE)
+    if cache is None:
+        cache = store.info[LIST_CACHE] = LRUCache(
+            'mailman', 'list_cache_size', 'list_cache_lifetime')
+    return cache
+
+
+def _snapshot(mlist):
+    # Copy the loaded column values of a freshly loaded mailing list.  Some
+    # of them are mutable pickles, so the copy must be deep.
+    state = inspect(mlist)
+    return {
+        key: deepcopy(state.dict[key])
+        for key in state.mapper.column_attrs.keys()
+        if key in state.dict
+        }
+
+
+def _revalidate(store, mlist, snapshot):
+    # Return True if the cached mailing list is current, restoring its
+    # columns from the snapshot if a commit or rollback expired them.
+    state = inspect(mlist)
+    if not state.persistent or store.identity_map.get(state.key) is not mlist:
+        return False
+    if 'config_version' not in state.unloaded:
+        # Still loaded in this transaction.
+        return True
+    version = store.query(MailingList.config_version).filter(
+        MailingList.id == state.identity[0]).scalar()
+    if version is None or version != snapshot['config_version']:
+        return False
+    for key, value in snapshot.items():
+        if key in state.unloaded:
+            set_committed_value(mlist, key, deepcopy(value))
+    return True
+
+
 @public
 @implementer(IListManager)
 class ListManager:
@@ -71,7 +120,18 @@ class ListManager:
     @dbconnection
     def get_by_list_id(self, store, list_id):
         """See `IListManager`."""
-        return store.query(MailingList).filter_by(_list_id=list_id).first()
+        cache = _list_cache(store)
+        key = ('lists', list_id)
+        entry = cache.get(key)
+        if entry is not None:
+            if _revalidate(store, *entry):
+                return entry[0]
+            cache.discard(key)
+        mlist = store.query(MailingList).filter_by(_list_id=list_id).first()
+        # Only snapshot what is in the database, not unflushed changes.
+        if mlist is not None and not inspect(mlist).modified:
+            cache.put(key, (mlist, _snapshot(mlist)))
+        return mlist
 
     @dbconnection
     def get_by_fqdn(self, store, fqdn_listname):
@@ -92,7 +152,10 @@ class ListManager:
         store.query(ContentFilter).filter_by(mailing_list=mlist).delete()
         store.query(ListArchiver).filter_by(mailing_list=mlist).delete()
         store.query(Ban).filter_by(list_id=mlist.list_id).delete()
+        store.query(BanVersion).filter_by(list_id=mlist.list_id).delete()
+        store.query(RecentMessage).filter_by(list_id=mlist.list_id).delete()
         store.delete(mlist)
+        _list_cache(store).discard(('lists', mlist.list_id))
         notify(ListDeletedEvent(fqdn_listname))
 
     @property
@@ -135,6 +198,16 @@ class ListManager:
                                                       MailingList.list_name):
             yield list_name, mail_host
 
+    @property
+    @dbconnection
+    def names_and_list_ids(self, store):
+        """See `IListManager`."""
+        result_set = store.query(MailingList)
+        for mail_host, list_name, list_id in result_set.values(
+                MailingList.mail_host, MailingList.list_name,
+                MailingList._list_id):
+            yield '{}@{}'.format(list_name, mail_host), list_id
+
     @dbconnection
     def find(self, store, *, advertised=None, mail_host=None, owner=None):
         query = store.query(MailingList)
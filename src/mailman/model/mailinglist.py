@@ -18,11 +18,12 @@
 """Model for mailing lists."""
 
 import os
+import random
 
 from mailman.config import config
 from mailman.database.model import Model
 from mailman.database.transaction import dbconnection
-from mailman.database.types import Enum, SAUnicode, SAUnicodeLarge
+from mailman.database.types import Enum, JSON, SAUnicode, SAUnicodeLarge
 from mailman.interfaces.action import Action, FilterAction
 from mailman.interfaces.address import IAddress
 from mailman.interfaces.archiver import ArchivePolicy
@@ -51,10 +52,10 @@ from mailman.utilities.string import expand
 from public import public
 from sqlalchemy import (
     Boolean, Column, DateTime, Float, ForeignKey, Integer, Interval,
-    LargeBinary, PickleType)
+    LargeBinary)
 from sqlalchemy.event import listen
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, object_session, relationship
 from sqlalchemy.orm.exc import NoResultFound
 from zope.component import getUtility
 from zope.event import notify
@@ -65,6 +66,12 @@ SPACE = ' '
 UNDERSCORE = '_'
 
 
+def _initial_config_version():
+    # Start each list at a random version, so that a cached copy of a deleted
+    # list never validates against a new list which reuses its row id.
+    return random.randrange(1 << 30)
+
+
 @public
 @implementer(IMailingList)
 class MailingList(Model):
@@ -87,6 +94,11 @@ class MailingList(Model):
     anonymous_list = Column(Boolean)
     # Attributes not directly modifiable via the web u/i
     created_at = Column(DateTime)
+    # Bumped on every write to the row, so that cached copies of the list can
+    # be revalidated without reloading all its columns.
+    config_version = Column(
+        Integer, default=_initial_config_version, server_default='0',
+        nullable=False)
     # Attributes which are directly modifiable via the web u/i.  The more
     # complicated attributes are currently stored as pickles, though that
     # will change as the schema and implementation is developed.
@@ -95,43 +107,56 @@ class MailingList(Model):
     digest_last_sent_at = Column(DateTime)
     volume = Column(Integer)
     last_post_at = Column(DateTime)
-    # Attributes which are directly modifiable via the web u/i.  The more
-    # complicated attributes are currently stored as pickles, though that
-    # will change as the schema and implementation is developed.
-    accept_these_nonmembers = Column(PickleType)       # XXX
+    # Attributes which are directly modifiable via the web u/i.  Rarely used
+    # attributes are grouped in deferred columns, which are only loaded from
+    # the database when one of the group is first accessed.
+    accept_these_nonmembers = deferred(Column(JSON), group='nonmembers')  # XXX
     admin_immed_notify = Column(Boolean)
     admin_notify_mchanges = Column(Boolean)
     administrivia = Column(Boolean)
     archive_policy = Column(Enum(ArchivePolicy))
     # Automatic responses.
-    autoresponse_grace_period = Column(Interval)
-    autorespond_owner = Column(Enum(ResponseAction))
-    autoresponse_owner_text = Column(SAUnicode)
-    autorespond_postings = Column(Enum(ResponseAction))
-    autoresponse_postings_text = Column(SAUnicode)
-    autorespond_requests = Column(Enum(ResponseAction))
-    autoresponse_request_text = Column(SAUnicode)
+    autoresponse_grace_period = deferred(
+        Column(Interval), group='autoresponses')
+    autorespond_owner = deferred(
+        Column(Enum(ResponseAction)), group='autoresponses')
+    autoresponse_owner_text = deferred(
+        Column(SAUnicode), group='autoresponses')
+    autorespond_postings = deferred(
+        Column(Enum(ResponseAction)), group='autoresponses')
+    autoresponse_postings_text = deferred(
+        Column(SAUnicode), group='autoresponses')
+    autorespond_requests = deferred(
+        Column(Enum(ResponseAction)), group='autoresponses')
+    autoresponse_request_text = deferred(
+        Column(SAUnicode), group='autoresponses')
     # Content filters.
     filter_action = Column(Enum(FilterAction))
     filter_content = Column(Boolean)
     collapse_alternatives = Column(Boolean)
     convert_html_to_plaintext = Column(Boolean)
     # Bounces.
-    bounce_info_stale_after = Column(Interval)                   # XXX
+    bounce_info_stale_after = deferred(
+        Column(Interval), group='bounces')                       # XXX
     bounce_matching_headers = Column(SAUnicode)                  # XXX
-    bounce_notify_owner_on_disable = Column(Boolean)             # XXX
-    bounce_notify_owner_on_removal = Column(Boolean)             # XXX
-    bounce_score_threshold = Column(Integer)                     # XXX
-    bounce_you_are_disabled_warnings = Column(Integer)           # XXX
-    bounce_you_are_disabled_warnings_interval = Column(Interval)  # XXX
-    forward_unrecognized_bounces_to = Column(
-        Enum(UnrecognizedBounceDisposition))
+    bounce_notify_owner_on_disable = deferred(
+        Column(Boolean), group='bounces')                        # XXX
+    bounce_notify_owner_on_removal = deferred(
+        Column(Boolean), group='bounces')                        # XXX
+    bounce_score_threshold = deferred(Column(Integer), group='bounces')  # XXX
+    bounce_you_are_disabled_warnings = deferred(
+        Column(Integer), group='bounces')                        # XXX
+    bounce_you_are_disabled_warnings_interval = deferred(
+        Column(Interval), group='bounces')                       # XXX
+    forward_unrecognized_bounces_to = deferred(
+        Column(Enum(UnrecognizedBounceDisposition)), group='bounces')
     process_bounces = Column(Boolean)
     # DMARC
     dmarc_mitigate_action = Column(Enum(DMARCMitigateAction))
     dmarc_mitigate_unconditionally = Column(Boolean)
-    dmarc_moderation_notice = Column(SAUnicodeLarge)
-    dmarc_wrapped_message_text = Column(SAUnicodeLarge)
+    dmarc_moderation_notice = deferred(Column(SAUnicodeLarge), group='notices')
+    dmarc_wrapped_message_text = deferred(
+        Column(SAUnicodeLarge), group='notices')
     # Miscellaneous
     default_member_action = Column(Enum(Action))
     default_nonmember_action = Column(Enum(Action))
@@ -141,26 +166,26 @@ class MailingList(Model):
     digest_send_periodic = Column(Boolean)
     digest_size_threshold = Column(Float)
     digest_volume_frequency = Column(Enum(DigestFrequency))
-    discard_these_nonmembers = Column(PickleType)
+    discard_these_nonmembers = deferred(Column(JSON), group='nonmembers')
     emergency = Column(Boolean)
     encode_ascii_prefixes = Column(Boolean)
     first_strip_reply_to = Column(Boolean)
     forward_auto_discards = Column(Boolean)
     gateway_to_mail = Column(Boolean)
     gateway_to_news = Column(Boolean)
-    hold_these_nonmembers = Column(PickleType)
+    hold_these_nonmembers = deferred(Column(JSON), group='nonmembers')
     info = Column(SAUnicode)
-    linked_newsgroup = Column(SAUnicode)
+    linked_newsgroup = deferred(Column(SAUnicode), group='usenet')
     max_days_to_hold = Column(Integer)
     max_message_size = Column(Integer)
     max_num_recipients = Column(Integer)
-    member_moderation_notice = Column(SAUnicode)
+    member_moderation_notice = deferred(Column(SAUnicode), group='notices')
     mime_is_default_digest = Column(Boolean)
     # FIXME: There should be no moderator_password
     moderator_password = Column(LargeBinary)             # TODO : was RawStr()
     newsgroup_moderation = Column(Enum(NewsgroupModeration))
-    nntp_prefix_subject_too = Column(Boolean)
-    nonmember_rejection_notice = Column(SAUnicode)
+    nntp_prefix_subject_too = deferred(Column(Boolean), group='usenet')
+    nonmember_rejection_notice = deferred(Column(SAUnicode), group='notices')
     obscure_addresses = Column(Boolean)
     owner_chain = Column(SAUnicode)
     owner_pipeline = Column(SAUnicode)
@@ -170,7 +195,7 @@ class MailingList(Model):
     posting_pipeline = Column(SAUnicode)
     _preferred_language = Column('preferred_language', SAUnicode)
     display_name = Column(SAUnicode)
-    reject_these_nonmembers = Column(PickleType)
+    reject_these_nonmembers = deferred(Column(JSON), group='nonmembers')
     reply_goes_to_list = Column(Enum(ReplyToMunging))
     reply_to_address = Column(SAUnicode)
     require_explicit_destination = Column(Boolean)
@@ -180,8 +205,8 @@ class MailingList(Model):
     send_welcome_message = Column(Boolean)
     subject_prefix = Column(SAUnicode)
     subscription_policy = Column(Enum(SubscriptionPolicy))
-    topics = Column(PickleType)
-    topics_bodylines_limit = Column(Integer)
+    topics = deferred(Column(JSON), group='topics')
+    topics_bodylines_limit = deferred(Column(Integer), group='topics')
     topics_enabled = Column(Boolean)
     unsubscription_policy = Column(Enum(SubscriptionPolicy))
     # ORM relationships.
@@ -223,6 +248,15 @@ class MailingList(Model):
         # to be complete.  Use this to connect the roster instance creation
         # method with the SA `load` event.
         listen(cls, 'load', cls._post_load)
+        listen(cls, 'before_update', cls._bump_config_version)
+
+    @staticmethod
+    def _bump_config_version(mapper, connection, target):
+        # This hooks up to SQLAlchemy's `before_update` event.  Relationship
+        # changes also mark the list dirty, but they don't touch this row.
+        if object_session(target).is_modified(
+                target, include_collections=False):
+            target.config_version = MailingList.config_version + 1
 
     def __repr__(self):
         return '<mailing list "{}" at {:#x}>'.format(
@@ -123,9 +123,11 @@ class Member(Model):
     @property
     def user(self):
         """See `IMember`."""
+        # Going through the address's relationship rather than looking the
+        # user up by email lets an eagerly loaded user be used as is.
         return (self._user
                 if self._address is None
-                else getUtility(IUserManager).get_user(self._address.email))
+                else self._address.user)
 
     @property
     def subscriber(self):
@@ -0,0 +1,113 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""The index of recently accepted messages."""
+
+from datetime import timedelta
+from lazr.config import as_timedelta
+from mailman.config import config
+from mailman.database.model import Model
+from mailman.database.transaction import dbconnection
+from mailman.database.types import SAUnicode
+from mailman.interfaces.recentmessages import IRecentMessages
+from mailman.utilities.datetime import now
+from public import public
+from sqlalchemy import Column, DateTime, Index, Integer, func
+from sqlalchemy.exc import IntegrityError
+from zope.interface import implementer
+
+
+EVICTION_INTERVAL = timedelta(minutes=5)
+
+
+@public
+class RecentMessage(Model):
+    """A message accepted for a mailing list."""
+
+    __tablename__ = 'recentmessage'
+    __table_args__ = (
+        Index('ix_recentmessage_list_id_message_id_hash',
+              'list_id', 'message_id_hash', unique=True),
+        )
+
+    id = Column(Integer, primary_key=True)
+    list_id = Column(SAUnicode)
+    message_id_hash = Column(SAUnicode)
+    accepted_on = Column(DateTime, index=True)
+
+    def __init__(self, list_id, message_id_hash):
+        super().__init__()
+        self.list_id = list_id
+        self.message_id_hash = message_id_hash
+        self.accepted_on = now()
+
+
+@public
+@implementer(IRecentMessages)
+class RecentMessages:
+    """See `IRecentMessages`."""
+
+    def __init__(self):
+        self._next_eviction = None
+
+    @dbconnection
+    def record(self, store, list_id, message_id_hash):
+        """See `IRecentMessages`."""
+        window = as_timedelta(config.mta.lmtp_duplicate_window)
+        right_now = now()
+        # A message accepted before the window, but not yet evicted, is
+        # accepted again.  Otherwise the unique index decides, even when
+        # another process records the same message concurrently.
+        expired = store.query(RecentMessage).filter(
+            RecentMessage.list_id == list_id,
+            RecentMessage.message_id_hash == message_id_hash,
+            RecentMessage.accepted_on < right_now - window
+            ).update(dict(accepted_on=right_now), synchronize_session=False)
+        if expired == 0:
+            try:
+                with store.begin_nested():
+                    store.add(RecentMessage(list_id, message_id_hash))
+            except IntegrityError:
+                return False
+        # As with the change log, the recording of messages does the
+        # eviction now and then.
+        if self._next_eviction is None or self._next_eviction <= right_now:
+            self.evict()
+        return True
+
+    @dbconnection
+    def evict(self, store):
+        """See `IRecentMessages`."""
+        right_now = now()
+        window = as_timedelta(config.mta.lmtp_duplicate_window)
+        limit = int(config.mta.lmtp_duplicate_limit)
+        store.query(RecentMessage).filter(
+            RecentMessage.accepted_on < right_now - window
+            ).delete(synchronize_session=False)
+        crowded = store.query(RecentMessage.list_id).group_by(
+            RecentMessage.list_id
+            ).having(func.count(RecentMessage.id) > limit)
+        for list_id, in crowded.all():
+            # The id of the oldest message to keep.
+            oldest = store.query(RecentMessage.id).filter(
+                RecentMessage.list_id == list_id
+                ).order_by(RecentMessage.id.desc()).offset(limit - 1).limit(
+                    1).scalar()
+            store.query(RecentMessage).filter(
+                RecentMessage.list_id == list_id,
+                RecentMessage.id < oldest
+                ).delete(synchronize_session=False)
+        self._next_eviction = right_now + EVICTION_INTERVAL
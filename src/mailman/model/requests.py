@@ -21,6 +21,7 @@ from datetime import timedelta
 from mailman.database.model import Model
 from mailman.database.transaction import dbconnection
 from mailman.database.types import Enum, SAUnicode
+from mailman.interfaces.changes import ChangeAction, ChangeKind, IChangeLog
 from mailman.interfaces.pending import IPendable, IPendings
 from mailman.interfaces.requests import IListRequests, RequestType
 from mailman.model.pending import Pended, PendedKeyValue
@@ -105,6 +106,10 @@ class ListRequests:
         # now to the SA transaction context.  Otherwise .id would not be
         # valid.  Hopefully this has no unintended side-effects.
         store.flush()
+        getUtility(IChangeLog).record(
+            ChangeKind.request, ChangeAction.created,
+            self.mailing_list.list_id, str(request.id),
+            request_type=request_type)
         return request.id
 
     @dbconnection
@@ -139,6 +144,10 @@ class ListRequests:
         # Throw away the pended data.
         getUtility(IPendings).confirm(request.data_hash)
         store.delete(request)
+        getUtility(IChangeLog).record(
+            ChangeKind.request, ChangeAction.deleted,
+            request.mailing_list.list_id, str(request_id),
+            request_type=request.request_type)
 
     @dbconnection
     def clear(self, store):
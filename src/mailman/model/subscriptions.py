@@ -17,24 +17,116 @@
 
 """Subscription services."""
 
+from enum import Enum
 from mailman.app.membership import delete_member
+from mailman.core.constants import system_preferences
 from mailman.database.transaction import dbconnection
 from mailman.interfaces.listmanager import IListManager, NoSuchListError
 from mailman.interfaces.member import MemberRole
 from mailman.interfaces.subscriptions import (
     ISubscriptionService, TooManyMembersError)
-from mailman.interfaces.usermanager import IUserManager
-from mailman.model.address import Address
+from mailman.model.address import Address, AddressTrigram
+from mailman.model.mailinglist import MailingList
 from mailman.model.member import Member
+from mailman.model.preferences import Preferences
 from mailman.model.user import User
 from mailman.utilities.queries import QuerySequence
+from mailman.utilities.string import trigrams
 from operator import attrgetter
 from public import public
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import aliased, joinedload
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
 from zope.component import getUtility
 from zope.interface import implementer
 
 
+def _load_subscribers(query):
+    # Representing a member requires its address, user, and the preferences
+    # of all three, where the address of a user subscription is the user's
+    # preferred address.  Load them all along with the members, so that
+    # iterating over the results doesn't issue further queries per member.
+    return query.options(
+        joinedload(Member.preferences),
+        joinedload(Member._address).joinedload(Address.preferences),
+        joinedload(Member._address).joinedload(
+            Address.user).joinedload(User.preferences),
+        joinedload(Member._user).joinedload(User.preferences),
+        joinedload(Member._user).joinedload(
+            User._preferred_address).joinedload(Address.preferences),
+        )
+
+
+def _pattern_filters(store, pattern):
+    # Return the filters matching addresses against a wildcard pattern.  A
+    # LIKE pattern with a leading wildcard can't use an index on the email
+    # column, so where possible, narrow the search down to the addresses
+    # containing all of the pattern's trigrams first.  Patterns matching all
+    # the addresses in a domain use the indexed domain column instead.
+    local, at, domain = pattern.rpartition('@')
+    if local == '*' and len(domain) > 0 and '*' not in domain:
+        return [Address._domain == domain]
+    pattern = pattern.replace('*', '%')
+    filters = [Address.email.like(pattern)]
+    # Substrings with LIKE wildcards in them are not literal.
+    grams = {gram for fragment in pattern.split('%')
+             for gram in trigrams(fragment) if '_' not in gram}
+    if len(grams) > 0:
+        candidates = store.query(AddressTrigram.address_id).filter(
+            AddressTrigram.trigram.in_(grams)).group_by(
+            AddressTrigram.address_id).having(
+            func.count(AddressTrigram.trigram) == len(grams))
+        filters.append(Address.id.in_(candidates.subquery()))
+    return filters
+
+
+def _as_tuple(value):
+    # Filter values may be given either singly or as a sequence.
+    return (value,) if isinstance(value, Enum) else tuple(value)
+
+
+def _filter_preferences(query, delivery_mode, delivery_status):
+    # Filter on the members' effective preferences.  Like Member._lookup(),
+    # these come from the first of the member's, the address's, and the
+    # user's preferences which is set, falling back to the system default.
+    member_prefs = aliased(Preferences)
+    address_prefs = aliased(Preferences)
+    user = aliased(User)
+    user_prefs = aliased(Preferences)
+    query = query.join(
+        member_prefs, member_prefs.id == Member.preferences_id).outerjoin(
+        address_prefs, address_prefs.id == Address.preferences_id).outerjoin(
+        user, user.id == Address.user_id).outerjoin(
+        user_prefs, user_prefs.id == user.preferences_id)
+    for name, values in (('delivery_mode', delivery_mode),
+                         ('delivery_status', delivery_status)):
+        if values is None:
+            continue
+        values = _as_tuple(values)
+        effective = func.coalesce(
+            getattr(member_prefs, name),
+            getattr(address_prefs, name),
+            getattr(user_prefs, name))
+        if getattr(system_preferences, name) in values:
+            query = query.filter(
+                or_(effective.in_(values), effective.is_(None)))
+        else:
+            query = query.filter(effective.in_(values))
+    return query
+
+
+def _filter_moderation_action(query, moderation_action):
+    # Members without a moderation action of their own use their mailing
+    # list's default for their role.
+    effective = func.coalesce(Member.moderation_action, case(
+        [(Member.role == MemberRole.nonmember,
+          MailingList.default_nonmember_action)],
+        else_=MailingList.default_member_action))
+    return query.join(
+        MailingList, MailingList._list_id == Member.list_id).filter(
+        effective.in_(_as_tuple(moderation_action)))
+
+
 @public
 @implementer(ISubscriptionService)
 class SubscriptionService:
@@ -42,12 +134,12 @@ class SubscriptionService:
 
     __name__ = 'members'
 
-    def get_members(self):
+    @dbconnection
+    def get_members(self, store):
         """See `ISubscriptionService`."""
         # {list_id -> {role -> [members]}}
         by_list = {}
-        user_manager = getUtility(IUserManager)
-        for member in user_manager.members:
+        for member in _load_subscribers(store.query(Member)):
             by_role = by_list.setdefault(member.list_id, {})
             members = by_role.setdefault(member.role.name, [])
             members.append(member)
@@ -75,11 +167,15 @@ class SubscriptionService:
             return members[0]
 
     @dbconnection
-    def _find_members(self, store, subscriber, list_id, role):
+    def _find_members(self, store, subscriber, list_id, role, domain=None,
+                      delivery_mode=None, delivery_status=None,
+                      moderation_action=None):
         # If `subscriber` is a user id, then we'll search for all addresses
         # which are controlled by the user, otherwise we'll just search for
         # the given address.
-        if subscriber is None and list_id is None and role is None:
+        if (subscriber is None and list_id is None and role is None
+                and domain is None and delivery_mode is None
+                and delivery_status is None and moderation_action is None):
             return None
         order = (Member.list_id, Address.email, Member.role)
         # Querying for the subscriber is the most complicated part, because
@@ -95,10 +191,9 @@ class SubscriptionService:
                 # subscriber is an email address.
                 subscriber = subscriber.lower()
                 if '*' in subscriber:
-                    subscriber = subscriber.replace('*', '%')
-                    q_address = q_address.filter(
-                        Address.email.like(subscriber))
-                    q_user = q_user.filter(Address.email.like(subscriber))
+                    filters = _pattern_filters(store, subscriber)
+                    q_address = q_address.filter(*filters)
+                    q_user = q_user.filter(*filters)
                 else:
                     q_address = q_address.filter(Address.email == subscriber)
                     q_user = q_user.filter(Address.email == subscriber)
@@ -118,12 +213,31 @@ class SubscriptionService:
         if role is not None:
             q_address = q_address.filter(Member.role == role)
             q_user = q_user.filter(Member.role == role)
+        if domain is not None:
+            q_address = q_address.filter(Address._domain == domain.lower())
+            q_user = q_user.filter(Address._domain == domain.lower())
+        if delivery_mode is not None or delivery_status is not None:
+            q_address = _filter_preferences(
+                q_address, delivery_mode, delivery_status)
+            q_user = _filter_preferences(
+                q_user, delivery_mode, delivery_status)
+        if moderation_action is not None:
+            q_address = _filter_moderation_action(
+                q_address, moderation_action)
+            q_user = _filter_moderation_action(q_user, moderation_action)
         # Do a UNION of the two queries, sort the result and generate Members.
-        return q_address.union(q_user).order_by(*order).from_self(Member)
+        # The sorting must happen in the outermost query, since the eager
+        # loading of the members' subscribers joins to it.
+        return _load_subscribers(
+            q_address.union(q_user).from_self(Member).order_by(*order))
 
-    def find_members(self, subscriber=None, list_id=None, role=None):
+    def find_members(self, subscriber=None, list_id=None, role=None,
+                     domain=None, delivery_mode=None, delivery_status=None,
+                     moderation_action=None):
         """See `ISubscriptionService`."""
-        return QuerySequence(self._find_members(subscriber, list_id, role))
+        return QuerySequence(self._find_members(
+            subscriber, list_id, role, domain,
+            delivery_mode, delivery_status, moderation_action))
 
     def find_member(self, subscriber=None, list_id=None, role=None):
         """See `ISubscriptionService`."""
@@ -138,6 +252,17 @@ class SubscriptionService:
             # violation.
             raise TooManyMembersError(subscriber, list_id, role)
 
+    @dbconnection
+    def count_members(self, store, list_ids=None, role=MemberRole.member):
+        """See `ISubscriptionService`."""
+        query = store.query(Member.list_id, func.count(Member.id)).filter(
+            Member.role == role)
+        if list_ids is not None:
+            if len(list_ids) == 0:
+                return {}
+            query = query.filter(Member.list_id.in_(list_ids))
+        return dict(query.group_by(Member.list_id))
+
     def __iter__(self):
         yield from self.get_members()
 
@@ -19,6 +19,7 @@
 
 import logging
 
+from functools import partial
 from mailman.config import config
 from mailman.database.model import Model
 from mailman.database.transaction import dbconnection
@@ -30,6 +31,7 @@ from mailman.interfaces.template import (
     ALL_TEMPLATES, ITemplateLoader, ITemplateManager)
 from mailman.utilities import protocols
 from mailman.utilities.i18n import find
+from mailman.utilities.lru import LRUCache
 from mailman.utilities.string import expand
 from public import public
 from requests import HTTPError
@@ -43,6 +45,13 @@ from zope.interface import implementer
 COMMASPACE = ', '
 log = logging.getLogger('mailman.http')
 
+# The resolved templates.  Templates are looked up very often, e.g. the
+# headers and footers for every message or recipient, so this saves the
+# database queries and file system searches which resolve them.
+template_cache = LRUCache(
+    'mailman', 'template_cache_size', 'template_cache_lifetime')
+public(template_cache=template_cache)
+
 
 class Template(Model):
     __tablename__ = 'template'
@@ -65,6 +74,32 @@ class Template(Model):
         self.password = password
 
 
+def _fetch(actual_uri, username, password):
+    cache_mgr = getUtility(ICacheManager)
+    contents = cache_mgr.get(actual_uri)
+    if contents is None:
+        # It's likely that the cached contents have expired.
+        auth = {}
+        if username is not None:
+            auth['auth'] = (username, password)
+        try:
+            contents = protocols.get(actual_uri, **auth)
+        except HTTPError as error:
+            # 404/NotFound errors are interpreted as missing templates,
+            # for which we'll return the default (i.e. the empty string).
+            # All other exceptions get passed up the chain.
+            if error.response.status_code != 404:
+                raise
+            log.exception('Cannot retrieve template at {} ({})'.format(
+                actual_uri, auth.get('auth', '<no authorization>')))
+            return ''
+        # We don't need to cache mailman: contents since those are already
+        # on the file system.
+        if urlparse(actual_uri).scheme != 'mailman':
+            cache_mgr.add(actual_uri, contents)
+    return contents
+
+
 @public
 @implementer(ITemplateManager)
 class TemplateManager:
@@ -84,6 +119,7 @@ class TemplateManager:
             store.add(template)
         else:
             template.reset(uri, username, password)
+        template_cache.invalidate('sources')
 
     @dbconnection
     def get(self, store, name, context, **kws):
@@ -94,29 +130,7 @@ class TemplateManager:
         if template is None:
             return None
         actual_uri = expand(template.uri, None, kws)
-        cache_mgr = getUtility(ICacheManager)
-        contents = cache_mgr.get(actual_uri)
-        if contents is None:
-            # It's likely that the cached contents have expired.
-            auth = {}
-            if template.username is not None:
-                auth['auth'] = (template.username, template.password)
-            try:
-                contents = protocols.get(actual_uri, **auth)
-            except HTTPError as error:
-                # 404/NotFound errors are interpreted as missing templates,
-                # for which we'll return the default (i.e. the empty string).
-                # All other exceptions get passed up the chain.
-                if error.response.status_code != 404:
-                    raise
-                log.exception('Cannot retrieve template at {} ({})'.format(
-                    actual_uri, auth.get('auth', '<no authorization>')))
-                return ''
-            # We don't need to cache mailman: contents since those are already
-            # on the file system.
-            if urlparse(actual_uri).scheme != 'mailman':
-                cache_mgr.add(actual_uri, contents)
-        return contents
+        return _fetch(actual_uri, template.username, template.password)
 
     @dbconnection
     def raw(self, store, name, context):
@@ -133,7 +147,8 @@ class TemplateManager:
             Template.context == context).one_or_none()
         if template is not None:
             store.delete(template)
-        # We don't clear the cache entry, we just let it expire.
+        # We don't clear the file cache entry, we just let it expire.
+        template_cache.invalidate('sources')
 
 
 @public
@@ -147,7 +162,6 @@ class TemplateLoader:
         substitutions = {}
         if IMailingList.providedBy(context):
             mlist = context
-            domain = context.domain
             lookup_contexts = [
                 mlist.list_id,
                 mlist.mail_host,
@@ -157,7 +171,9 @@ class TemplateLoader:
                 list_id=mlist.list_id,
                 # For backward compatibility, we call this $listname.
                 listname=mlist.fqdn_listname,
-                domain_name=domain.mail_host,
+                # The list's mail host is its domain's, and doesn't take a
+                # query to look up.
+                domain_name=mlist.mail_host,
                 language=mlist.preferred_language.code,
                 ))
         elif IDomain.providedBy(context):
@@ -178,15 +194,17 @@ class TemplateLoader:
         # See if there's a cached template registered for this name and
         # context, passing in the url substitutions.  This handles http:,
         # https:, and file: urls.
-        for lookup_context in lookup_contexts:
+        sources = template_cache.fetch(
+            ('sources', name, tuple(lookup_contexts)),
+            partial(self._sources, name, lookup_contexts))
+        for uri, username, password in sources:
+            actual_uri = expand(uri, None, substitutions)
             try:
-                contents = getUtility(ITemplateManager).get(
-                    name, lookup_context, **substitutions)
+                return template_cache.fetch(
+                    ('contents', actual_uri, username),
+                    partial(_fetch, actual_uri, username, password))
             except (HTTPError, URLError):
                 pass
-            else:
-                if contents is not None:
-                    return contents
         # Fallback to searching within the source code.
         code = substitutions.get('language', config.mailman.default_language)
         # Find the template, mutating any missing template exception.
@@ -196,6 +214,23 @@ class TemplateLoader:
             return ''
         elif default_uri is missing:
             raise URLError('No such file')
+        return template_cache.fetch(
+            ('files', default_uri, None if mlist is None else mlist.list_id,
+             code),
+            partial(self._read, default_uri, mlist, code))
+
+    def _sources(self, name, lookup_contexts):
+        """The templates registered for the name, most specific first."""
+        manager = getUtility(ITemplateManager)
+        sources = []
+        for lookup_context in lookup_contexts:
+            template = manager.raw(name, lookup_context)
+            if template is not None:
+                sources.append(
+                    (template.uri, template.username, template.password))
+        return tuple(sources)
+
+    def _read(self, default_uri, mlist, code):
         path, fp = find(default_uri, mlist, code)
         try:
             return fp.read()
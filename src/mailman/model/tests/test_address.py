@@ -19,11 +19,13 @@
 
 import unittest
 
+from mailman.config import config
 from mailman.email.validate import InvalidEmailAddressError
 from mailman.interfaces.address import ExistingAddressError
 from mailman.interfaces.usermanager import IUserManager
-from mailman.model.address import Address
+from mailman.model.address import Address, AddressTrigram
 from mailman.testing.layers import ConfigLayer
+from mailman.utilities.string import trigrams
 from zope.component import getUtility
 
 
@@ -90,3 +92,13 @@ class TestAddress(unittest.TestCase):
         with self.assertRaises(ExistingAddressError) as cm:
             self._usermgr.create_address('FPERSON@example.com')
         self.assertEqual(cm.exception.address, 'FPERSON@example.com')
+
+    def test_search_index(self):
+        self.assertEqual(self._address._domain, 'example.com')
+        self.assertEqual(
+            sorted(trigram.trigram for trigram in self._address._trigrams),
+            sorted(trigrams('fperson@example.com')))
+
+    def test_search_index_deleted_with_address(self):
+        self._usermgr.delete_address(self._address)
+        self.assertEqual(config.db.store.query(AddressTrigram).count(), 0)
@@ -18,11 +18,18 @@
 """Test Bans and the ban manager."""
 
 import unittest
+import warnings
 
 from mailman.app.lifecycle import create_list
+from mailman.config import config
 from mailman.interfaces.bans import IBanManager
 from mailman.interfaces.listmanager import IListManager
+from mailman.model.bans import BanVersion, GLOBAL_BANS, _BanIndex
+from mailman.testing.helpers import count_queries
 from mailman.testing.layers import ConfigLayer
+from sqlalchemy import text
+from sqlalchemy.orm import Query
+from unittest.mock import patch
 from zope.component import getUtility
 
 
@@ -63,3 +70,115 @@ class TestMailingListBans(unittest.TestCase):
         self.assertEqual(
             [self._manager.bans[i].email for i in range(count)],
             ['ant@example.com', 'bee@example.com', 'cat@example.com'])
+
+
+class TestCompiledBans(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._mlist = create_list('ant@example.com')
+        self._manager = IBanManager(self._mlist)
+        self._global_manager = IBanManager(None)
+        for i in range(100):
+            self._manager.ban('^spam{}-.*@example.com'.format(i))
+        self._manager.ban('anne@example.com')
+        self._global_manager.ban('^.*@example.org')
+
+    def test_one_query_per_check(self):
+        # The first check compiles the list and global bans.
+        self.assertFalse(self._manager.is_banned('bart@example.com'))
+        with count_queries() as statements:
+            self.assertTrue(self._manager.is_banned('anne@example.com'))
+            self.assertTrue(self._manager.is_banned('spam42-x@example.com'))
+            self.assertTrue(self._manager.is_banned('SPAM7-x@example.com'))
+            self.assertTrue(self._manager.is_banned('bart@example.org'))
+            self.assertFalse(self._manager.is_banned('spam@example.com'))
+        # Only the versions of the bans are read.
+        self.assertEqual(len(statements), 5)
+
+    def test_ban_and_unban(self):
+        self.assertFalse(self._manager.is_banned('bart@example.com'))
+        self._manager.ban('^bart@')
+        self.assertTrue(self._manager.is_banned('bart@example.com'))
+        self._manager.unban('^bart@')
+        self.assertFalse(self._manager.is_banned('bart@example.com'))
+        self._global_manager.ban('bart@example.com')
+        self.assertTrue(self._manager.is_banned('bart@example.com'))
+
+    def test_rollback(self):
+        config.db.commit()
+        self._manager.ban('bart@example.com')
+        self.assertTrue(self._manager.is_banned('bart@example.com'))
+        config.db.abort()
+        self.assertFalse(self._manager.is_banned('bart@example.com'))
+
+    def test_changed_by_another_process(self):
+        self.assertFalse(self._manager.is_banned('cris@example.com'))
+        config.db.store.execute(text("""
+            INSERT INTO ban (email, list_id)
+            VALUES ('cris@example.com', 'ant.example.com')
+            """))
+        config.db.store.execute(text("""
+            UPDATE banversion SET version = version + 1
+            WHERE list_id = 'ant.example.com'
+            """))
+        self.assertTrue(self._manager.is_banned('cris@example.com'))
+
+    def test_pattern_with_backreference(self):
+        # Patterns with groups are kept apart from the combined pattern.
+        self._manager.ban('^(.)\\1@example.com')
+        self.assertTrue(self._manager.is_banned('aa@example.com'))
+        self.assertFalse(self._manager.is_banned('ab@example.com'))
+        self.assertTrue(self._manager.is_banned('spam1-x@example.com'))
+
+    def test_pattern_with_inline_flags(self):
+        # Patterns with inline flags are kept apart from the combined
+        # pattern, where the flags would apply to all the others.
+        with warnings.catch_warnings():
+            # The flags aren't at the start of the pattern, after the caret.
+            warnings.simplefilter('ignore', DeprecationWarning)
+            index = _BanIndex(0, [
+                '^(?i)bart@example.com', '^(?=c)cris@example.com',
+                '^anne@example.com', '^dave@example.com'])
+            self.assertEqual(len(index._patterns), 3)
+            self.assertTrue(index.match('BART@example.com'))
+            self.assertTrue(index.match('cris@example.com'))
+            self.assertTrue(index.match('dave@example.com'))
+            self.assertFalse(index.match('elle@example.com'))
+
+    def test_one_version_per_list(self):
+        # Each change bumps the single version of the list or global bans.
+        self._manager.ban('bart@example.com')
+        self._global_manager.ban('bart@example.com')
+        versions = config.db.store.query(BanVersion.list_id).order_by(
+            BanVersion.list_id)
+        self.assertEqual([list_id for (list_id,) in versions],
+                         [GLOBAL_BANS, 'ant.example.com'])
+
+    def test_version_added_concurrently(self):
+        # Another process adds the first version of the global bans after
+        # this one found none; the ban bumps that version instead.
+        config.db.store.query(BanVersion).filter_by(
+            list_id=GLOBAL_BANS).delete()
+        self.assertFalse(self._manager.is_banned('cris@example.com'))
+        first = Query.first
+        calls = []
+
+        def racing_first(query):
+            # Look up the version, then let the other process add it.
+            version = first(query)
+            if len(calls) == 0:
+                calls.append(version)
+                config.db.store.execute(text(
+                    "INSERT INTO banversion (list_id, version) VALUES ('', 0)"
+                    ))
+            return version
+
+        with patch.object(Query, 'first', racing_first):
+            self._global_manager.ban('cris@example.com')
+        self.assertEqual(calls, [None])
+        versions = config.db.store.query(BanVersion).filter_by(
+            list_id=GLOBAL_BANS).all()
+        self.assertEqual(len(versions), 1)
+        self.assertNotEqual(versions[0].version, 0)
+        self.assertTrue(self._manager.is_banned('cris@example.com'))
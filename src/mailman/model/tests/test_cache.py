@@ -20,12 +20,16 @@
 import os
 import unittest
 
+from contextlib import ExitStack
 from datetime import timedelta
 from mailman.config import config
 from mailman.interfaces.cache import ICacheManager
-from mailman.testing.helpers import configuration
+from mailman.model.cache import CacheEntry, memory_cache
+from mailman.testing.helpers import configuration, count_queries
 from mailman.testing.layers import ConfigLayer
-from mailman.utilities.datetime import factory
+from mailman.utilities.datetime import factory, now
+from sqlalchemy import text
+from unittest.mock import patch
 from zope.component import getUtility
 
 
@@ -108,3 +112,109 @@ class TestCache(unittest.TestCase):
         self._cachemgr.clear()
         self.assertIsNone(self._cachemgr.get('abc'))
         self.assertIsNone(self._cachemgr.get('xyz'))
+
+
+class TestMemoryCache(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._cachemgr = getUtility(ICacheManager)
+        # Forget about the evictions done by the other tests, whose clocks
+        # may have been fast forwarded more than ours.
+        self._cachemgr._next_eviction = None
+
+    def test_no_queries_or_reads(self):
+        self._cachemgr.add('abc', 'xyz')
+        config.db.store.flush()
+        with ExitStack() as resources:
+            statements = resources.enter_context(count_queries())
+            mock = resources.enter_context(
+                patch('builtins.open', side_effect=open))
+            self.assertEqual(self._cachemgr.get('abc'), 'xyz')
+        self.assertEqual(statements, [])
+        self.assertFalse(mock.called)
+        self.assertEqual(memory_cache.hits, 1)
+
+    def test_read_through(self):
+        # Entries added by other processes are read from the file.
+        self._cachemgr.add('abc', b'xyz')
+        memory_cache.clear()
+        self.assertEqual(self._cachemgr.get('abc'), b'xyz')
+        self.assertEqual(memory_cache.misses, 1)
+        self.assertEqual(self._cachemgr.get('abc'), b'xyz')
+        self.assertEqual(memory_cache.hits, 1)
+
+    def test_expired_entries(self):
+        # Neither tier returns expired entries.
+        self._cachemgr.add('abc', 'xyz', lifetime=timedelta(minutes=1))
+        factory.fast_forward(days=1)
+        self.assertIsNone(self._cachemgr.get('abc'))
+        memory_cache.clear()
+        self.assertIsNone(self._cachemgr.get('abc'))
+
+    def test_file_evicted_by_another_process(self):
+        file_id = self._cachemgr.add('abc', 'xyz')
+        memory_cache.clear()
+        os.remove(os.path.join(config.CACHE_DIR, 'ba', '78', file_id))
+        self.assertIsNone(self._cachemgr.get('abc'))
+
+    def test_disabled(self):
+        with configuration('mailman', cache_memory_size=0):
+            self._cachemgr.add('abc', 'xyz')
+            self.assertEqual(self._cachemgr.get('abc'), 'xyz')
+        self.assertEqual(len(memory_cache), 0)
+
+    def test_evict_in_bulk(self):
+        file_ids = [
+            self._cachemgr.add(key, 'xyz', lifetime=timedelta(hours=3))
+            for key in ('abc', 'def', 'ghi')
+            ]
+        self._cachemgr.add('jkl', 'uvw', lifetime=timedelta(days=3))
+        factory.fast_forward(days=1)
+        config.db.store.flush()
+        with count_queries() as statements:
+            self._cachemgr.evict()
+        # One query finds the expired entries, and another deletes them.
+        self.assertEqual(len(statements), 2)
+        for file_id in file_ids:
+            file_path = os.path.join(
+                config.CACHE_DIR, file_id[0:2], file_id[2:4], file_id)
+            self.assertFalse(os.path.exists(file_path))
+        self.assertEqual(config.db.store.query(CacheEntry).count(), 1)
+        self.assertEqual(self._cachemgr.get('jkl'), 'uvw')
+
+    def test_evict_refreshed(self):
+        # Another process refreshes an entry after this one found it expired.
+        file_ids = [
+            self._cachemgr.add(key, 'xyz', lifetime=timedelta(hours=3))
+            for key in ('abc', 'def')
+            ]
+        factory.fast_forward(days=1)
+        store = config.db.store
+        query = store.query
+        def refresh_elsewhere(*entities):                       # noqa: E306
+            if entities[0] is CacheEntry:
+                store.execute(text("""
+                    UPDATE file_cache SET expires_on = :expires_on
+                    WHERE key = 'abc'
+                    """), dict(expires_on=now() + timedelta(days=1)))
+            return query(*entities)
+        with patch.object(store, 'query', refresh_elsewhere):
+            self._cachemgr.evict()
+        self.assertEqual(
+            [entry.key for entry in store.query(CacheEntry)], ['abc'])
+        paths = [
+            os.path.join(config.CACHE_DIR, file_id[0:2], file_id[2:4], file_id)
+            for file_id in file_ids
+            ]
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+
+    def test_add_evicts(self):
+        # Adding files evicts the expired ones now and then.
+        self._cachemgr.add('abc', 'xyz', lifetime=timedelta(minutes=1))
+        factory.fast_forward(days=1)
+        self._cachemgr.add('def', 'uvw')
+        self.assertEqual(
+            [entry.key for entry in config.db.store.query(CacheEntry)],
+            ['def'])
@@ -0,0 +1,217 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Test the change log."""
+
+import unittest
+
+from mailman.app.lifecycle import create_list, remove_list
+from mailman.app.moderator import handle_message, hold_message
+from mailman.config import config
+from mailman.interfaces.action import Action
+from mailman.interfaces.changes import (
+    ChangeAction, ChangeKind, ChangesEvictedError, IChangeLog)
+from mailman.interfaces.member import MemberRole
+from mailman.interfaces.requests import RequestType
+from mailman.interfaces.usermanager import IUserManager
+from mailman.model.changes import Change
+from mailman.testing.helpers import (
+    configuration, specialized_message_from_string as mfs)
+from mailman.testing.layers import ConfigLayer
+from mailman.utilities.datetime import factory
+from zope.component import getUtility
+
+
+class TestChangeLog(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._changelog = getUtility(IChangeLog)
+        self._mlist = create_list('ant@example.com')
+        self._anne = getUtility(IUserManager).create_address(
+            'anne@example.com')
+
+    def _summary(self, since=0):
+        return [(change.kind, change.action, change.list_id)
+                for change in self._changelog.since(since)]
+
+    def test_list_lifecycle(self):
+        remove_list(self._mlist)
+        self.assertEqual(self._summary(), [
+            (ChangeKind.mailing_list, ChangeAction.created, 'ant.example.com'),
+            (ChangeKind.mailing_list, ChangeAction.deleted, 'ant.example.com'),
+            ])
+
+    def test_membership(self):
+        token = self._changelog.latest
+        member = self._mlist.subscribe(self._anne, MemberRole.moderator)
+        member.unsubscribe()
+        changes = list(self._changelog.since(token))
+        self.assertEqual(
+            [change.action for change in changes],
+            [ChangeAction.created, ChangeAction.deleted])
+        for change in changes:
+            self.assertEqual(change.kind, ChangeKind.member)
+            self.assertEqual(change.object_id, member.member_id.hex)
+            self.assertEqual(change.email, 'anne@example.com')
+            self.assertEqual(change.role, MemberRole.moderator)
+
+    def test_held_message(self):
+        token = self._changelog.latest
+        msg = mfs("""\
+From: anne@example.com
+To: ant@example.com
+Message-ID: <alpha>
+
+""")
+        request_id = hold_message(self._mlist, msg)
+        handle_message(self._mlist, request_id, Action.discard)
+        changes = list(self._changelog.since(token))
+        self.assertEqual(
+            [change.action for change in changes],
+            [ChangeAction.created, ChangeAction.deleted])
+        for change in changes:
+            self.assertEqual(change.kind, ChangeKind.request)
+            self.assertEqual(change.object_id, str(request_id))
+            self.assertEqual(change.request_type, RequestType.held_message)
+
+    def test_since_and_until(self):
+        first = self._changelog.latest
+        self._mlist.subscribe(self._anne)
+        second = self._changelog.latest
+        create_list('bee@example.com')
+        self.assertEqual(self._summary(first), [
+            (ChangeKind.member, ChangeAction.created, 'ant.example.com'),
+            (ChangeKind.mailing_list, ChangeAction.created, 'bee.example.com'),
+            ])
+        self.assertEqual(
+            [change.token
+             for change in self._changelog.since(0, until=second)],
+            [first, second])
+
+    def _drop(self, token):
+        # Make it look as if the change was never committed.
+        config.db.store.query(Change).filter_by(id=token).delete()
+
+    def _create_lists(self, *names):
+        for name in names:
+            create_list('{}@example.com'.format(name))
+        return self._changelog.latest
+
+    def test_settled(self):
+        token = self._changelog.latest
+        latest = self._create_lists('bee', 'cat')
+        self.assertEqual(self._changelog.settled(token), latest)
+        self.assertEqual(self._changelog.settled(latest), latest)
+
+    def test_settled_before_uncommitted_change(self):
+        # A recent missing change may still be committed, so the changes
+        # after it are not returned yet.
+        token = self._changelog.latest
+        self._create_lists('bee', 'cat', 'dog')
+        self._drop(token + 2)
+        self.assertEqual(self._changelog.settled(token), token + 1)
+
+    def test_settled_after_rolled_back_change(self):
+        token = self._changelog.latest
+        latest = self._create_lists('bee', 'cat', 'dog')
+        self._drop(token + 2)
+        with configuration('mailman', change_compaction='2d'):
+            factory.fast_forward(days=1)
+            self.assertEqual(self._changelog.settled(token), latest)
+
+    def test_settled_after_compacted_change(self):
+        # Compaction only removes changes superseded by later ones, so a
+        # client isn't sent away for missing them.
+        token = self._changelog.latest
+        member = self._mlist.subscribe(self._anne)
+        member.unsubscribe()
+        with configuration('mailman', change_compaction='1h'):
+            factory.fast_forward(days=1)
+            latest = self._create_lists('bee')
+            self._changelog.evict()
+        self.assertEqual(
+            [change.token for change in self._changelog.since(token)],
+            [token + 2, latest])
+        self.assertEqual(self._changelog.settled(token), latest)
+
+    def test_settled_after_evicted_change(self):
+        token = self._changelog.latest
+        horizon = self._create_lists('bee', 'cat')
+        with configuration('mailman', change_retention='1d'):
+            factory.fast_forward(days=2)
+            latest = self._create_lists('dog')
+            self._changelog.evict()
+        # The change to bee is gone, so a client which last saw ant's missed
+        # it.  The client which saw bee's misses nothing.
+        with self.assertRaises(ChangesEvictedError) as cm:
+            self._changelog.settled(token)
+        self.assertEqual(cm.exception.token, token)
+        self.assertEqual(self._changelog.settled(horizon - 1), latest)
+        self.assertEqual(self._changelog.settled(horizon), latest)
+
+    def test_settled_from_scratch(self):
+        # A client without a token has nothing to miss.
+        latest = self._create_lists('bee')
+        self._drop(1)
+        factory.fast_forward(days=1)
+        self.assertEqual(self._changelog.settled(0), latest)
+
+    def test_settled_future_token(self):
+        # The token is from before the log was emptied.
+        with self.assertRaises(ChangesEvictedError):
+            self._changelog.settled(self._changelog.latest + 1)
+
+    def test_evict_expired(self):
+        # The most recent expired change is kept to mark the eviction.
+        create_list('bee@example.com')
+        with configuration('mailman', change_retention='1d'):
+            factory.fast_forward(days=2)
+            create_list('cat@example.com')
+            self._changelog.evict()
+        self.assertEqual(self._summary(), [
+            (ChangeKind.mailing_list, ChangeAction.created, 'bee.example.com'),
+            (ChangeKind.mailing_list, ChangeAction.created, 'cat.example.com'),
+            ])
+
+    def test_compaction_keeps_oldest(self):
+        member = self._mlist.subscribe(self._anne)
+        member.unsubscribe()
+        oldest = self._changelog.latest - 1
+        config.db.store.query(Change).filter(Change.id < oldest).delete()
+        with configuration('mailman', change_compaction='1h'):
+            factory.fast_forward(days=1)
+            self._changelog.evict()
+        self.assertEqual(
+            [change.token for change in self._changelog.since(0)],
+            [oldest, oldest + 1])
+
+    def test_compaction(self):
+        # Only the latest change to each object survives compaction.
+        member = self._mlist.subscribe(self._anne)
+        member.unsubscribe()
+        with configuration('mailman', change_compaction='1h'):
+            factory.fast_forward(days=1)
+            self._mlist.subscribe(
+                getUtility(IUserManager).create_address('bart@example.com'))
+            self._changelog.evict()
+        summary = [(change.kind, change.action, change.email)
+                   for change in self._changelog.since(0)]
+        self.assertEqual(summary, [
+            (ChangeKind.mailing_list, ChangeAction.created, None),
+            (ChangeKind.member, ChangeAction.deleted, 'anne@example.com'),
+            (ChangeKind.member, ChangeAction.created, 'bart@example.com'),
+            ])
@@ -20,12 +20,13 @@
 import unittest
 
 from mailman.app.lifecycle import create_list
+from mailman.config import config
 from mailman.interfaces.domain import (
     DomainCreatedEvent, DomainCreatingEvent, DomainDeletedEvent,
     DomainDeletingEvent, IDomainManager)
 from mailman.interfaces.listmanager import IListManager
 from mailman.interfaces.usermanager import IUserManager
-from mailman.testing.helpers import event_subscribers
+from mailman.testing.helpers import count_queries, event_subscribers
 from mailman.testing.layers import ConfigLayer
 from zope.component import getUtility
 
@@ -164,6 +165,23 @@ class TestDomainManager(unittest.TestCase):
         self.assertEqual([owner.addresses[0].email for owner in domain.owners],
                          ['anne@example.org', 'bart@example.net'])
 
+    def test_get_is_cached(self):
+        # Within a transaction, looking up a domain again needs no queries.
+        domain = self._manager['example.com']
+        with count_queries() as statements:
+            self.assertIs(self._manager['example.com'], domain)
+            self.assertIs(self._manager.get('example.com'), domain)
+        self.assertEqual(statements, [])
+        # After a commit, the domain is loaded again.
+        config.db.commit()
+        self.assertIs(self._manager['example.com'], domain)
+
+    def test_get_removed_domain(self):
+        self._manager['example.com']
+        self._manager.remove('example.com')
+        self.assertIsNone(self._manager.get('example.com'))
+        self.assertRaises(KeyError, self._manager.__getitem__, 'example.com')
+
 
 class TestDomainLifecycleEvents(unittest.TestCase):
     layer = ConfigLayer
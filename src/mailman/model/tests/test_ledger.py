@@ -0,0 +1,100 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Test the delivery ledger."""
+
+import unittest
+
+from mailman.config import config
+from mailman.interfaces.ledger import IDeliveryLedger
+from mailman.model.ledger import Delivery
+from mailman.testing.helpers import configuration
+from mailman.testing.layers import ConfigLayer
+from mailman.utilities.datetime import factory, now
+from sqlalchemy import text
+from unittest.mock import patch
+from zope.component import getUtility
+
+
+class TestDeliveryLedger(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._ledger = getUtility(IDeliveryLedger)
+
+    def test_claim(self):
+        self.assertEqual(self._ledger.claim(
+            'AAA', ['anne@example.com', 'bart@example.com']), set())
+        self.assertEqual(self._ledger.claim(
+            'AAA', ['bart@example.com', 'cris@example.com']),
+            {'bart@example.com'})
+        self.assertEqual(self._ledger.claim(
+            'AAA', ['anne@example.com', 'cris@example.com']),
+            {'anne@example.com', 'cris@example.com'})
+        # Other messages are not affected.
+        self.assertEqual(self._ledger.claim(
+            'BBB', ['anne@example.com']), set())
+
+    def test_claimed_concurrently(self):
+        # Another process claims one of the addresses after this one looked
+        # up the deliveries of the message.
+        store = config.db.store
+        begin_nested = store.begin_nested
+        def claim_elsewhere():                                  # noqa: E306
+            if store.query(Delivery).count() == 0:
+                store.execute(text("""
+                    INSERT INTO delivery
+                        (message_id_hash, email, delivered_on)
+                    VALUES ('AAA', 'bart@example.com', :delivered_on)
+                    """), dict(delivered_on=now()))
+            return begin_nested()
+        with patch.object(store, 'begin_nested', claim_elsewhere):
+            self.assertEqual(self._ledger.claim(
+                'AAA', ['anne@example.com', 'bart@example.com']),
+                {'bart@example.com'})
+        # The failed insert didn't undo the rest of the transaction.
+        self.assertEqual(self._ledger.claim(
+            'BBB', ['bart@example.com']), set())
+        config.db.commit()
+        self.assertEqual(sorted(store.query(
+            Delivery.message_id_hash, Delivery.email)), [
+                ('AAA', 'anne@example.com'),
+                ('AAA', 'bart@example.com'),
+                ('BBB', 'bart@example.com'),
+                ])
+
+    def test_claim_nobody(self):
+        self.assertEqual(self._ledger.claim('AAA', []), set())
+
+    @configuration('mailman', delivery_ledger_lifetime='1h')
+    def test_lifetime(self):
+        self._ledger.claim('AAA', ['anne@example.com'])
+        factory.fast_forward(days=1)
+        self.assertEqual(self._ledger.claim('AAA', ['anne@example.com']),
+                         set())
+        self.assertEqual(self._ledger.claim('AAA', ['anne@example.com']),
+                         {'anne@example.com'})
+
+    @configuration('mailman', delivery_ledger_lifetime='1h')
+    def test_evict(self):
+        self._ledger.claim('AAA', ['anne@example.com'])
+        factory.fast_forward(days=1)
+        self._ledger.claim('BBB', ['anne@example.com'])
+        self._ledger.evict()
+        self.assertEqual(
+            [message_id_hash for (message_id_hash,) in config.db.store.query(
+                Delivery.message_id_hash)],
+            ['BBB'])
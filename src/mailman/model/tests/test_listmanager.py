@@ -34,10 +34,13 @@ from mailman.interfaces.pending import IPendable, IPendings
 from mailman.interfaces.requests import IListRequests
 from mailman.interfaces.subscriptions import ISubscriptionService
 from mailman.interfaces.usermanager import IUserManager
+from mailman.model.listmanager import LIST_CACHE
 from mailman.model.mime import ContentFilter
 from mailman.testing.helpers import (
-    event_subscribers, specialized_message_from_string)
+    configuration, count_queries, event_subscribers,
+    specialized_message_from_string)
 from mailman.testing.layers import ConfigLayer
+from sqlalchemy import text
 from zope.component import getUtility
 from zope.interface import implementer
 
@@ -267,3 +270,101 @@ class TestListCreation(unittest.TestCase):
         with self.assertRaises(InvalidEmailAddressError) as cm:
             self._manager.create('foo')
         self.assertEqual(cm.exception.email, 'foo')
+
+
+class TestListCache(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._manager = getUtility(IListManager)
+        create_list('ant@example.com')
+        config.db.commit()
+
+    def test_no_queries_within_a_transaction(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        mlist.domain
+        with count_queries() as statements:
+            self.assertIs(
+                self._manager.get_by_list_id('ant.example.com'), mlist)
+            self.assertEqual(mlist.display_name, 'Ant')
+            self.assertIs(
+                getUtility(IDomainManager)['example.com'], mlist.domain)
+        self.assertEqual(statements, [])
+
+    def test_revalidated_after_commit(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        config.db.commit()
+        with count_queries() as statements:
+            self.assertIs(
+                self._manager.get_by_list_id('ant.example.com'), mlist)
+            self.assertEqual(mlist.display_name, 'Ant')
+        # Only the version is read back, not the whole row.
+        queries = [statement for statement in statements
+                   if 'FROM mailinglist' in statement]
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('display_name', queries[0])
+
+    def test_write_bumps_version(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        version = mlist.config_version
+        mlist.display_name = 'Aardvark'
+        config.db.commit()
+        self.assertEqual(mlist.config_version, version + 1)
+        # Reading the list does not bump the version.
+        self.assertEqual(mlist.display_name, 'Aardvark')
+        config.db.commit()
+        self.assertEqual(mlist.config_version, version + 1)
+
+    def test_rollback_restores_columns(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        mlist.display_name = 'Aardvark'
+        mlist.acceptable_aliases = ['ant@example.org']
+        config.db.abort()
+        self.assertIs(self._manager.get_by_list_id('ant.example.com'), mlist)
+        self.assertEqual(mlist.display_name, 'Ant')
+
+    def test_changed_elsewhere(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        config.db.commit()
+        # Another process updates the list, bumping its version.
+        config.db.store.execute(text("""
+            UPDATE mailinglist
+            SET display_name = 'Aardvark',
+                config_version = config_version + 1
+            """))
+        config.db.commit()
+        self.assertIs(self._manager.get_by_list_id('ant.example.com'), mlist)
+        self.assertEqual(mlist.display_name, 'Aardvark')
+
+    def test_deleted_list(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        self._manager.delete(mlist)
+        self.assertIsNone(self._manager.get_by_list_id('ant.example.com'))
+        config.db.commit()
+        self.assertIsNone(self._manager.get_by_list_id('ant.example.com'))
+
+    def test_recreated_list(self):
+        mlist = self._manager.get_by_list_id('ant.example.com')
+        config.db.commit()
+        # Another process deletes the list and creates it again.
+        config.db.store.execute(text('DELETE FROM mailinglist'))
+        config.db.commit()
+        create_list('ant@example.com')
+        config.db.commit()
+        self.assertIsNot(
+            self._manager.get_by_list_id('ant.example.com'), mlist)
+
+    def test_cache_size(self):
+        # Only the most recently used lists are kept.
+        create_list('bee@example.com')
+        config.db.commit()
+        with configuration('mailman', list_cache_size='1'):
+            self._manager.get_by_list_id('ant.example.com')
+            self._manager.get_by_list_id('bee.example.com')
+            self.assertEqual(len(config.db.store.info[LIST_CACHE]), 1)
+            mlist = self._manager.get_by_list_id('ant.example.com')
+            self.assertEqual(len(config.db.store.info[LIST_CACHE]), 1)
+            with count_queries() as statements:
+                self.assertIs(
+                    self._manager.get_by_list_id('ant.example.com'), mlist)
+            self.assertEqual(statements, [])
@@ -29,9 +29,10 @@ from mailman.interfaces.member import (
     AlreadySubscribedError, MemberRole, MissingPreferredAddressError)
 from mailman.interfaces.usermanager import IUserManager
 from mailman.testing.helpers import (
-    configuration, get_queue_messages, set_preferred)
+    configuration, count_queries, get_queue_messages, set_preferred)
 from mailman.testing.layers import ConfigLayer
 from mailman.utilities.datetime import now
+from sqlalchemy import inspect
 from zope.component import getUtility
 
 
@@ -106,6 +107,41 @@ class TestMailingList(unittest.TestCase):
         self.assertEqual(True, self._mlist.is_subscribed(address))
 
 
+class TestDeferredColumns(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        mlist = create_list('ant@example.com')
+        mlist.topics = [('cats', 'meow', 'Cat talk', False)]
+        mlist.accept_these_nonmembers = ['anne@example.com']
+        config.db.commit()
+        # Start over with a freshly loaded list.
+        config.db.store.expunge_all()
+        self._mlist = getUtility(IListManager).get('ant@example.com')
+
+    def test_groups_not_loaded(self):
+        unloaded = inspect(self._mlist).unloaded
+        self.assertIn('topics', unloaded)
+        self.assertIn('autoresponse_postings_text', unloaded)
+        self.assertIn('bounce_score_threshold', unloaded)
+        self.assertIn('hold_these_nonmembers', unloaded)
+        self.assertNotIn('display_name', unloaded)
+        self.assertNotIn('posting_pipeline', unloaded)
+
+    def test_group_loaded_on_access(self):
+        with count_queries() as statements:
+            self.assertEqual(self._mlist.topics,
+                             [['cats', 'meow', 'Cat talk', False]])
+            self.assertEqual(self._mlist.topics_bodylines_limit, 5)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('hold_these_nonmembers', inspect(self._mlist).unloaded)
+
+    def test_legacy_nonmember_lists(self):
+        self.assertEqual(self._mlist.accept_these_nonmembers,
+                         ['anne@example.com'])
+        self.assertEqual(self._mlist.hold_these_nonmembers, [])
+
+
 class TestListArchiver(unittest.TestCase):
     layer = ConfigLayer
 
@@ -0,0 +1,96 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Test the index of recently accepted messages."""
+
+import unittest
+
+from mailman.app.lifecycle import create_list, remove_list
+from mailman.config import config
+from mailman.interfaces.recentmessages import IRecentMessages
+from mailman.model.recentmessages import RecentMessage
+from mailman.testing.helpers import configuration
+from mailman.testing.layers import ConfigLayer
+from mailman.utilities.datetime import factory, now
+from sqlalchemy import text
+from zope.component import getUtility
+
+
+class TestRecentMessages(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._recent = getUtility(IRecentMessages)
+
+    def _hashes(self, list_id):
+        return sorted(
+            message_id_hash for (message_id_hash,) in config.db.store.query(
+                RecentMessage.message_id_hash).filter_by(list_id=list_id))
+
+    def test_duplicate(self):
+        self.assertTrue(self._recent.record('ant.example.com', 'AAA'))
+        self.assertFalse(self._recent.record('ant.example.com', 'AAA'))
+        # The index is per mailing list.
+        self.assertTrue(self._recent.record('bee.example.com', 'AAA'))
+        self.assertTrue(self._recent.record('ant.example.com', 'BBB'))
+
+    def test_recorded_concurrently(self):
+        # Another process recorded the message after this one looked for
+        # expired copies of it.
+        config.db.store.execute(text("""
+            INSERT INTO recentmessage (list_id, message_id_hash, accepted_on)
+            VALUES ('ant.example.com', 'AAA', :accepted_on)
+            """), dict(accepted_on=now()))
+        self.assertFalse(self._recent.record('ant.example.com', 'AAA'))
+        self.assertEqual(self._hashes('ant.example.com'), ['AAA'])
+        # The failed insert didn't undo the rest of the transaction.
+        self.assertTrue(self._recent.record('ant.example.com', 'BBB'))
+        config.db.commit()
+        self.assertEqual(self._hashes('ant.example.com'), ['AAA', 'BBB'])
+
+    @configuration('mta', lmtp_duplicate_window='1h')
+    def test_window(self):
+        self.assertTrue(self._recent.record('ant.example.com', 'AAA'))
+        factory.fast_forward(days=1)
+        self.assertTrue(self._recent.record('ant.example.com', 'AAA'))
+        self.assertFalse(self._recent.record('ant.example.com', 'AAA'))
+        # The expired record was renewed rather than added to.
+        self.assertEqual(self._hashes('ant.example.com'), ['AAA'])
+
+    @configuration('mta', lmtp_duplicate_window='1h')
+    def test_evict_expired(self):
+        self._recent.record('ant.example.com', 'AAA')
+        factory.fast_forward(days=1)
+        self._recent.record('ant.example.com', 'BBB')
+        self._recent.evict()
+        self.assertEqual(self._hashes('ant.example.com'), ['BBB'])
+
+    @configuration('mta', lmtp_duplicate_limit='2')
+    def test_evict_oldest(self):
+        for message_id_hash in ('AAA', 'BBB', 'CCC', 'DDD'):
+            self._recent.record('ant.example.com', message_id_hash)
+        self._recent.record('bee.example.com', 'AAA')
+        self._recent.evict()
+        self.assertEqual(self._hashes('ant.example.com'), ['CCC', 'DDD'])
+        self.assertEqual(self._hashes('bee.example.com'), ['AAA'])
+        # A message which was forgotten is no longer a duplicate.
+        self.assertTrue(self._recent.record('ant.example.com', 'AAA'))
+
+    def test_deleted_list(self):
+        mlist = create_list('ant@example.com')
+        self._recent.record('ant.example.com', 'AAA')
+        remove_list(mlist)
+        self.assertEqual(self._hashes('ant.example.com'), [])
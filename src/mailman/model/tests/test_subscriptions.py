@@ -20,8 +20,9 @@
 import unittest
 
 from mailman.app.lifecycle import create_list
+from mailman.interfaces.action import Action
 from mailman.interfaces.listmanager import NoSuchListError
-from mailman.interfaces.member import MemberRole
+from mailman.interfaces.member import DeliveryMode, DeliveryStatus, MemberRole
 from mailman.interfaces.subscriptions import (
     ISubscriptionService, TooManyMembersError)
 from mailman.interfaces.usermanager import IUserManager
@@ -512,3 +513,116 @@ class TestSubscriptionService(unittest.TestCase):
         # Search for the user.
         members = self._service.find_members(anne.user_id)
         self.assertEqual(len(members), 2)
+
+    def test_count_members(self):
+        bee = create_list('bee@example.com')
+        create_list('cat@example.com')
+        for email in ('anne@example.com', 'bart@example.com'):
+            address = self._user_manager.create_address(email)
+            self._mlist.subscribe(address)
+            bee.subscribe(address, MemberRole.owner)
+        self._mlist.subscribe(
+            self._user_manager.create_address('cris@example.com'))
+        self.assertEqual(self._service.count_members(),
+                         {'test.example.com': 3})
+        self.assertEqual(
+            self._service.count_members(role=MemberRole.owner),
+            {'bee.example.com': 2})
+        self.assertEqual(
+            self._service.count_members(['bee.example.com']), {})
+        self.assertEqual(self._service.count_members([]), {})
+
+    def _emails(self, **kws):
+        return [member.address.email
+                for member in self._service.find_members(**kws)]
+
+    def test_find_members_substring(self):
+        for email in ('anne@example.com', 'anna@example.com',
+                      'banner@example.org', 'bart@example.org'):
+            self._mlist.subscribe(self._user_manager.create_address(email))
+        self.assertEqual(self._emails(subscriber='*anne*'),
+                         ['anne@example.com', 'banner@example.org'])
+        self.assertEqual(self._emails(subscriber='ann*@*.com'),
+                         ['anna@example.com', 'anne@example.com'])
+        # Fragments too short to have any trigrams still match.
+        self.assertEqual(self._emails(subscriber='*rt*'),
+                         ['bart@example.org'])
+        # An underscore is still a single character wildcard.
+        self.assertEqual(self._emails(subscriber='an_e*'),
+                         ['anne@example.com'])
+
+    def test_find_members_by_domain(self):
+        for email in ('anne@example.com', 'bart@example.org',
+                      'cris@sub.example.org'):
+            self._mlist.subscribe(self._user_manager.create_address(email))
+        self.assertEqual(self._emails(domain='EXAMPLE.org'),
+                         ['bart@example.org'])
+        self.assertEqual(self._emails(subscriber='*@example.org'),
+                         ['bart@example.org'])
+        self.assertEqual(self._emails(subscriber='*example.org'),
+                         ['bart@example.org', 'cris@sub.example.org'])
+
+    def test_find_members_by_delivery_mode(self):
+        anne = self._user_manager.create_address('anne@example.com')
+        bart = self._user_manager.create_user('bart@example.com')
+        cris = self._user_manager.create_address('cris@example.com')
+        dave = self._user_manager.create_address('dave@example.com')
+        # Anne's own membership preference.
+        member = self._mlist.subscribe(anne)
+        member.preferences.delivery_mode = DeliveryMode.mime_digests
+        # Bart's user preference, through his preferred address.
+        set_preferred(bart)
+        bart.preferences.delivery_mode = DeliveryMode.mime_digests
+        self._mlist.subscribe(bart)
+        # Cris's address preference, which his membership overrides.
+        cris.preferences.delivery_mode = DeliveryMode.mime_digests
+        member = self._mlist.subscribe(cris)
+        member.preferences.delivery_mode = DeliveryMode.plaintext_digests
+        # Dave gets the system default.
+        self._mlist.subscribe(dave)
+        self.assertEqual(
+            self._emails(delivery_mode=DeliveryMode.mime_digests),
+            ['anne@example.com', 'bart@example.com'])
+        self.assertEqual(
+            self._emails(delivery_mode=DeliveryMode.regular),
+            ['dave@example.com'])
+        self.assertEqual(
+            self._emails(delivery_mode=[DeliveryMode.regular,
+                                        DeliveryMode.plaintext_digests]),
+            ['cris@example.com', 'dave@example.com'])
+
+    def test_find_members_by_delivery_status(self):
+        for email in ('anne@example.com', 'bart@example.com'):
+            self._mlist.subscribe(self._user_manager.create_address(email))
+        self._mlist.members.get_member(
+            'bart@example.com').preferences.delivery_status = (
+            DeliveryStatus.by_bounces)
+        self.assertEqual(
+            self._emails(delivery_status=DeliveryStatus.by_bounces),
+            ['bart@example.com'])
+        self.assertEqual(
+            self._emails(list_id='test.example.com',
+                         delivery_status=DeliveryStatus.enabled),
+            ['anne@example.com'])
+
+    def test_find_members_by_moderation_action(self):
+        self._mlist.default_member_action = Action.defer
+        self._mlist.default_nonmember_action = Action.hold
+        for email in ('anne@example.com', 'bart@example.com'):
+            self._mlist.subscribe(self._user_manager.create_address(email))
+        self._mlist.members.get_member(
+            'bart@example.com').moderation_action = Action.discard
+        self._mlist.subscribe(
+            self._user_manager.create_address('cris@example.com'),
+            MemberRole.nonmember)
+        self._mlist.subscribe(
+            self._user_manager.create_address('dave@example.com'),
+            MemberRole.owner)
+        self.assertEqual(self._emails(moderation_action=Action.defer),
+                         ['anne@example.com'])
+        self.assertEqual(self._emails(moderation_action=Action.discard),
+                         ['bart@example.com'])
+        self.assertEqual(self._emails(moderation_action=Action.hold),
+                         ['cris@example.com'])
+        self.assertEqual(self._emails(moderation_action=Action.accept),
+                         ['dave@example.com'])
@@ -17,6 +17,7 @@
 
 """Test the template manager."""
 
+import os
 import unittest
 import threading
 
@@ -26,11 +27,15 @@ from mailman.app.lifecycle import create_list
 from mailman.config import config
 from mailman.interfaces.domain import IDomainManager
 from mailman.interfaces.template import ITemplateLoader, ITemplateManager
-from mailman.testing.helpers import wait_for_webservice
+from mailman.model.template import template_cache
+from mailman.testing.helpers import (
+    configuration, count_queries, wait_for_webservice)
 from mailman.testing.layers import ConfigLayer
+from mailman.utilities.datetime import factory
 from mailman.utilities.i18n import find
 from requests import HTTPError
 from tempfile import TemporaryDirectory
+from unittest.mock import patch
 from urllib.error import URLError
 from zope.component import getUtility
 
@@ -261,6 +266,116 @@ class TestTemplateLoader(unittest.TestCase):
         self.assertRaises(URLError, self._loader.get, 'forbidden', self._mlist)
 
 
+class TestResolvedTemplateCache(unittest.TestCase):
+    """Test the in-memory cache of resolved templates."""
+
+    layer = HTTPLayer
+
+    def setUp(self):
+        resources = ExitStack()
+        self.addCleanup(resources.close)
+        self._var_dir = resources.enter_context(TemporaryDirectory())
+        config.push('template config', """\
+        [paths.testing]
+        var_dir: {}
+        """.format(self._var_dir))
+        resources.callback(config.pop, 'template config')
+        resources.enter_context(
+            configuration('mailman', template_cache_size=10))
+        template_cache.clear()
+        resources.callback(template_cache.clear)
+        self._mlist = create_list('test@example.com')
+        self._loader = getUtility(ITemplateLoader)
+        self._manager = getUtility(ITemplateManager)
+
+    def _write(self, text):
+        # Override the site's welcome message on the file system.
+        path = os.path.join(
+            self._var_dir, 'templates', 'site', 'en',
+            'list:user:notice:welcome.txt')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(text)
+
+    def test_no_queries_or_searches(self):
+        self._manager.set(
+            'list:user:notice:goodbye', None,
+            'http://localhost:8180/welcome_2.txt')
+        self._loader.get('list:user:notice:welcome', self._mlist)
+        self._loader.get('list:user:notice:goodbye', self._mlist)
+        config.db.store.flush()
+        with ExitStack() as resources:
+            statements = resources.enter_context(count_queries())
+            mock = resources.enter_context(
+                patch('mailman.model.template.find', side_effect=find))
+            welcome = self._loader.get(
+                'list:user:notice:welcome', self._mlist)
+            goodbye = self._loader.get(
+                'list:user:notice:goodbye', self._mlist)
+        self.assertEqual(statements, [])
+        self.assertFalse(mock.called)
+        self.assertEqual(welcome[:14], 'Welcome to the')
+        self.assertEqual(goodbye, WELCOME_2)
+        self.assertEqual(template_cache.hits, 4)
+
+    def test_set_invalidates(self):
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist)[:14],
+            'Welcome to the')
+        self._manager.set(
+            'list:user:notice:welcome', self._mlist.list_id,
+            'http://localhost:8180/welcome_2.txt')
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist),
+            WELCOME_2)
+
+    def test_delete_invalidates(self):
+        self._manager.set(
+            'list:user:notice:welcome', self._mlist.list_id,
+            'http://localhost:8180/welcome_2.txt')
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist),
+            WELCOME_2)
+        self._manager.delete('list:user:notice:welcome', self._mlist.list_id)
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist)[:14],
+            'Welcome to the')
+
+    def test_substitutions(self):
+        # The template's uri is expanded before looking up its contents.
+        self._manager.set(
+            'list:user:notice:welcome', None,
+            'http://localhost:8180/$where/welcome_4.txt')
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', where='example.com'),
+            WELCOME_4)
+        # This one doesn't exist.
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', where='example.org'),
+            '')
+
+    def test_entries_expire(self):
+        self._loader.get('list:user:notice:welcome', self._mlist)
+        # Changes to the files go unnoticed until the entry expires.
+        self._write('Welcome from the site.\n')
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist)[:14],
+            'Welcome to the')
+        factory.fast_forward(days=1)
+        self.assertEqual(
+            self._loader.get('list:user:notice:welcome', self._mlist),
+            'Welcome from the site.\n')
+
+    def test_disabled(self):
+        with configuration('mailman', template_cache_size=0):
+            self._loader.get('list:user:notice:welcome', self._mlist)
+            self._write('Welcome from the site.\n')
+            self.assertEqual(
+                self._loader.get('list:user:notice:welcome', self._mlist),
+                'Welcome from the site.\n')
+        self.assertEqual(len(template_cache), 0)
+
+
 # Response texts.
 WELCOME_1 = """\
 Welcome to the {fqdn_listname} mailing list!
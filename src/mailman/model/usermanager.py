@@ -27,6 +27,7 @@ from mailman.model.member import Member
 from mailman.model.preferences import Preferences
 from mailman.model.user import User
 from public import public
+from sqlalchemy.orm import joinedload
 from zope.interface import implementer
 
 
@@ -147,7 +148,9 @@ class UserManager:
     @dbconnection
     def addresses(self, store):
         """See `IUserManager`."""
-        yield from store.query(Address).all()
+        # The linked user is nearly always wanted along with the address.
+        yield from store.query(Address).options(
+            joinedload(Address.user)).all()
 
     @property
     @dbconnection
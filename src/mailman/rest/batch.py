@@ -0,0 +1,170 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""REST for batches of requests."""
+
+import json
+import logging
+
+from io import BytesIO
+from mailman.config import config
+from mailman.rest.helpers import bad_request, etag, okay
+from public import public
+from urllib.parse import urlencode
+
+
+log = logging.getLogger('mailman.http')
+
+
+# The request headers which are passed on to the sub-requests.
+INHERITED_HEADERS = ('HTTP_AUTHORIZATION', 'HTTP_HOST')
+METHODS = ('DELETE', 'GET', 'PATCH', 'POST', 'PUT')
+
+
+def _decode(body):
+    if len(body) == 0:
+        return None
+    text = body.decode('utf-8')
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+@public
+class Batch:
+    """/batch
+
+    The body of the request is a JSON array of sub-requests, each an object
+    with a `method`, a `path` which may include a query string, and optional
+    form `data`.  The sub-requests are dispatched in order, all within a
+    single database transaction, and the response gives the status, headers
+    and decoded body of each of them.
+
+    By default, the changes made by the successful sub-requests are committed
+    even when others fail.  Each sub-request then runs in its own savepoint,
+    so a failing one leaves none of its changes behind, and one raising an
+    exception is reported as a 500 error.  With the `atomic` parameter, the
+    first failing sub-request aborts the transaction and no further
+    sub-requests are dispatched.
+    """
+
+    def _validate(self, operations):
+        if not isinstance(operations, list):
+            raise ValueError('Expected an array of requests')
+        if len(operations) > int(config.webservice.max_batch_size):
+            raise ValueError('Too many requests: {}'.format(len(operations)))
+        for operation in operations:
+            if not isinstance(operation, dict):
+                raise ValueError('Expected a request object')
+            extras = set(operation) - {'method', 'path', 'data'}
+            if len(extras) > 0:
+                raise ValueError('Unexpected request keys: {}'.format(
+                    ', '.join(sorted(extras))))
+            method = operation.get('method', 'GET')
+            if not isinstance(method, str) or method.upper() not in METHODS:
+                raise ValueError('Invalid method: {}'.format(method))
+            path = operation.get('path')
+            if not isinstance(path, str) or not path.startswith('/'):
+                raise ValueError('Invalid path: {}'.format(path))
+            if not isinstance(operation.get('data', {}), dict):
+                raise ValueError('Invalid data for: {}'.format(path))
+
+    def _environ(self, request, method, path, data):
+        environ = {
+            key: value for key, value in request.env.items()
+            if not key.startswith(('HTTP_', 'CONTENT_', 'mailman.'))
+            or key in INHERITED_HEADERS
+            }
+        path, question, query = path.partition('?')
+        body = urlencode(data, doseq=True).encode('utf-8')
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'mailman.batch': True,
+            })
+        return environ
+
+    def _dispatch_apart(self, dispatch, environ):
+        # Dispatch the sub-request in a savepoint, so that if it fails, its
+        # changes are rolled back and those of the others are kept.
+        savepoint = config.db.store.begin_nested()
+        try:
+            status, headers, body = dispatch(environ)
+        except Exception:
+            log.exception('REST server exception during batch request %s',
+                          environ['PATH_INFO'])
+            savepoint.rollback()
+            status = '500 Internal Server Error'
+            return status, [], status.encode('utf-8')
+        if int(status.split()[0]) >= 400:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+        return status, headers, body
+
+    def on_post(self, request, response):
+        """Dispatch a batch of requests."""
+        if request.env.get('mailman.batch', False):
+            bad_request(response, 'Batch requests cannot be nested')
+            return
+        # Allow falcon's HTTPBadRequest exceptions to percolate up.  They'll
+        # get turned into HTTP 400 errors.
+        atomic = request.get_param_as_bool('atomic')
+        try:
+            operations = json.loads(
+                request.bounded_stream.read().decode('utf-8'))
+            self._validate(operations)
+        except ValueError as error:
+            bad_request(response, str(error))
+            return
+        dispatch = request.env['mailman.dispatch']
+        writes = request.env.setdefault('mailman.writes', [])
+        entries = []
+        committed = True
+        for operation in operations:
+            method = operation.get('method', 'GET').upper()
+            environ = self._environ(
+                request, method, operation['path'], operation.get('data', {}))
+            if atomic:
+                status, headers, body = dispatch(environ)
+            else:
+                status, headers, body = self._dispatch_apart(
+                    dispatch, environ)
+            code = int(status.split()[0])
+            entries.append(dict(
+                status=code,
+                headers=dict(headers),
+                body=_decode(body),
+                ))
+            if method != 'GET':
+                # The cached representations of the resources this changed
+                # are dropped again once the batch is committed.
+                writes.append(environ['PATH_INFO'])
+            if atomic and code >= 400:
+                config.db.abort()
+                committed = False
+                break
+        okay(response, etag(dict(
+            start=0,
+            total_size=len(entries),
+            entries=entries,
+            committed=committed,
+            )))
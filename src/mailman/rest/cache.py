@@ -0,0 +1,85 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A cache of serialized REST representations."""
+
+from mailman.interfaces.domain import DomainCreatedEvent, DomainDeletedEvent
+from mailman.interfaces.listmanager import ListCreatedEvent, ListDeletedEvent
+from mailman.interfaces.member import MembershipChangeEvent
+from mailman.utilities.lru import LRUCache
+from public import public
+from types import GeneratorType
+
+
+@public
+class ResponseCache(LRUCache):
+    """A size-bounded LRU cache of the JSON representations of resources.
+
+    Keys are tuples whose first item names the group of resources the
+    representation depends on, e.g. 'lists' or 'domains'.  Entries expire
+    after `[webservice]cache_lifetime`, which bounds how long changes made
+    outside of the REST server, e.g. by the command line or the runners, go
+    unseen.
+
+    Collections are keyed apart from the single resources of their group,
+    and streamed collections, which can only be sent once, are not cached.
+    Neither are representations rendered while a write to their group was
+    committed, which could have read the data from before the write.
+    """
+
+    def __init__(self):
+        super().__init__('webservice')
+
+    def put(self, key, value, expiration=None, generation=None):
+        """See `LRUCache`."""
+        if not isinstance(value, GeneratorType):
+            super().put(key, value, expiration, generation)
+
+
+response_cache = ResponseCache()
+public(response_cache=response_cache)
+
+
+@public
+def handle_DomainCreatedEvent(event):
+    if isinstance(event, DomainCreatedEvent):
+        response_cache.invalidate('domains')
+
+
+@public
+def handle_DomainDeletedEvent(event):
+    if isinstance(event, DomainDeletedEvent):
+        response_cache.invalidate('domains')
+
+
+@public
+def handle_ListCreatedEvent(event):
+    if isinstance(event, ListCreatedEvent):
+        response_cache.invalidate('lists')
+
+
+@public
+def handle_ListDeletedEvent(event):
+    if isinstance(event, ListDeletedEvent):
+        response_cache.invalidate('lists')
+
+
+@public
+def handle_MembershipChangeEvent(event):
+    # The mailing list representations include the number of members.
+    if isinstance(event, MembershipChangeEvent):
+        response_cache.invalidate('lists')
@@ -0,0 +1,133 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""REST for the change log."""
+
+import time
+
+from lazr.config import as_timedelta
+from mailman.config import config
+from mailman.interfaces.changes import (
+    ChangeKind, ChangesEvictedError, IChangeLog)
+from mailman.rest.helpers import (
+    CollectionMixin, bad_request, etag, gone, okay)
+from mailman.rest.validator import Validator, integer_ge_zero_validator
+from public import public
+from uuid import UUID
+from zope.component import getUtility
+
+
+@public
+class Changes(CollectionMixin):
+    """/changes?since=<token>"""
+
+    def __init__(self):
+        self._changes = None
+
+    def _resource_as_dict(self, change):
+        """See `CollectionMixin`."""
+        resource = dict(
+            token=change.token,
+            created_on=change.created_on,
+            kind=change.kind,
+            action=change.action,
+            list_id=change.list_id,
+            )
+        if change.kind is ChangeKind.member:
+            resource['member_id'] = self.api.from_uuid(
+                UUID(change.object_id))
+            resource['email'] = change.email
+            resource['role'] = change.role
+        elif change.kind is ChangeKind.request:
+            resource['request_id'] = int(change.object_id)
+            resource['type'] = change.request_type
+        return resource
+
+    def _get_collection(self, request):
+        """See `CollectionMixin`."""
+        return self._changes
+
+    def _paginate(self, request, collection):
+        """See `CollectionMixin`."""
+        # The number of changes returned is limited by the token, not by
+        # pages.
+        return 0, len(collection), collection
+
+    def _wait(self, changelog, since, wait):
+        """Wait up to `wait` seconds for changes after `since`.
+
+        :return: The token of the latest settled change.
+        :raises ChangesEvictedError: if changes after `since` were evicted.
+        """
+        max_wait = as_timedelta(config.webservice.change_max_wait)
+        interval = as_timedelta(
+            config.webservice.change_poll_interval).total_seconds()
+        deadline = time.monotonic() + min(wait, max_wait.total_seconds())
+        while True:
+            latest = changelog.settled(since)
+            remaining = deadline - time.monotonic()
+            if latest > since or remaining <= 0:
+                return latest
+            # End the transaction so that the next check sees the changes
+            # committed in the meantime.
+            config.db.abort()
+            time.sleep(min(interval, remaining))
+
+    def on_get(self, request, response):
+        """Return the changes recorded after the `since` token.
+
+        The resource's `token` is the one to pass as `since` in the next
+        request.  With `wait`, the request is held open for up to that many
+        seconds until there are some changes.  With `count`, at most that
+        many changes are returned.  When changes after `since` are no longer
+        in the log, the response is a 410, and the client must resynchronize
+        from the full collections.
+        """
+        validator = Validator(
+            since=integer_ge_zero_validator,
+            wait=integer_ge_zero_validator,
+            count=integer_ge_zero_validator,
+            _optional=('since', 'wait', 'count'))
+        try:
+            values = validator(request)
+        except ValueError as error:
+            bad_request(response, str(error))
+            return
+        since = values.get('since', 0)
+        changelog = getUtility(IChangeLog)
+        # Waiting ends the transaction, which in a batch request would throw
+        # away the changes made by the earlier requests in the batch.  A
+        # server with a single worker can't handle other requests while it
+        # waits.
+        wait = (0 if request.env.get('mailman.batch', False) or
+                int(config.webservice.workers) <= 1
+                else values.get('wait', 0))
+        try:
+            token = self._wait(changelog, since, wait)
+        except ChangesEvictedError as error:
+            gone(response, str(error))
+            return
+        # Don't return changes recorded after the token was calculated, they
+        # would be returned again by the next request.
+        changes = changelog.since(since, until=token)
+        count = values.get('count')
+        if count is not None and len(changes) > count:
+            changes = changes[:count]
+            token = (changes[-1].token if count > 0 else since)
+        self._changes = changes
+        resource = self._make_collection(request)
+        resource['token'] = token
+        okay(response, etag(resource))
@@ -19,6 +19,7 @@
 
 from mailman.interfaces.domain import (
     BadDomainSpecificationError, IDomainManager)
+from mailman.rest.cache import response_cache
 from mailman.rest.helpers import (
     BadRequest, CollectionMixin, GetterSetter, NotFound, bad_request, child,
     created, etag, no_content, not_found, okay)
@@ -55,11 +56,16 @@ class ADomain(_DomainBase):
 
     def on_get(self, request, response):
         """Return a single domain end-point."""
-        domain = getUtility(IDomainManager).get(self._domain)
-        if domain is None:
+        key = ('domains', self.api.version, 'domain', self._domain)
+        resource = response_cache.fetch(key, self._get_domain_as_json)
+        if resource is None:
             not_found(response)
         else:
-            okay(response, self._resource_as_json(domain))
+            okay(response, resource)
+
+    def _get_domain_as_json(self):
+        domain = getUtility(IDomainManager).get(self._domain)
+        return None if domain is None else self._resource_as_json(domain)
 
     def on_delete(self, request, response):
         """Delete the domain."""
@@ -165,5 +171,7 @@ class AllDomains(_DomainBase):
 
     def on_get(self, request, response):
         """/domains"""
-        resource = self._make_collection(request)
-        okay(response, etag(resource))
+        key = ('domains', self.api.version, 'collection',
+               request.query_string)
+        okay(response, response_cache.fetch(
+            key, lambda: etag(self._make_collection(request))))
@@ -26,10 +26,17 @@ from datetime import datetime, timedelta
 from email.header import Header
 from email.message import Message
 from enum import Enum
-from lazr.config import as_boolean
 from mailman.config import config
-from pprint import pformat
+from mailman.utilities.queries import QuerySequence
 from public import public
+from types import GeneratorType
+
+
+COMMASPACE = ', '
+EMPTYSTRING = ''
+# The number of JSON fragments buffered before a chunk of a streamed
+# collection is sent to the client.
+STREAM_CHUNK_SIZE = 200
 
 
 class ExtendedEncoder(json.JSONEncoder):
@@ -67,16 +74,28 @@ def bytes_to_str(value):
             return value.decode(encoding)
 
 
+class _ETaggedJSON(str):
+    """The JSON representation of a resource, along with its etag."""
+
+    etag = None
+
+
 @public
 def etag(resource):
     """Calculate the etag and return a JSON representation.
 
     The input is a dictionary representing the resource.  This
     dictionary must not contain an `http_etag` key.  This function
-    calculates the etag by using the sha1 hexdigest of the
-    pretty-printed (and thus key-sorted and predictable) representation
-    of the dictionary.  It then inserts this value under the `http_etag`
-    key, and returns the JSON representation of the modified dictionary.
+    calculates the etag by using the sha1 hexdigest of the key-sorted
+    JSON representation of the dictionary.  It then inserts this value
+    under the `http_etag` key, and returns the JSON representation of
+    the modified dictionary.  The returned string also remembers the
+    etag in its `etag` attribute, so that `okay()` can set the ETag
+    header from it.
+
+    If the resource is a collection whose `entries` are being streamed
+    (see `CollectionMixin._make_collection()`), a generator producing the
+    JSON representation in chunks of bytes is returned instead.
 
     :param resource: The original resource representation.
     :type resource: dictionary
@@ -84,15 +103,49 @@ def etag(resource):
     :rtype string
     """
     assert 'http_etag' not in resource, 'Resource already etagged'
+    if isinstance(resource.get('entries'), GeneratorType):
+        return _etag_stream(resource)
     # Calculate the tag from a predictable (i.e. sorted) representation of the
-    # dictionary.  The actual details aren't so important.  pformat() is
-    # guaranteed to sort the keys, however it returns a str and the hash
-    # library requires a bytes.  Use the safest possible encoding.
-    hashfood = pformat(resource).encode('raw-unicode-escape')
-    etag = hashlib.sha1(hashfood).hexdigest()
-    resource['http_etag'] = '"{}"'.format(etag)
-    return json.dumps(resource, cls=ExtendedEncoder,
-                      sort_keys=as_boolean(config.devmode.enabled))
+    # dictionary.  This is the JSON representation we return anyway, so
+    # rather than encode the resource a second time after tagging it, the
+    # etag is spliced in as the first key.  JSON output is pure ASCII.
+    body = json.dumps(resource, cls=ExtendedEncoder, sort_keys=True)
+    etag = '"{}"'.format(hashlib.sha1(body.encode('ascii')).hexdigest())
+    resource['http_etag'] = etag
+    tagged = '{{"http_etag": {}{}'.format(
+        json.dumps(etag), '}' if body == '{}' else ', ' + body[1:])
+    json_data = _ETaggedJSON(tagged)
+    json_data.etag = etag
+    return json_data
+
+
+def _etag_stream(resource):
+    # Generate the JSON representation of a streamed collection in chunks.
+    # The entries are already etagged JSON strings.  Because the etag of the
+    # collection can't be known until the last entry has been produced, it
+    # is calculated incrementally over the encoded chunks and emitted as the
+    # last key of the JSON object.
+    entries = resource.pop('entries')
+    hasher = hashlib.sha1()
+    buffer = ['{']
+    for key in sorted(resource):
+        buffer.append('{}: {}, '.format(
+            json.dumps(key), json.dumps(resource[key], cls=ExtendedEncoder)))
+    buffer.append('"entries": [')
+    for index, entry in enumerate(entries):
+        if index > 0:
+            buffer.append(COMMASPACE)
+        buffer.append(entry)
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            chunk = EMPTYSTRING.join(buffer).encode('utf-8')
+            hasher.update(chunk)
+            yield chunk
+            buffer = []
+    chunk = EMPTYSTRING.join(buffer).encode('utf-8')
+    hasher.update(chunk)
+    yield chunk
+    yield '], "http_etag": "\\"{}\\""}}'.format(
+        hasher.hexdigest()).encode('utf-8')
 
 
 @public
@@ -149,12 +202,30 @@ class CollectionMixin:
         list_end = page * count
         return list_start, total_size, collection[list_start:list_end]
 
+    def _stream_entries(self, collection):
+        """Generate the etagged JSON representation of each entry."""
+        batch_size = int(config.webservice.stream_threshold)
+        if isinstance(collection, QuerySequence):
+            # Use a server-side cursor so that the entire result set is
+            # never held in memory at once.
+            collection = collection.yield_per(batch_size)
+        for resource in collection:
+            yield self._resource_as_json(resource)
+
     def _make_collection(self, request):
-        """Provide the collection to the REST layer."""
+        """Provide the collection to the REST layer.
+
+        Large collections are not built in memory.  Instead, the returned
+        resource's `entries` is a generator which `etag()` turns into a
+        stream of JSON chunks.
+        """
         start, total_size, collection = self._paginate(
             request, self._get_collection(request))
         result = dict(start=start, total_size=total_size)
-        if len(collection) != 0:
+        size = len(collection)
+        if size > int(config.webservice.stream_threshold):
+            result['entries'] = self._stream_entries(collection)
+        elif size != 0:
             entries = [self._resource_as_dict(resource)
                        for resource in collection]
             assert None not in entries, entries
@@ -269,8 +340,13 @@ class NotFound(ChildError):
 @public
 def okay(response, body=None):
     response.status = falcon.HTTP_200
-    if body is not None:
+    if isinstance(body, GeneratorType):
+        response.stream = body
+    elif body is not None:
         response.body = body
+        # The etag of a resource is also its entity tag, which allows
+        # clients to make conditional requests.
+        response.etag = getattr(body, 'etag', None)
 
 
 @public
@@ -312,6 +388,13 @@ def conflict(response, body=b'409 Conflict'):
         response.body = body
 
 
+@public
+def gone(response, body=b'410 Gone'):
+    response.status = falcon.HTTP_410
+    if body is not None:
+        response.body = body
+
+
 @public
 def forbidden(response, body=b'403 Forbidden'):
     response.status = falcon.HTTP_403
@@ -27,6 +27,7 @@ from mailman.interfaces.mailinglist import (
     DMARCMitigateAction, IAcceptableAliasSet, IMailingList, ReplyToMunging,
     SubscriptionPolicy)
 from mailman.interfaces.template import ITemplateManager
+from mailman.rest.cache import response_cache
 from mailman.rest.helpers import (
     GetterSetter, bad_request, etag, no_content, not_found, okay)
 from mailman.rest.validator import (
@@ -215,27 +216,33 @@ class ListConfiguration:
         self._mlist = mailing_list
         self._attribute = attribute
 
-    def on_get(self, request, response):
-        """Get a mailing list configuration."""
+    def _resource(self, attributes):
         resource = {}
-        attributes = api_attributes(self.api)
         if self._attribute is None:
             # This is a request for all the mailing list's configuration
             # variables.  Return all readable attributes.
             for attribute, getter in attributes.items():
                 value = getter.get(self._mlist, attribute)
                 resource[attribute] = value
-        elif self._attribute in attributes:
+        else:
             # This is a request for a specific attribute.
             value = attributes[self._attribute].get(
                 self._mlist, self._attribute)
             resource[self._attribute] = value
-        else:
+        return etag(resource)
+
+    def on_get(self, request, response):
+        """Get a mailing list configuration."""
+        attributes = api_attributes(self.api)
+        if self._attribute is not None and self._attribute not in attributes:
             # This is a request for a specific, nonexistent attribute.
             not_found(
                 response, 'Unknown attribute: {}'.format(self._attribute))
             return
-        okay(response, etag(resource))
+        key = ('lists', self.api.version, self._mlist.list_id, 'config',
+               self._attribute)
+        okay(response, response_cache.fetch(
+            key, lambda: self._resource(attributes)))
 
     def on_put(self, request, response):
         """Set a mailing list configuration."""
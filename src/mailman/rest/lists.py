@@ -32,12 +32,13 @@ from mailman.interfaces.member import MemberRole
 from mailman.interfaces.styles import IStyleManager
 from mailman.interfaces.subscriptions import ISubscriptionService
 from mailman.rest.bans import BannedEmails
+from mailman.rest.cache import response_cache
 from mailman.rest.header_matches import HeaderMatches
 from mailman.rest.helpers import (
     BadRequest, CollectionMixin, GetterSetter, NotFound, accepted,
     bad_request, child, created, etag, no_content, not_found, okay)
 from mailman.rest.listconf import ListConfiguration
-from mailman.rest.members import AMember, MemberCollection
+from mailman.rest.members import AMember, MemberCollection, member_filters
 from mailman.rest.post_moderation import HeldMessages
 from mailman.rest.sub_moderation import SubscriptionRequests
 from mailman.rest.uris import AListURI, AllListURIs
@@ -94,15 +95,24 @@ def config_matcher(segments):
 class _ListBase(CollectionMixin):
     """Shared base class for mailing list representations."""
 
+    # The member counts of the mailing lists in the collection being
+    # represented, keyed by list id.  These are fetched all at once by
+    # _paginate() so that there's not a separate query for each list.
+    _member_counts = None
+
     def _resource_as_dict(self, mlist):
         """See `CollectionMixin`."""
+        if self._member_counts is None:
+            member_count = mlist.members.member_count
+        else:
+            member_count = self._member_counts.get(mlist.list_id, 0)
         return dict(
             display_name=mlist.display_name,
             fqdn_listname=mlist.fqdn_listname,
             list_id=mlist.list_id,
             list_name=mlist.list_name,
             mail_host=mlist.mail_host,
-            member_count=mlist.members.member_count,
+            member_count=member_count,
             volume=mlist.volume,
             self_link=self.api.path_to('lists/{}'.format(mlist.list_id)),
             )
@@ -111,6 +121,17 @@ class _ListBase(CollectionMixin):
         """See `CollectionMixin`."""
         return self._filter_lists(request)
 
+    def _paginate(self, request, collection):
+        """See `CollectionMixin`."""
+        start, total_size, page = super()._paginate(request, collection)
+        # An unpaginated collection may be too large to hold in memory, so
+        # rather than collect its list ids, count the members of every list.
+        list_ids = (None if page is collection
+                    else [mlist.list_id for mlist in page])
+        self._member_counts = getUtility(
+            ISubscriptionService).count_members(list_ids)
+        return start, total_size, page
+
     def _filter_lists(self, request, **kw):
         """Filter a collection using query parameters."""
         advertised = request.get_param_as_bool('advertised')
@@ -141,7 +162,9 @@ class AList(_ListBase):
         if self._mlist is None:
             not_found(response)
         else:
-            okay(response, self._resource_as_json(self._mlist))
+            key = ('lists', self.api.version, 'list', self._mlist.list_id)
+            okay(response, response_cache.fetch(
+                key, lambda: self._resource_as_json(self._mlist)))
 
     def on_delete(self, request, response):
         """Delete the named mailing list."""
@@ -263,8 +286,9 @@ class AllLists(_ListBase):
 
     def on_get(self, request, response):
         """/lists"""
-        resource = self._make_collection(request)
-        okay(response, etag(resource))
+        key = ('lists', self.api.version, 'collection', request.query_string)
+        okay(response, response_cache.fetch(
+            key, lambda: etag(self._make_collection(request))))
 
 
 @public
@@ -275,6 +299,7 @@ class MembersOfList(MemberCollection):
         super().__init__()
         self._mlist = mailing_list
         self._role = role
+        self._filters = {}
 
     def _get_collection(self, request):
         """See `CollectionMixin`."""
@@ -282,7 +307,17 @@ class MembersOfList(MemberCollection):
         # return the members from the contexted roster.
         return getUtility(ISubscriptionService).find_members(
             list_id=self._mlist.list_id,
-            role=self._role)
+            role=self._role,
+            **self._filters)
+
+    def on_get(self, request, response):
+        """/lists/<list>/roster/<role>"""
+        try:
+            self._filters = member_filters(request)
+        except ValueError as error:
+            bad_request(response, str(error))
+        else:
+            super().on_get(request, response)
 
     def on_delete(self, request, response):
         """Delete the members of the named mailing list."""
@@ -23,8 +23,8 @@ from mailman.interfaces.action import Action
 from mailman.interfaces.address import IAddress
 from mailman.interfaces.listmanager import IListManager
 from mailman.interfaces.member import (
-    AlreadySubscribedError, DeliveryMode, MemberRole, MembershipError,
-    MembershipIsBannedError, MissingPreferredAddressError)
+    AlreadySubscribedError, DeliveryMode, DeliveryStatus, MemberRole,
+    MembershipError, MembershipIsBannedError, MissingPreferredAddressError)
 from mailman.interfaces.subscriptions import (
     ISubscriptionManager, ISubscriptionService, RequestRecord,
     SubscriptionPendingError, TokenOwner)
@@ -41,6 +41,36 @@ from uuid import UUID
 from zope.component import getUtility
 
 
+# Filters on the members' effective preferences, which member collections
+# accept as query parameters.
+FILTERS = dict(
+    delivery_mode=enum_validator(DeliveryMode),
+    delivery_status=enum_validator(DeliveryStatus),
+    moderation_action=enum_validator(Action),
+    )
+
+
+@public
+def member_filters(request):
+    """Return the member filters given in a request's query parameters.
+
+    :param request: An http request.
+    :return: The `ISubscriptionService.find_members()` keyword arguments
+        for the filters.
+    :rtype: dict
+    :raises ValueError: if a filter value is invalid.
+    """
+    filters = {}
+    for name, validator in FILTERS.items():
+        value = request.get_param(name)
+        if value is not None:
+            try:
+                filters[name] = validator(value)
+            except ValueError:
+                raise ValueError('Cannot convert parameters: {}'.format(name))
+    return filters
+
+
 class _MemberBase(CollectionMixin):
     """Shared base class for member representations."""
 
@@ -371,10 +401,13 @@ class FindMembers(_MemberBase):
             list_id=str,
             subscriber=str,
             role=enum_validator(MemberRole),
+            domain=str,
             # Allow pagination.
             page=int,
             count=int,
-            _optional=('list_id', 'subscriber', 'role', 'page', 'count'))
+            _optional=('list_id', 'subscriber', 'role', 'domain', 'page',
+                       'count') + tuple(FILTERS),
+            **FILTERS)
         try:
             data = validator(request)
         except ValueError as error:
@@ -22,9 +22,14 @@ from mailman.core.api import API30, API31
 from mailman.core.constants import system_preferences
 from mailman.core.system import system
 from mailman.interfaces.listmanager import IListManager
+from mailman.model.cache import memory_cache
+from mailman.model.template import template_cache
 from mailman.model.uid import UID
 from mailman.rest.addresses import AllAddresses, AnAddress
 from mailman.rest.bans import BannedEmail, BannedEmails
+from mailman.rest.batch import Batch
+from mailman.rest.cache import response_cache
+from mailman.rest.changes import Changes
 from mailman.rest.domains import ADomain, AllDomains
 from mailman.rest.helpers import (
     BadRequest, NotFound, child, etag, no_content, not_found, okay)
@@ -36,6 +41,7 @@ from mailman.rest.queues import AQueue, AQueueFile, AllQueues
 from mailman.rest.templates import TemplateFinder
 from mailman.rest.uris import ASiteURI, AllSiteURIs
 from mailman.rest.users import AUser, AllUsers, ServerOwners
+from mailman.rules.dmarc import policy_cache
 from public import public
 from zope.component import getUtility
 
@@ -114,6 +120,43 @@ class SystemConfiguration:
         okay(response, etag(resource))
 
 
+# The in-memory caches whose statistics are published.
+CACHES = {
+    'dmarc': policy_cache,
+    'files': memory_cache,
+    'rest': response_cache,
+    'templates': template_cache,
+    }
+
+
+@public
+class Caches:
+    def __init__(self, name=None):
+        self._name = name
+
+    def on_get(self, request, response):
+        """/<api>/system/caches"""
+        if self._name is None:
+            resource = dict(
+                caches=sorted(CACHES),
+                self_link=self.api.path_to('system/caches'),
+                )
+        elif self._name in CACHES:
+            cache = CACHES[self._name]
+            resource = dict(
+                hits=cache.hits,
+                misses=cache.misses,
+                size=len(cache),
+                max_size=cache.max_size,
+                self_link=self.api.path_to(
+                    'system/caches/{}'.format(self._name)),
+                )
+        else:
+            not_found(response)
+            return
+        okay(response, etag(resource))
+
+
 @public
 class Pipelines:
     def on_get(self, request, response):
@@ -170,6 +213,10 @@ class TopLevel:
             if len(segments) <= 2:
                 return SystemConfiguration(*segments[1:]), []
             return BadRequest(), []
+        elif segments[0] == 'caches':
+            if len(segments) <= 2:
+                return Caches(*segments[1:]), []
+            return BadRequest(), []
         elif segments[0] == 'pipelines':
             if len(segments) > 1:
                 return BadRequest(), []
@@ -333,6 +380,20 @@ class TopLevel:
             email = segments.pop(0)
             return BannedEmail(None, email), segments
 
+    @child()
+    def batch(self, context, segments):
+        """/<api>/batch"""
+        if self.api.version_info < (3, 1) or len(segments) > 0:
+            return NotFound(), []
+        return Batch(), []
+
+    @child()
+    def changes(self, context, segments):
+        """/<api>/changes"""
+        if self.api.version_info < (3, 1) or len(segments) > 0:
+            return NotFound(), []
+        return Changes(), []
+
     @child()
     def reserved(self, context, segments):
         """/<api>/reserved/[...]"""
@@ -56,3 +56,54 @@ class TestBasicREST(unittest.TestCase):
         with self.assertRaises(HTTPError) as cm:
             urlopen('http://localhost:9001/3.0/lists/test @example.com')
         self.assertEqual(cm.exception.code, 400)
+
+
+class TestConditionalGET(unittest.TestCase):
+    """Test conditional requests using the resource etags."""
+
+    layer = RESTLayer
+
+    def setUp(self):
+        with transaction():
+            self._mlist = create_list('test@example.com')
+
+    def test_etag_header(self):
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com')
+        self.assertEqual(response.headers['ETag'], json['http_etag'])
+
+    def test_not_modified(self):
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com')
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/lists/test.example.com',
+                     headers={'If-None-Match': json['http_etag']})
+        self.assertEqual(cm.exception.code, 304)
+        self.assertEqual(cm.exception.msg, '')
+
+    def test_not_modified_weak_etag(self):
+        json, response = call_api('http://localhost:9001/3.1/lists')
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/lists', headers={
+                'If-None-Match': '"bogus", W/{}'.format(json['http_etag'])})
+        self.assertEqual(cm.exception.code, 304)
+
+    def test_modified(self):
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com')
+        with transaction():
+            self._mlist.display_name = 'Changed'
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com',
+            headers={'If-None-Match': json['http_etag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json['display_name'], 'Changed')
+
+    def test_not_modified_only_for_get(self):
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com/config')
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com/config',
+            dict(description='A new description'), method='PATCH',
+            headers={'If-None-Match': json['http_etag']})
+        self.assertEqual(response.status_code, 204)
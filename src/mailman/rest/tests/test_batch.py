@@ -0,0 +1,179 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Test batches of REST requests."""
+
+import json
+import unittest
+
+from mailman.app.lifecycle import create_list
+from mailman.config import config
+from mailman.database.transaction import transaction
+from mailman.interfaces.bans import IBanManager
+from mailman.interfaces.listmanager import IListManager
+from mailman.interfaces.usermanager import IUserManager
+from mailman.testing.helpers import call_api
+from mailman.testing.layers import RESTLayer
+from urllib.error import HTTPError
+from zope.component import getUtility
+
+
+class TestBatch(unittest.TestCase):
+    layer = RESTLayer
+
+    def setUp(self):
+        with transaction():
+            self._mlist = create_list('ant@example.com')
+
+    def _batch(self, operations, query_string=None, api='3.1'):
+        url = 'http://localhost:9001/{}/batch'.format(api)
+        if query_string is not None:
+            url += '?' + query_string
+        json_data, response = call_api(
+            url, json.dumps(operations),
+            headers={'Content-Type': 'application/json'})
+        self.assertEqual(response.status_code, 200)
+        return json_data
+
+    def test_provision_list(self):
+        result = self._batch([
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='bee@example.com')),
+            dict(method='PATCH', path='/3.1/lists/bee.example.com/config',
+                 data=dict(description='The bees', display_name='Bees')),
+            dict(method='POST', path='/3.1/members',
+                 data=dict(list_id='bee.example.com',
+                           subscriber='anne@example.com',
+                           role='owner')),
+            dict(path='/3.1/lists/bee.example.com/config/description'),
+            ])
+        self.assertTrue(result['committed'])
+        self.assertEqual(result['total_size'], 4)
+        self.assertEqual(
+            [entry['status'] for entry in result['entries']],
+            [201, 204, 201, 200])
+        created = result['entries'][0]
+        self.assertEqual(created['headers']['location'],
+                         'http://localhost:9001/3.1/lists/bee.example.com')
+        self.assertIsNone(created['body'])
+        self.assertEqual(result['entries'][3]['body']['description'],
+                         'The bees')
+        # Everything was committed.
+        config.db.abort()
+        mlist = getUtility(IListManager).get('bee@example.com')
+        self.assertEqual(mlist.display_name, 'Bees')
+        owners = [address.email for address in mlist.owners.addresses]
+        self.assertEqual(owners, ['anne@example.com'])
+
+    def test_partial_failure(self):
+        # Without `atomic`, a failing request doesn't affect the others.
+        result = self._batch([
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='ant@example.com')),
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='bee@example.com')),
+            ])
+        self.assertTrue(result['committed'])
+        self.assertEqual(
+            [entry['status'] for entry in result['entries']], [400, 201])
+        config.db.abort()
+        self.assertIsNotNone(getUtility(IListManager).get('bee@example.com'))
+
+    def test_failure_rolled_back(self):
+        # A failing request leaves none of its changes behind, even without
+        # `atomic`.  Here the address is created before the subscription is
+        # refused.
+        with transaction():
+            IBanManager(self._mlist).ban('anne@example.com')
+        result = self._batch([
+            dict(method='POST', path='/3.1/members',
+                 data=dict(list_id='ant.example.com',
+                           subscriber='anne@example.com',
+                           pre_verified=True,
+                           pre_confirmed=True,
+                           pre_approved=True)),
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='bee@example.com')),
+            ])
+        self.assertTrue(result['committed'])
+        self.assertEqual(
+            [entry['status'] for entry in result['entries']], [400, 201])
+        self.assertEqual(result['entries'][0]['body'], 'Membership is banned')
+        config.db.abort()
+        self.assertIsNone(
+            getUtility(IUserManager).get_address('anne@example.com'))
+        self.assertIsNotNone(getUtility(IListManager).get('bee@example.com'))
+
+    def test_atomic(self):
+        # With `atomic`, the first failure throws everything away.
+        result = self._batch([
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='bee@example.com')),
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='ant@example.com')),
+            dict(method='POST', path='/3.1/lists',
+                 data=dict(fqdn_listname='cat@example.com')),
+            ], query_string='atomic=true')
+        self.assertFalse(result['committed'])
+        self.assertEqual(
+            [entry['status'] for entry in result['entries']], [201, 400])
+        config.db.abort()
+        self.assertIsNone(getUtility(IListManager).get('bee@example.com'))
+        self.assertIsNone(getUtility(IListManager).get('cat@example.com'))
+
+    def test_query_string(self):
+        result = self._batch([
+            dict(path='/3.1/lists?count=1&page=1'),
+            ])
+        entry = result['entries'][0]
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['body']['total_size'], 1)
+
+    def test_not_found(self):
+        result = self._batch([dict(path='/3.1/lists/bee.example.com')])
+        self.assertEqual(result['entries'][0]['status'], 404)
+
+    def test_nested_batch(self):
+        result = self._batch([
+            dict(method='POST', path='/3.1/batch'),
+            ])
+        self.assertEqual(result['entries'][0]['status'], 400)
+
+    def test_bad_json(self):
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/batch', '{',
+                     headers={'Content-Type': 'application/json'})
+        self.assertEqual(cm.exception.code, 400)
+
+    def test_bad_request(self):
+        with self.assertRaises(HTTPError) as cm:
+            self._batch([dict(method='FROB', path='/3.1/lists')])
+        self.assertEqual(cm.exception.code, 400)
+        self.assertEqual(cm.exception.reason, 'Invalid method: FROB')
+
+    def test_too_many_requests(self):
+        operations = [dict(path='/3.1/lists')] * (
+            int(config.webservice.max_batch_size) + 1)
+        with self.assertRaises(HTTPError) as cm:
+            self._batch(operations)
+        self.assertEqual(cm.exception.code, 400)
+        self.assertEqual(cm.exception.reason, 'Too many requests: {}'.format(
+            len(operations)))
+
+    def test_not_in_api_30(self):
+        with self.assertRaises(HTTPError) as cm:
+            self._batch([], api='3.0')
+        self.assertEqual(cm.exception.code, 404)
@@ -0,0 +1,223 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the cache of REST representations."""
+
+import json
+import unittest
+import threading
+
+from mailman.app.lifecycle import create_list
+from mailman.database.transaction import transaction
+from mailman.interfaces.usermanager import IUserManager
+from mailman.rest.cache import response_cache
+from mailman.testing.helpers import call_api, configuration
+from mailman.testing.layers import ConfigLayer
+from mailman.utilities.datetime import factory
+from unittest import mock
+from zope.component import getUtility
+
+
+class TestResponseCache(unittest.TestCase):
+    # The REST server of the REST layer runs with the cache disabled, so
+    # these tests run their own in this process.
+    layer = ConfigLayer
+
+    def setUp(self):
+        # The resource tree can only be imported once Mailman is configured.
+        from mailman.rest.wsgiapp import make_server
+        with transaction():
+            self._mlist = create_list('ant@example.com')
+        context = configuration('webservice', cache_size=3)
+        context.__enter__()
+        self.addCleanup(context.__exit__)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        with configuration('webservice', port=0, workers=1):
+            server = make_server()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        def stop():                                         # noqa: E306
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        self.addCleanup(stop)
+        self._url = 'http://localhost:{}'.format(server.server_port)
+
+    def _get(self, path):
+        json, response = call_api(self._url + path)
+        return json
+
+    def test_hits_and_misses(self):
+        first = self._get('/3.1/lists/ant.example.com/config')
+        second = self._get('/3.1/lists/ant.example.com/config')
+        self.assertEqual(first, second)
+        self.assertEqual(response_cache.misses, 1)
+        self.assertEqual(response_cache.hits, 1)
+
+    def test_keyed_on_api_version(self):
+        self._get('/3.0/domains')
+        self._get('/3.1/domains')
+        self.assertEqual(response_cache.misses, 2)
+        self.assertEqual(response_cache.hits, 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self._get('/3.1/lists')
+        self._get('/3.1/domains')
+        self._get('/3.1/lists/ant.example.com')
+        self._get('/3.1/lists')
+        # The cache holds three entries, so this evicts /domains, the least
+        # recently used one.
+        self._get('/3.1/lists/ant.example.com/config')
+        self.assertEqual(len(response_cache), 3)
+        self._get('/3.1/lists')
+        self._get('/3.1/domains')
+        self.assertEqual(response_cache.hits, 2)
+        self.assertEqual(response_cache.misses, 5)
+
+    def test_write_invalidates(self):
+        self.assertEqual(
+            self._get('/3.1/lists')['entries'][0]['display_name'], 'Ant')
+        json, response = call_api(
+            self._url + '/3.1/lists/ant.example.com/config',
+            dict(display_name='Aardvark'), 'PATCH')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self._get('/3.1/lists')['entries'][0]['display_name'],
+            'Aardvark')
+        self.assertEqual(response_cache.hits, 0)
+
+    def test_subscription_invalidates(self):
+        self.assertEqual(
+            self._get('/3.1/lists/ant.example.com')['member_count'], 0)
+        with transaction():
+            anne = getUtility(IUserManager).create_address(
+                'anne@example.com')
+            self._mlist.subscribe(anne)
+        self.assertEqual(
+            self._get('/3.1/lists/ant.example.com')['member_count'], 1)
+
+    def test_list_creation_invalidates(self):
+        self.assertEqual(self._get('/3.1/lists')['total_size'], 1)
+        with transaction():
+            create_list('bee@example.com')
+        self.assertEqual(self._get('/3.1/lists')['total_size'], 2)
+
+    def test_entries_expire(self):
+        self._get('/3.1/lists/ant.example.com')
+        # Changes made outside of the REST API go unnoticed until the entry
+        # expires.
+        with transaction():
+            self._mlist.display_name = 'Aardvark'
+        self.assertEqual(
+            self._get('/3.1/lists/ant.example.com')['display_name'], 'Ant')
+        factory.fast_forward(days=1)
+        self.assertEqual(
+            self._get('/3.1/lists/ant.example.com')['display_name'],
+            'Aardvark')
+
+    def test_disabled(self):
+        with configuration('webservice', cache_size=0):
+            self._get('/3.1/lists')
+            self._get('/3.1/lists')
+        self.assertEqual(len(response_cache), 0)
+        self.assertEqual(response_cache.hits, 0)
+        self.assertEqual(response_cache.misses, 0)
+
+    def test_statistics(self):
+        self._get('/3.1/domains')
+        self._get('/3.1/domains')
+        statistics = self._get('/3.1/system/caches/rest')
+        self.assertEqual(statistics['hits'], 1)
+        self.assertEqual(statistics['misses'], 1)
+        self.assertEqual(statistics['size'], 1)
+        self.assertEqual(statistics['max_size'], 3)
+        self.assertEqual(self._get('/3.1/system/caches')['caches'],
+                         ['dmarc', 'files', 'rest', 'templates'])
+
+    @configuration('webservice', stream_threshold=1)
+    def test_streamed_collection_not_cached(self):
+        # A streamed collection can only be sent once.
+        with transaction():
+            create_list('bee@example.com')
+        for i in range(2):
+            self.assertEqual(self._get('/3.1/lists')['total_size'], 2)
+        self.assertEqual(len(response_cache), 0)
+
+    def test_collection_and_resource_keys(self):
+        # A collection's query string can't be mistaken for the name of one
+        # of its resources.
+        self._get('/3.1/domains?example.com')
+        domain = self._get('/3.1/domains/example.com')
+        self.assertEqual(domain['mail_host'], 'example.com')
+        self.assertEqual(response_cache.hits, 0)
+
+    def test_stale_representation_not_cached(self):
+        # A write to the list is committed, and the cached representations
+        # invalidated, while its old representation is being rendered.
+        from mailman.rest.lists import AList
+        render = AList._resource_as_json
+        def write_meanwhile(resource, mlist):               # noqa: E306
+            representation = render(resource, mlist)
+            response_cache.invalidate('lists')
+            return representation
+        with mock.patch.object(AList, '_resource_as_json', write_meanwhile):
+            self._get('/3.1/lists/ant.example.com')
+        self.assertEqual(len(response_cache), 0)
+        # Representations rendered without interference are cached again.
+        self._get('/3.1/lists/ant.example.com')
+        self._get('/3.1/lists/ant.example.com')
+        self.assertEqual(response_cache.hits, 1)
+
+    def _batch(self, operations):
+        json_data, response = call_api(
+            self._url + '/3.1/batch', json.dumps(operations),
+            headers={'Content-Type': 'application/json'})
+        return json_data
+
+    def test_batch_writes_invalidate(self):
+        self._get('/3.1/lists/ant.example.com')
+        self.assertEqual(len(response_cache), 1)
+        self._batch([
+            dict(method='PATCH', path='/3.1/lists/ant.example.com/config',
+                 data=dict(display_name='Aardvark')),
+            ])
+        self.assertEqual(len(response_cache), 0)
+        self.assertEqual(
+            self._get('/3.1/lists/ant.example.com')['display_name'],
+            'Aardvark')
+
+    def test_batch_reads_its_writes(self):
+        # A sub-request sees the changes of the sub-requests before it, not
+        # what was cached before the batch.
+        self._get('/3.1/lists/ant.example.com')
+        result = self._batch([
+            dict(method='PATCH', path='/3.1/lists/ant.example.com/config',
+                 data=dict(display_name='Aardvark')),
+            dict(path='/3.1/lists/ant.example.com'),
+            ])
+        self.assertEqual(
+            result['entries'][1]['body']['display_name'], 'Aardvark')
+
+    def test_batch_write_paths_without_query(self):
+        with mock.patch.object(
+                response_cache, 'invalidate',
+                wraps=response_cache.invalidate) as invalidate:
+            self._batch([dict(method='DELETE', path='/3.1/domains?x=1')])
+        self.assertEqual(
+            set(call[0][0] for call in invalidate.call_args_list),
+            {'domains'})
@@ -0,0 +1,110 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""Test the change feed."""
+
+import time
+import unittest
+
+from mailman.app.lifecycle import create_list
+from mailman.database.transaction import transaction
+from mailman.interfaces.changes import IChangeLog
+from mailman.interfaces.usermanager import IUserManager
+from mailman.testing.helpers import call_api
+from mailman.testing.layers import RESTLayer
+from urllib.error import HTTPError
+from zope.component import getUtility
+
+
+class TestChanges(unittest.TestCase):
+    layer = RESTLayer
+
+    def setUp(self):
+        with transaction():
+            self._mlist = create_list('ant@example.com')
+            self._anne = getUtility(IUserManager).create_address(
+                'anne@example.com')
+        self._token = getUtility(IChangeLog).latest
+
+    def test_all_changes(self):
+        with transaction():
+            member = self._mlist.subscribe(self._anne)
+        json, response = call_api('http://localhost:9001/3.1/changes')
+        self.assertEqual(json['total_size'], 2)
+        self.assertEqual(json['token'], self._token + 1)
+        lists, members = json['entries']
+        self.assertEqual(lists['kind'], 'mailing_list')
+        self.assertEqual(lists['action'], 'created')
+        self.assertEqual(lists['list_id'], 'ant.example.com')
+        self.assertEqual(members['kind'], 'member')
+        self.assertEqual(members['action'], 'created')
+        self.assertEqual(members['member_id'], member.member_id.hex)
+        self.assertEqual(members['email'], 'anne@example.com')
+        self.assertEqual(members['role'], 'member')
+
+    def test_no_new_changes(self):
+        json, response = call_api(
+            'http://localhost:9001/3.1/changes?since={}'.format(self._token))
+        self.assertEqual(json['total_size'], 0)
+        self.assertEqual(json['token'], self._token)
+        self.assertNotIn('entries', json)
+
+    def test_count(self):
+        with transaction():
+            create_list('bee@example.com')
+            create_list('cat@example.com')
+        json, response = call_api(
+            'http://localhost:9001/3.1/changes?since={}&count=1'.format(
+                self._token))
+        self.assertEqual(json['total_size'], 1)
+        self.assertEqual(json['entries'][0]['list_id'], 'bee.example.com')
+        json, response = call_api(
+            'http://localhost:9001/3.1/changes?since={}'.format(
+                json['token']))
+        self.assertEqual(json['total_size'], 1)
+        self.assertEqual(json['entries'][0]['list_id'], 'cat.example.com')
+
+    def test_wait_ignored_with_one_worker(self):
+        # The test server has a single worker, which must not be tied up.
+        start = time.monotonic()
+        json, response = call_api(
+            'http://localhost:9001/3.1/changes?since={}&wait=1'.format(
+                self._token))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(json['total_size'], 0)
+        self.assertEqual(json['token'], self._token)
+
+    def test_evicted_changes(self):
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/changes?since={}'.format(
+                self._token + 10))
+        self.assertEqual(cm.exception.code, 410)
+        self.assertEqual(
+            cm.exception.reason,
+            'Changes after {} are no longer available'.format(
+                self._token + 10))
+
+    def test_bad_parameter(self):
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/changes?since=-1')
+        self.assertEqual(cm.exception.code, 400)
+        self.assertEqual(cm.exception.reason,
+                         'Cannot convert parameters: since')
+
+    def test_not_in_api_30(self):
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.0/changes')
+        self.assertEqual(cm.exception.code, 404)
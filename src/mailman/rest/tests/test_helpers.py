@@ -23,13 +23,26 @@ import unittest
 from datetime import timedelta
 from email.header import Header
 from email.message import Message
+from falcon import Request
+from mailman.app.lifecycle import create_list
+from mailman.core.api import API31
+from mailman.interfaces.member import MemberRole
 from mailman.rest import helpers
+from mailman.rest.lists import MembersOfList
+from mailman.testing.helpers import configuration, subscribe
 from mailman.testing.layers import ConfigLayer, RESTLayer
+from types import GeneratorType
 
 
 class FakeResponse:
     def __init__(self):
         self.body = 'not set'
+        self.stream = None
+
+
+class _FakeRequest(Request):
+    def __init__(self):
+        self._params = {}
 
 
 class Unserializable:
@@ -97,3 +110,74 @@ class TestJSONEncoder(unittest.TestCase):
             Header(value, charset='utf-8'),
             cls=helpers.ExtendedEncoder)
         self.assertEqual(result, json.dumps(value))
+
+
+class TestStreamedCollection(unittest.TestCase):
+    """Test collections which are streamed to the client."""
+
+    layer = ConfigLayer
+
+    def _get_resource(self):
+        class Resource(helpers.CollectionMixin):
+            def _get_collection(self, request):
+                return ['one', 'two', 'three']
+            def _resource_as_dict(self, res):                    # noqa: E306
+                return {'value': res}
+        return Resource()
+
+    def test_small_collection_is_not_streamed(self):
+        collection = self._get_resource()._make_collection(_FakeRequest())
+        self.assertIsInstance(collection['entries'], list)
+        self.assertIsInstance(helpers.etag(collection), str)
+
+    @configuration('webservice', stream_threshold=2)
+    def test_large_collection_is_streamed(self):
+        collection = self._get_resource()._make_collection(_FakeRequest())
+        self.assertIsInstance(collection['entries'], GeneratorType)
+        chunks = helpers.etag(collection)
+        self.assertIsInstance(chunks, GeneratorType)
+        resource = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual(resource['start'], 0)
+        self.assertEqual(resource['total_size'], 3)
+        self.assertIn('http_etag', resource)
+        self.assertEqual(
+            [entry['value'] for entry in resource['entries']],
+            ['one', 'two', 'three'])
+        # Each entry is etagged exactly as in an unstreamed collection.
+        for entry in resource['entries']:
+            etag = entry.pop('http_etag')
+            helpers.etag(entry)
+            self.assertEqual(entry['http_etag'], etag)
+
+    @configuration('webservice', stream_threshold=2)
+    def test_streamed_etag_is_stable(self):
+        etags = []
+        for i in range(2):
+            collection = self._get_resource()._make_collection(
+                _FakeRequest())
+            resource = json.loads(
+                b''.join(helpers.etag(collection)).decode('utf-8'))
+            etags.append(resource['http_etag'])
+        self.assertEqual(etags[0], etags[1])
+
+    @configuration('webservice', stream_threshold=1)
+    def test_stream_query_results(self):
+        mlist = create_list('ant@example.com')
+        for name in ('Anne', 'Bart', 'Cris'):
+            subscribe(mlist, name)
+        resource = MembersOfList(mlist, MemberRole.member)
+        resource.api = API31
+        collection = resource._make_collection(_FakeRequest())
+        resource = json.loads(
+            b''.join(helpers.etag(collection)).decode('utf-8'))
+        self.assertEqual(
+            [entry['email'] for entry in resource['entries']],
+            ['aperson@example.com', 'bperson@example.com',
+             'cperson@example.com'])
+
+    def test_okay_streams_generators(self):
+        response = FakeResponse()
+        chunks = (chunk for chunk in [b'{', b'}'])
+        helpers.okay(response, chunks)
+        self.assertEqual(response.body, 'not set')
+        self.assertIs(response.stream, chunks)
@@ -17,11 +17,14 @@
 
 """REST list tests."""
 
+import json
 import unittest
 
 from datetime import timedelta
+from falcon import Request
 from mailman.app.lifecycle import create_list
 from mailman.config import config
+from mailman.core.api import API31
 from mailman.database.transaction import transaction
 from mailman.interfaces.digests import DigestFrequency
 from mailman.interfaces.listmanager import IListManager
@@ -30,11 +33,13 @@ from mailman.interfaces.member import DeliveryMode
 from mailman.interfaces.template import ITemplateManager
 from mailman.interfaces.usermanager import IUserManager
 from mailman.model.mailinglist import AcceptableAlias
+from mailman.rest.helpers import etag
+from mailman.rest.lists import AllLists
 from mailman.runners.digest import DigestRunner
 from mailman.testing.helpers import (
-    call_api, get_queue_messages, make_testable_runner,
+    call_api, count_queries, get_queue_messages, make_testable_runner,
     specialized_message_from_string as mfs)
-from mailman.testing.layers import RESTLayer
+from mailman.testing.layers import ConfigLayer, RESTLayer
 from mailman.utilities.datetime import now as right_now
 from urllib.error import HTTPError
 from zope.component import getUtility
@@ -622,7 +627,7 @@ class TestListTemplates(unittest.TestCase):
             json['self_link'],
             'http://localhost:9001/3.1/lists/ant.example.com/uris')
         self.assertEqual(json['entries'], [
-            {'http_etag': '"6612187ed6604ce54a57405fd66742557391ed4a"',
+            {'http_etag': '"35b92f364666eacd43c460a909e25ff608417903"',
              'name': 'list:user:notice:goodbye',
              'password': 'the password',
              'self_link': ('http://localhost:9001/3.1/lists/ant.example.com'
@@ -630,7 +635,7 @@ class TestListTemplates(unittest.TestCase):
              'uri': 'http://example.com/goodbye',
              'username': 'a user',
              },
-            {'http_etag': '"cb1ab5eee2242143d2984edd0487532915ad3a8e"',
+            {'http_etag': '"b78c96f70a0541f2640c1dbb22388458a339619e"',
              'name': 'list:user:notice:welcome',
              'self_link': ('http://localhost:9001/3.1/lists/ant.example.com'
                            '/uris/list:user:notice:welcome'),
@@ -763,7 +768,7 @@ class TestListTemplates(unittest.TestCase):
             '/list:user:notice:welcome')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json, {
-            'http_etag': '"36f8bef800cfd278f097c61c5892a34c0650f4aa"',
+            'http_etag': '"989da73b97438a1e54352d8030edcf461def0f30"',
             'self_link': ('http://localhost:9001/3.1/lists/ant.example.com'
                           '/uris/list:user:notice:welcome'),
             'uri': 'http://example.com/welcome',
@@ -801,3 +806,44 @@ class TestListTemplates(unittest.TestCase):
                 'http://localhost:9001/3.0/templates/ant@example.com'
                 '/footer/en')
         self.assertEqual(cm.exception.code, 404)
+
+
+class _FakeRequest(Request):
+    def __init__(self, **params):
+        self._params = params
+
+
+class TestListCollectionQueries(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        user_manager = getUtility(IUserManager)
+        for i in range(10):
+            mlist = create_list('list{:02d}@example.com'.format(i))
+            for j in range(i):
+                mlist.subscribe(user_manager.create_address(
+                    'person{:02d}.{:02d}@example.com'.format(i, j)))
+        config.db.commit()
+
+    def _get(self, **params):
+        resource = AllLists()
+        resource.api = API31
+        with count_queries() as statements:
+            result = etag(resource._make_collection(_FakeRequest(**params)))
+        config.db.commit()
+        return json.loads(result), len(statements)
+
+    def test_member_counts(self):
+        result, count = self._get()
+        self.assertEqual(
+            [entry['member_count'] for entry in result['entries']],
+            list(range(10)))
+        result, count = self._get(count=3, page=2)
+        self.assertEqual(
+            [entry['member_count'] for entry in result['entries']],
+            [3, 4, 5])
+
+    def test_query_count_independent_of_page_size(self):
+        small = self._get(count=2, page=1)[1]
+        large = self._get(count=10, page=1)[1]
+        self.assertEqual(small, large)
@@ -19,18 +19,23 @@
 
 import unittest
 
+from falcon import Request
 from mailman.app.lifecycle import create_list
 from mailman.config import config
+from mailman.core.api import API31
 from mailman.database.transaction import transaction
 from mailman.interfaces.bans import IBanManager
 from mailman.interfaces.mailinglist import SubscriptionPolicy
 from mailman.interfaces.member import DeliveryMode, MemberRole
 from mailman.interfaces.subscriptions import ISubscriptionManager, TokenOwner
 from mailman.interfaces.usermanager import IUserManager
+from mailman.rest.helpers import etag
+from mailman.rest.lists import MembersOfList
+from mailman.rest.members import AllMembers
 from mailman.runners.incoming import IncomingRunner
 from mailman.testing.helpers import (
-    TestableMaster, call_api, get_lmtp_client, make_testable_runner,
-    set_preferred, subscribe, wait_for_webservice)
+    TestableMaster, call_api, count_queries, get_lmtp_client,
+    make_testable_runner, set_preferred, subscribe, wait_for_webservice)
 from mailman.testing.layers import ConfigLayer, RESTLayer
 from mailman.utilities.datetime import now
 from urllib.error import HTTPError
@@ -433,6 +438,51 @@ class TestMembership(unittest.TestCase):
         self.assertEqual(cm.exception.code, 400)
         self.assertEqual(cm.exception.reason, 'Membership is banned')
 
+    def test_find_members_by_domain(self):
+        with transaction():
+            for email in ('anne@example.com', 'bart@example.org',
+                          'cris@EXAMPLE.org'):
+                address = self._usermanager.create_address(email)
+                self._mlist.subscribe(address)
+        json, response = call_api(
+            'http://localhost:9001/3.1/members/find', {
+                'domain': 'example.org',
+                })
+        self.assertEqual(
+            [entry['email'] for entry in json['entries']],
+            ['bart@example.org', 'cris@example.org'])
+
+    def test_filter_roster_by_delivery_mode(self):
+        with transaction():
+            for email in ('anne@example.com', 'bart@example.com'):
+                address = self._usermanager.create_address(email)
+                self._mlist.subscribe(address)
+            self._mlist.members.get_member(
+                'bart@example.com').preferences.delivery_mode = (
+                DeliveryMode.plaintext_digests)
+        json, response = call_api(
+            'http://localhost:9001/3.1/lists/test.example.com/roster/member'
+            '?delivery_mode=plaintext_digests')
+        self.assertEqual(
+            [entry['email'] for entry in json['entries']],
+            ['bart@example.com'])
+        json, response = call_api(
+            'http://localhost:9001/3.1/members/find', {
+                'delivery_mode': 'regular',
+                'delivery_status': 'enabled',
+                })
+        self.assertEqual(
+            [entry['email'] for entry in json['entries']],
+            ['anne@example.com'])
+
+    def test_filter_roster_bad_delivery_status(self):
+        with self.assertRaises(HTTPError) as cm:
+            call_api('http://localhost:9001/3.1/lists/test.example.com'
+                     '/roster/member?delivery_status=bogus')
+        self.assertEqual(cm.exception.code, 400)
+        self.assertEqual(cm.exception.reason,
+                         'Cannot convert parameters: delivery_status')
+
 
 class CustomLayer(ConfigLayer):
     """Custom layer which starts both the REST and LMTP servers."""
@@ -703,3 +753,50 @@ class TestAPI31Members(unittest.TestCase):
         self.assertEqual(
             cm.exception.reason,
             'anne@example.com is already an owner of ant@example.com')
+
+
+class _FakeRequest(Request):
+    def __init__(self, count, page):
+        self._params = dict(count=count, page=page)
+
+
+class TestMemberCollectionQueries(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._mlist = create_list('ant@example.com')
+        user_manager = getUtility(IUserManager)
+        # Subscribe a mix of explicit addresses and users via their
+        # preferred address, some with their own preferences.
+        for i in range(10):
+            email = 'person{:02d}@example.com'.format(i)
+            user = user_manager.create_user(email, 'Person {}'.format(i))
+            if i % 2 == 0:
+                member = self._mlist.subscribe(list(user.addresses)[0])
+            else:
+                set_preferred(user)
+                member = self._mlist.subscribe(user)
+            if i % 3 == 0:
+                member.preferences.delivery_mode = (
+                    DeliveryMode.plaintext_digests)
+        config.db.commit()
+
+    def _count(self, resource, count):
+        resource.api = API31
+        with count_queries() as statements:
+            etag(resource._make_collection(_FakeRequest(count, 1)))
+        config.db.commit()
+        return len(statements)
+
+    def test_roster_query_count_independent_of_page_size(self):
+        small = self._count(MembersOfList(self._mlist, MemberRole.member), 2)
+        large = self._count(MembersOfList(self._mlist, MemberRole.member), 10)
+        self.assertEqual(small, large)
+
+    def test_all_members_query_count_independent_of_size(self):
+        before = self._count(AllMembers(), 10)
+        anne = getUtility(IUserManager).create_address('anne@example.com')
+        self._mlist.subscribe(anne)
+        config.db.commit()
+        after = self._count(AllMembers(), 11)
+        self.assertEqual(before, after)
@@ -199,7 +199,7 @@ class TestSiteTemplates(unittest.TestCase):
             json['self_link'],
             'http://localhost:9001/3.1/uris')
         self.assertEqual(json['entries'], [
-            {'http_etag': '"063fd6635a6035a4b7e939a304fcbd16571aa662"',
+            {'http_etag': '"82c6128504c2a3380e9223dfb54e8fc64d07e299"',
              'name': 'list:user:notice:goodbye',
              'password': 'the password',
              'self_link': ('http://localhost:9001/3.1'
@@ -207,7 +207,7 @@ class TestSiteTemplates(unittest.TestCase):
              'uri': 'http://example.com/goodbye',
              'username': 'a user',
              },
-            {'http_etag': '"5c4ec63b2a0a50f96483ec85b94b80ee092af792"',
+            {'http_etag': '"57e3675284438abbfc03b22bbb774098360f2d70"',
              'name': 'list:user:notice:welcome',
              'self_link': ('http://localhost:9001/3.1'
                            '/uris/list:user:notice:welcome'),
@@ -338,7 +338,7 @@ class TestSiteTemplates(unittest.TestCase):
             'http://localhost:9001/3.1/uris/list:user:notice:welcome')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json, {
-            'http_etag': '"86e360d83197561d50826ad6d15e9c30923b82d6"',
+            'http_etag': '"e4d9bdc3153dd27ea5f36c97ac09cdbe829c9dd7"',
             'self_link': ('http://localhost:9001/3.1'
                           '/uris/list:user:notice:welcome'),
             'uri': 'http://example.com/welcome',
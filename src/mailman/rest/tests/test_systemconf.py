@@ -38,11 +38,19 @@ class TestSystemConfiguration(unittest.TestCase):
         del json['http_etag']
         self.assertEqual(json, dict(
             cache_life='7d',
+            cache_memory_life='5m',
+            cache_memory_size='100',
+            change_compaction='1h',
+            change_retention='7d',
             default_language='en',
+            delivery_ledger='no',
+            delivery_ledger_lifetime='1h',
             email_commands_max_lines='10',
             filtered_messages_are_preservable='no',
             html_to_plain_text_command='/usr/bin/lynx -dump $filename',
             layout='testing',
+            list_cache_lifetime='1h',
+            list_cache_size='1000',
             listname_chars='[-_.0-9a-z]',
             noreply_address='noreply',
             pending_request_life='3d',
@@ -51,6 +59,8 @@ class TestSystemConfiguration(unittest.TestCase):
             self_link='http://localhost:9001/3.0/system/configuration/mailman',
             sender_headers='from from_ reply-to sender',
             site_owner='noreply@example.com',
+            template_cache_lifetime='5m',
+            template_cache_size='0',
             ))
 
     def test_dmarc_system_configuration(self):
@@ -64,6 +74,11 @@ class TestSystemConfiguration(unittest.TestCase):
             cache_lifetime='7d',
             org_domain_data_url=                                  # noqa: E251
                 'https://publicsuffix.org/list/public_suffix_list.dat',
+            policy_cache_lifetime='1d',
+            policy_cache_shared='no',
+            policy_cache_size='1000',
+            policy_negative_lifetime='1h',
+            policy_prefetch='yes',
             resolver_lifetime='5s',
             resolver_timeout='3s',
             self_link='http://localhost:9001/3.0/system/configuration/dmarc',
@@ -0,0 +1,176 @@
+# Copyright (C) 2015-2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the REST object router and server."""
+
+import time
+import unittest
+import threading
+
+from base64 import b64encode
+from mailman.app.lifecycle import create_list
+from mailman.config import config
+from mailman.interfaces.domain import IDomainManager
+from mailman.rest.header_matches import HeaderMatch
+from mailman.rest.lists import MembersOfList
+from mailman.testing.helpers import configuration
+from mailman.testing.layers import ConfigLayer
+from unittest import mock
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from zope.component import getUtility
+
+
+class TestObjectRouter(unittest.TestCase):
+    layer = ConfigLayer
+
+    def setUp(self):
+        # The resource tree can only be imported once Mailman is configured.
+        from mailman.rest.root import Root
+        from mailman.rest.wsgiapp import ObjectRouter
+        create_list('ant@example.com')
+        self._router = ObjectRouter(Root())
+
+    def test_find_deep_resource(self):
+        resource, method_map, context = self._router.find(
+            '/3.1/lists/ant.example.com/roster/member')
+        self.assertIsInstance(resource, MembersOfList)
+        self.assertIn('GET', method_map)
+
+    def test_find_missing_resource(self):
+        resource, method_map, context = self._router.find('/3.1/bogus')
+        self.assertIsNone(resource)
+        self.assertIsNone(method_map)
+
+    def test_find_regexp_child(self):
+        resource, method_map, context = self._router.find(
+            '/3.1/lists/ant.example.com/header-matches/7')
+        self.assertIsInstance(resource, HeaderMatch)
+
+    def test_routing_table_is_cached(self):
+        uri = '/3.1/lists/ant.example.com/roster/member'
+        self._router.find(uri)
+        # Once every resource class along the path has been seen, routing
+        # doesn't need to introspect them again.
+        with mock.patch('mailman.rest.wsgiapp.dir', create=True,
+                        side_effect=AssertionError('dir() called')):
+            resource, method_map, context = self._router.find(uri)
+        self.assertIsInstance(resource, MembersOfList)
+
+    def test_routing_tables_built_once(self):
+        # Each resource class's table is built the first time it is routed
+        # through, and reused for every later request.  For the timings, see
+        # contrib/benchmarks/rest_routing.py.
+        from mailman.rest.wsgiapp import _DispatchTable
+        uris = [
+            '/3.1/system/configuration/mailman',
+            '/3.1/lists/ant.example.com/roster/member',
+            '/3.1/lists/ant.example.com/header-matches/7',
+            ]
+        with mock.patch.object(_DispatchTable, '__init__', autospec=True,
+                               side_effect=_DispatchTable.__init__) as table:
+            for uri in uris:
+                self._router.find(uri)
+            built = table.call_count
+            for i in range(10):
+                for uri in uris:
+                    self._router.find(uri)
+        self.assertGreater(built, 0)
+        self.assertEqual(table.call_count, built)
+        self.assertEqual(len(self._router._tables), built)
+
+
+class TestThreadedServer(unittest.TestCase):
+    layer = ConfigLayer
+
+    def _serve(self, app=None):
+        from mailman.rest.wsgiapp import make_server
+        with configuration('webservice', port=0, workers=2):
+            server = make_server()
+        if app is not None:
+            server.set_app(app)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        def stop():                                         # noqa: E306
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        self.addCleanup(stop)
+        return 'http://localhost:{}'.format(server.server_address[1])
+
+    def test_single_worker(self):
+        from mailman.rest.wsgiapp import ThreadedAdminWSGIServer, make_server
+        with configuration('webservice', port=0):
+            server = make_server()
+        self.addCleanup(server.server_close)
+        self.assertNotIsInstance(server, ThreadedAdminWSGIServer)
+
+    def test_concurrent_requests(self):
+        # Neither request can complete until both are being handled.
+        barrier = threading.Barrier(2, timeout=10)
+        def app(environ, start_response):                   # noqa: E306
+            barrier.wait()
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+        url = self._serve(app)
+        responses = []
+        def get():                                          # noqa: E306
+            with urlopen(url) as response:
+                responses.append(response.read())
+        clients = [threading.Thread(target=get) for i in range(2)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        self.assertEqual(responses, [b'ok', b'ok'])
+
+    def test_worker_sessions(self):
+        # Requests are handled with the worker thread's own session, which is
+        # released afterward.
+        sessions = []
+        def app(environ, start_response):                   # noqa: E306
+            sessions.append(config.db.store())
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+        url = self._serve(app)
+        with mock.patch.object(config.db, 'release',
+                               wraps=config.db.release) as release:
+            urlopen(url).close()
+            # The response is sent before the worker releases its session.
+            for i in range(100):
+                if release.called:
+                    break
+                time.sleep(0.05)
+        self.assertEqual(release.call_count, 1)
+        self.assertEqual(len(sessions), 1)
+        self.assertIsNot(sessions[0], config.db.store())
+
+    def test_rest_request_is_committed(self):
+        # Requests through the threaded server are authenticated and
+        # committed as usual.
+        config.db.commit()
+        url = self._serve()
+        credentials = b64encode('{}:{}'.format(
+            config.webservice.admin_user,
+            config.webservice.admin_pass).encode('ascii'))
+        request = Request(
+            url + '/3.1/domains',
+            data=urlencode(dict(mail_host='example.net')).encode('ascii'),
+            headers={'Authorization': b'Basic ' + credentials})
+        with urlopen(request) as response:
+            self.assertEqual(response.status, 201)
+        self.assertIsNotNone(getUtility(IDomainManager).get('example.net'))
@@ -21,11 +21,14 @@ import re
 import logging
 
 from base64 import b64decode
-from falcon import API, HTTPUnauthorized
+from concurrent.futures import ThreadPoolExecutor
+from falcon import API, HTTPUnauthorized, HTTP_200, HTTP_304
 from falcon.routing import create_http_method_map
 from mailman.config import config
-from mailman.database.transaction import transactional
+from mailman.database.transaction import transaction
+from mailman.rest.cache import response_cache
 from mailman.rest.root import Root
+from operator import itemgetter
 from public import public
 from wsgiref.simple_server import (
     WSGIRequestHandler, WSGIServer, make_server as wsgi_server)
@@ -36,6 +39,7 @@ log = logging.getLogger('mailman.http')
 MISSING = object()
 SLASH = '/'
 EMPTYSTRING = ''
+EMPTYBYTES = b''
 REALM = 'mailman3-rest'
 
 
@@ -49,6 +53,37 @@ class AdminWSGIServer(WSGIServer):
                       client_address)
 
 
+class ThreadedAdminWSGIServer(AdminWSGIServer):
+    """Server class which handles requests in a pool of worker threads.
+
+    The main thread only accepts connections, which are then handed off to
+    one of `workers` threads.  Each worker thread uses its own database
+    session, which is released once the request has been handled.
+    """
+
+    def __init__(self, server_address, handler_class, workers):
+        super().__init__(server_address, handler_class)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        # This mirrors socketserver.ThreadingMixIn.process_request_thread().
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            config.db.release()
+
+    def server_close(self):
+        super().server_close()
+        # Let the requests in progress complete.
+        self._executor.shutdown(wait=True)
+
+
 class StderrLogger:
     def __init__(self):
         self._buffer = []
@@ -80,9 +115,10 @@ class AdminWebServiceWSGIRequestHandler(WSGIRequestHandler):
 class Middleware:
     """Falcon middleware object for Mailman's REST API.
 
-    This does two things.  It sets the API version on the resource
-    object, and it verifies that the proper authentication has been
-    performed.
+    This does three things.  It sets the API version on the resource
+    object, it verifies that the proper authentication has been
+    performed, and it answers conditional GET requests for resources
+    which haven't changed.
     """
     def process_resource(self, request, response, resource, params):
         # Check the authorization credentials.
@@ -101,15 +137,94 @@ class Middleware:
                 'REST API authorization failed',
                 challenges=['Basic realm=Mailman3'])
 
+    def process_response(self, request, response, resource,
+                         req_succeeded=True):
+        # If the client already has the current representation of the
+        # resource, tell it so instead of sending it again.
+        if (request.method not in ('GET', 'HEAD') or
+                response.status != HTTP_200 or
+                response.etag is None or
+                request.if_none_match is None):
+            return
+        tags = set(tag.strip() for tag in request.if_none_match.split(','))
+        # Weak comparison is used for If-None-Match, see RFC 7232.
+        tags.update(tag[2:] for tag in list(tags) if tag.startswith('W/'))
+        if response.etag in tags or '*' in tags:
+            response.status = HTTP_304
+            response.body = None
+
+
+class _DispatchTable:
+    """The child links of a resource class, ready for matching.
+
+    The children are ordered as `dir()` orders them, and the first one
+    which matches a path segment wins.  Plain string matchers are indexed
+    by the segment they match, while regular expressions are compiled
+    once, up front.
+    """
+
+    LITERAL, REGEXP, CALLABLE = range(3)
+
+    def __init__(self, obj):
+        # {segment -> [(position, name, kind, matcher)]}
+        self._literals = {}
+        # [(position, name, kind, matcher)]
+        self._matchers = []
+        for position, name in enumerate(dir(obj)):
+            if name.startswith('__') and name.endswith('__'):
+                continue
+            attribute = getattr(obj, name, MISSING)
+            assert attribute is not MISSING, name
+            matcher = getattr(attribute, '__matcher__', MISSING)
+            if matcher is MISSING:
+                continue
+            if isinstance(matcher, str):
+                # Is the matcher string a regular expression or plain
+                # string?  If it starts with a caret, it's a regexp.
+                if matcher.startswith('^'):
+                    self._matchers.append(
+                        (position, name, self.REGEXP, re.compile(matcher)))
+                else:
+                    self._literals.setdefault(matcher, []).append(
+                        (position, name, self.LITERAL, matcher))
+            else:
+                self._matchers.append(
+                    (position, name, self.CALLABLE, matcher))
+
+    def candidates(self, segment):
+        """The children which might match the segment, in order."""
+        literals = self._literals.get(segment)
+        if literals is None:
+            return self._matchers
+        if len(self._matchers) == 0:
+            return literals
+        return sorted(self._matchers + literals, key=itemgetter(0))
+
 
 class ObjectRouter:
     def __init__(self, root):
         self._root = root
+        # {resource class -> _DispatchTable}
+        self._tables = {}
 
     def add_route(self, uri_template, method_map, resource):
         # We don't need this method for object-based routing.
         raise NotImplementedError
 
+    def _table(self, resource):
+        cls = type(resource)
+        if cls.__dir__ is not object.__dir__:
+            # The resource computes its attributes dynamically, e.g. it
+            # proxies to another object, so its children are not a property
+            # of its class.
+            return _DispatchTable(resource)
+        table = self._tables.get(cls)
+        if table is None:
+            # Build the table from the class, not the instance, so that the
+            # resource's properties aren't evaluated.
+            table = self._tables[cls] = _DispatchTable(cls)
+        return table
+
     def find(self, uri):
         segments = uri.split(SLASH)
         # Since the path is always rooted at /, skip the first segment, which
@@ -122,30 +237,21 @@ class ObjectRouter:
             # Plumb the API through to all child resources.
             api = getattr(resource, 'api', None)
             # See if any of the resource's child links match the next segment.
-            for name in dir(resource):
-                if name.startswith('__') and name.endswith('__'):
-                    continue
-                attribute = getattr(resource, name, MISSING)
-                assert attribute is not MISSING, name
-                matcher = getattr(attribute, '__matcher__', MISSING)
-                if matcher is MISSING:
-                    continue
+            candidates = self._table(resource).candidates(this_segment)
+            for position, name, kind, matcher in candidates:
+                attribute = getattr(resource, name)
                 result = None
-                if isinstance(matcher, str):
-                    # Is the matcher string a regular expression or plain
-                    # string?  If it starts with a caret, it's a regexp.
-                    if matcher.startswith('^'):
-                        cre = re.compile(matcher)
-                        # Search against the entire remaining path.
-                        tmp_segments = segments[:]
-                        tmp_segments.insert(0, this_segment)
-                        remaining_path = SLASH.join(tmp_segments)
-                        mo = cre.match(remaining_path)
-                        if mo:
-                            result = attribute(
-                                context, segments, **mo.groupdict())
-                    elif matcher == this_segment:
-                        result = attribute(context, segments)
+                if kind is _DispatchTable.LITERAL:
+                    result = attribute(context, segments)
+                elif kind is _DispatchTable.REGEXP:
+                    # Search against the entire remaining path.
+                    tmp_segments = segments[:]
+                    tmp_segments.insert(0, this_segment)
+                    remaining_path = SLASH.join(tmp_segments)
+                    mo = matcher.match(remaining_path)
+                    if mo:
+                        result = attribute(
+                            context, segments, **mo.groupdict())
                 else:
                     # The matcher is a callable.  It returns None if it
                     # doesn't match, and if it does, it returns a 3-tuple
@@ -208,10 +314,58 @@ class RootedAPI(API):
 
     # Override the base class implementation to wrap a transactional
     # handler around the call, so that the current transaction is
-    # committed if no errors occur, and aborted otherwise.
-    @transactional
+    # committed if no errors occur, and aborted otherwise.  Streamed
+    # responses are produced after the responder returns, so their
+    # transaction is completed only once the stream has been consumed.
+    # Once a write is committed, the cached representations of the resources
+    # it may have changed are dropped.  The sub-requests of a batch drop them
+    # as they go as well, so that later sub-requests don't read stale ones.
     def __call__(self, environ, start_response):
-        return super().__call__(environ, start_response)
+        # Let batch requests dispatch their sub-requests within this
+        # request's transaction.
+        environ['mailman.dispatch'] = self._dispatch
+        try:
+            body = super().__call__(environ, start_response)
+            if not isinstance(body, list):
+                # Falcon hands back the response's stream iterable as is.
+                return self._stream(body)
+            config.db.commit()
+            if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+                # A batch request records the paths its sub-requests wrote
+                # to.
+                paths = environ.get(
+                    'mailman.writes', [environ.get('PATH_INFO', '')])
+                for path in paths:
+                    self._invalidate(path)
+            return body
+        except:                                             # noqa: E722
+            config.db.abort()
+            raise
+
+    def _invalidate(self, path):
+        # The path looks like /<api>/<group>/...
+        segments = path.split(SLASH)
+        if len(segments) > 2:
+            response_cache.invalidate(segments[2])
+
+    def _stream(self, body):
+        with transaction():
+            yield from body
+
+    def _dispatch(self, environ):
+        """Handle a request without completing the current transaction.
+
+        :param environ: The WSGI environment of the request.
+        :return: The response's status line, headers and body.
+        :rtype: 3-tuple of (str, list, bytes)
+        """
+        started = {}
+        def start_response(status, headers, exc_info=None):     # noqa: E306
+            started.update(status=status, headers=headers)
+        body = EMPTYBYTES.join(super().__call__(environ, start_response))
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            self._invalidate(environ['PATH_INFO'])
+        return started['status'], started['headers'], body
 
 
 @public
@@ -228,8 +382,13 @@ def make_server():
     """
     host = config.webservice.hostname
     port = int(config.webservice.port)
-    server = wsgi_server(
-        host, port, make_application(),
-        server_class=AdminWSGIServer,
-        handler_class=AdminWebServiceWSGIRequestHandler)
+    workers = int(config.webservice.workers)
+    if workers <= 1:
+        return wsgi_server(
+            host, port, make_application(),
+            server_class=AdminWSGIServer,
+            handler_class=AdminWebServiceWSGIRequestHandler)
+    server = ThreadedAdminWSGIServer(
+        (host, port), AdminWebServiceWSGIRequestHandler, workers)
+    server.set_app(make_application())
     return server
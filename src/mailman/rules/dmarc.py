@@ -19,23 +19,31 @@
 
 import os
 import re
+import json
+import pickle
 import logging
+import tempfile
 import dns.resolver
 
+from contextlib import suppress
+from datetime import datetime, timedelta
 from dns.exception import DNSException
 from email.utils import parseaddr
-from lazr.config import as_timedelta
+from lazr.config import as_boolean, as_timedelta
 from mailman.config import config
 from mailman.core.i18n import _
+from mailman.interfaces.cache import ICacheManager
 from mailman.interfaces.mailinglist import DMARCMitigateAction
 from mailman.interfaces.rules import IRule
 from mailman.utilities.datetime import now
+from mailman.utilities.lru import LRUCache
 from mailman.utilities.protocols import get
 from mailman.utilities.string import wrap
 from pkg_resources import resource_string as resource_bytes
 from public import public
 from requests.exceptions import HTTPError
 from urllib.error import URLError
+from zope.component import getUtility
 from zope.interface import implementer
 
 
@@ -46,11 +54,27 @@ DOT = '.'
 EMPTYSTRING = ''
 KEEP_LOOKING = object()
 LOCAL_FILE_NAME = 'public_suffix_list.dat'
+# The parsed suffix list is kept next to the cached copy in this file.
+COMPILED_FILE_NAME = LOCAL_FILE_NAME + '.pck'
+# The key in a trie node marking it as the end of a rule.  It maps to a
+# boolean indicating whether the rule is an exception or not.  Labels are
+# strings, so this can't clash with one, whatever the domain being looked up.
+RULE = None
+WILDCARD = '*'
 
-# Map organizational domain suffix rules to a boolean indicating whether the
-# rule is an exception or not.
+# The organizational domain suffix rules, as a trie keyed on the labels of
+# the rules from right to left.  E.g. *.kobe.jp and !city.kobe.jp are
+# stored as {'jp': {'kobe': {'*': {None: False}, 'city': {None: True}}}}.
 suffix_cache = dict()
 
+# The DMARC policy records of the _dmarc domains looked up by this process.
+# Each entry is either NO_RECORDS, or the name the records were found under
+# after following CNAMEs, and the TXT records of that name or None.
+policy_cache = LRUCache('dmarc', 'policy_cache_size', 'policy_cache_lifetime')
+NO_RECORDS = ()
+# The file cache key of shared policy records.
+SHARED_KEY = 'dmarc-policy:{}'
+
 
 def ensure_current_suffix_list():
     # Read and parse the organizational domain suffix list.  First look in the
@@ -91,29 +115,40 @@ def ensure_current_suffix_list():
             if isinstance(content, bytes):
                 content = content.decode('utf-8')
             # Write the cache atomically.
-            new_path = cached_copy_path + '.new'
-            with open(new_path, 'w', encoding='utf-8') as fp:
-                fp.write(content)
+            new_path = _write_new(cached_copy_path, content)
             # Set the expiry time to the future.
             mtime = (now() + lifetime).timestamp()
             os.utime(new_path, (mtime, mtime))
             # Flip the new file into the cached location.  This does not
             # modify the mtime.
-            os.rename(new_path, cached_copy_path)
+            os.replace(new_path, cached_copy_path)
     return cached_copy_path
 
 
-def parse_suffix_list(filename=None):
-    # Parse the suffix list into a per process cache.
-    if filename is None:
-        filename = ensure_current_suffix_list()
-    # At this point the cached copy must exist and is as valid as possible.
-    # Read and return the contents as a UTF-8 string.
+def _write_new(path, data):
+    # Write the data to a new file next to the path and return its name.
+    # Each writer gets its own file, so that processes or threads writing
+    # at the same time can't clobber each other's output.
+    binary = isinstance(data, bytes)
+    with tempfile.NamedTemporaryFile(
+            'wb' if binary else 'w',
+            encoding=None if binary else 'utf-8',
+            dir=os.path.dirname(path),
+            prefix=os.path.basename(path) + '.',
+            suffix='.new',
+            delete=False) as fp:
+        fp.write(data)
+    return fp.name
+
+
+def _parse(filename):
+    # Parse the suffix list file into a new trie.
+    trie = {}
     with open(filename, 'r', encoding='utf-8') as fp:
         for line in fp:
             if not line.strip() or line.startswith('//'):
                 continue
-            line = re.sub('\s.*', '', line)
+            line = re.sub(r'\s.*', '', line)
             if not line:
                 continue
             parts = line.lower().split('.')
@@ -123,8 +158,51 @@ def parse_suffix_list(filename=None):
             else:
                 exception = False
             parts.reverse()
-            key = DOT.join(parts)
-            suffix_cache[key] = exception
+            node = trie
+            for part in parts:
+                node = node.setdefault(part, {})
+            node[RULE] = exception
+    return trie
+
+
+def _load_compiled(filename):
+    # Return the trie compiled from the cached copy of the suffix list, if
+    # it is still current, otherwise compile and save it again.  The
+    # compiled file records the mtime and size of the copy it was compiled
+    # from.
+    compiled_path = os.path.join(config.VAR_DIR, COMPILED_FILE_NAME)
+    stat = os.stat(filename)
+    source = (stat.st_mtime, stat.st_size)
+    try:
+        with open(compiled_path, 'rb') as fp:
+            compiled_source, trie = pickle.load(fp)
+    except FileNotFoundError:
+        pass
+    except (AttributeError, EOFError, ImportError, IndexError, KeyError,
+            TypeError, ValueError, pickle.UnpicklingError) as error:
+        # Unpickling a corrupt file can fail in many ways.
+        elog.error('Ignoring bad compiled public suffix list %s: %s',
+                   compiled_path, error)
+    else:
+        if compiled_source == source:
+            return trie
+    trie = _parse(filename)
+    # Write the compiled file atomically.
+    new_path = _write_new(compiled_path, pickle.dumps(
+        (source, trie), protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(new_path, compiled_path)
+    return trie
+
+
+def parse_suffix_list(filename=None):
+    # Parse the suffix list into a per process cache.  The current cached
+    # copy is only parsed when it has changed since it was last compiled.
+    if filename is None:
+        trie = _load_compiled(ensure_current_suffix_list())
+    else:
+        trie = _parse(filename)
+    suffix_cache.clear()
+    suffix_cache.update(trie)
 
 
 def get_domain(parts, label):
@@ -140,40 +218,35 @@ def get_organizational_domain(domain):
     # Domain which may be the same as the input.
     if len(suffix_cache) == 0:
         parse_suffix_list()
-    hits = []
     parts = domain.lower().split('.')
     parts.reverse()
-    for key in suffix_cache:
-        key_parts = key.split('.')
-        if len(parts) >= len(key_parts):
-            for i in range(len(key_parts) - 1):
-                if parts[i] != key_parts[i] and key_parts[i] != '*':
-                    break
-            else:
-                if (parts[len(key_parts) - 1] == key_parts[-1] or
-                        key_parts[-1] == '*'):
-                    hits.append(key)
-    if not hits:
-        return get_domain(parts, 1)
+    # Walk down the trie one label at a time, following both the exact label
+    # and any wildcard, and remember the number of labels in the longest
+    # matching rule.
     label = 0
-    for key in hits:
-        key_parts = key.split('.')
-        if suffix_cache[key]:
-            # It's an exception.
-            return get_domain(parts, len(key_parts) - 1)
-        if len(key_parts) > label:
-            label = len(key_parts)
-    return get_domain(parts, label)
+    nodes = [suffix_cache]
+    for depth, part in enumerate(parts, start=1):
+        children = []
+        for node in nodes:
+            for key in (part, WILDCARD):
+                child = node.get(key)
+                if child is None:
+                    continue
+                exception = child.get(RULE)
+                if exception:
+                    return get_domain(parts, depth - 1)
+                if exception is not None:
+                    label = depth
+                children.append(child)
+        if len(children) == 0:
+            break
+        nodes = children
+    return get_domain(parts, max(label, 1))
 
 
-def is_reject_or_quarantine(mlist, email, dmarc_domain, org=False):
-    # This takes a mailing list, an email address as in the From: header, the
-    # _dmarc host name for the domain in question, and a flag stating whether
-    # we should check the organizational domains.  It returns one of three
-    # values:
-    # * True if the DMARC policy is reject or quarantine;
-    # * False if is not;
-    # * A special sentinel if we should continue looking
+def _query_records(dmarc_domain):
+    # Look up the DMARC policy records in the DNS.  Return the records and
+    # how long they may be cached.
     resolver = dns.resolver.Resolver()
     resolver.timeout = as_timedelta(
         config.dmarc.resolver_timeout).total_seconds()
@@ -182,24 +255,7 @@ def is_reject_or_quarantine(mlist, email, dmarc_domain, org=False):
     try:
         txt_recs = resolver.query(dmarc_domain, dns.rdatatype.TXT)
     except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-        return KEEP_LOOKING
-    except (dns.resolver.NoNameservers):
-        elog.error(
-            'DNSException: No Nameservers available for %s (%s).',
-            email, dmarc_domain)
-        # Typically this means a dnssec validation error.  Clients that don't
-        # perform validation *may* successfully see a _dmarc RR whereas a
-        # validating mailman server won't see the _dmarc RR.  We should
-        # mitigate this email to be safe.
-        return True
-    except DNSException as error:
-        elog.error(
-            'DNSException: Unable to query DMARC policy for %s (%s). %s',
-            email, dmarc_domain, error.__doc__)
-        # While we can't be sure what caused the error, there is potentially
-        # a DMARC policy record that we missed and that a receiver of the mail
-        # might see.  Thus, we should err on the side of caution and mitigate.
-        return True
+        return NO_RECORDS, as_timedelta(config.dmarc.policy_negative_lifetime)
     # Be as robust as possible in parsing the result.
     results_by_name = {}
     cnames = {}
@@ -232,11 +288,84 @@ def is_reject_or_quarantine(mlist, email, dmarc_domain, org=False):
     assert len(want_names) == 1, (
         'Error in CNAME processing for {}; want_names != 1.'.format(
             dmarc_domain))
-    for name in want_names:
-        if name not in results_by_name:
-            continue
+    name = want_names.pop()
+    # Cache the records for as long as the shortest time to live of the
+    # records and CNAMEs in the answer.
+    ttl = timedelta(seconds=min(
+        (rrset.ttl for rrset in txt_recs.response.answer), default=0))
+    return (name, results_by_name.get(name)), ttl
+
+
+def lookup_records(dmarc_domain):
+    """Return the DMARC policy records of a _dmarc domain.
+
+    The records are looked up in this process's policy cache, then in the
+    shared file cache if that's enabled, and only then in the DNS.
+
+    :param dmarc_domain: The _dmarc host name to look up.
+    :return: NO_RECORDS if there are no records, otherwise the name found by
+        following CNAMEs and its list of TXT records, which is None if the
+        name has none.
+    :raises DNSException: When the DNS lookup fails.
+    """
+    key = ('policies', dmarc_domain)
+    records = policy_cache.get(key)
+    if records is not None:
+        return records
+    shared = as_boolean(config.dmarc.policy_cache_shared)
+    if shared:
+        contents = getUtility(ICacheManager).get(
+            SHARED_KEY.format(dmarc_domain))
+        if contents is not None:
+            expires, records = json.loads(contents)
+            records = tuple(records)
+            policy_cache.put(key, records, datetime.fromtimestamp(expires))
+            return records
+    records, ttl = _query_records(dmarc_domain)
+    ttl = min(ttl, as_timedelta(config.dmarc.policy_cache_lifetime))
+    expiration = now() + ttl
+    policy_cache.put(key, records, expiration)
+    if shared and ttl > timedelta():
+        getUtility(ICacheManager).add(
+            SHARED_KEY.format(dmarc_domain),
+            json.dumps([expiration.timestamp(), records]),
+            ttl)
+    return records
+
+
+def is_reject_or_quarantine(mlist, email, dmarc_domain, org=False):
+    # This takes a mailing list, an email address as in the From: header, the
+    # _dmarc host name for the domain in question, and a flag stating whether
+    # we should check the organizational domains.  It returns one of three
+    # values:
+    # * True if the DMARC policy is reject or quarantine;
+    # * False if is not;
+    # * A special sentinel if we should continue looking
+    try:
+        records = lookup_records(dmarc_domain)
+    except (dns.resolver.NoNameservers):
+        elog.error(
+            'DNSException: No Nameservers available for %s (%s).',
+            email, dmarc_domain)
+        # Typically this means a dnssec validation error.  Clients that don't
+        # perform validation *may* successfully see a _dmarc RR whereas a
+        # validating mailman server won't see the _dmarc RR.  We should
+        # mitigate this email to be safe.
+        return True
+    except DNSException as error:
+        elog.error(
+            'DNSException: Unable to query DMARC policy for %s (%s). %s',
+            email, dmarc_domain, error.__doc__)
+        # While we can't be sure what caused the error, there is potentially
+        # a DMARC policy record that we missed and that a receiver of the mail
+        # might see.  Thus, we should err on the side of caution and mitigate.
+        return True
+    if len(records) == 0:
+        return KEEP_LOOKING
+    name, results = records
+    if results is not None:
         dmarcs = [
-            record for record in results_by_name[name]
+            record for record in results
             if record.startswith('v=DMARC1;')
             ]
         if len(dmarcs) == 0:
@@ -296,6 +425,29 @@ def maybe_mitigate(mlist, email):
     return False
 
 
+def prefetch_policies(email):
+    """Look up the DMARC policies for an address, to have them cached.
+
+    Both the policy of the address's domain and the policy of its
+    organizational domain are looked up, since the latter is needed when
+    the former is missing.  DNS failures are ignored; they are reported
+    when the policy is checked.
+
+    :param email: The email address, as in the From: header.
+    :type email: str
+    """
+    local, at, from_domain = email.lower().rpartition('@')
+    if at != '@':
+        return
+    domains = [from_domain]
+    org_dom = get_organizational_domain(from_domain)
+    if org_dom != from_domain:
+        domains.append(org_dom)
+    for domain in domains:
+        with suppress(DNSException):
+            lookup_records('_dmarc.{}'.format(domain))
+
+
 @public
 @implementer(IRule)
 class DMARCMitigation:
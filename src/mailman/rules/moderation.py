@@ -146,7 +146,7 @@ class NonmemberModeration:
             assert nonmember is not None, (
                 "sender didn't get subscribed as a nonmember".format(sender))
             # Check the '*_these_nonmembers' properties first.  XXX These are
-            # legacy attributes from MM2.1; their database type is 'pickle' and
+            # legacy attributes from MM2.1; they are stored as JSON lists and
             # they should eventually get replaced.
             for action_name in ('accept', 'hold', 'reject', 'discard'):
                 legacy_attribute_name = '{}_these_nonmembers'.format(
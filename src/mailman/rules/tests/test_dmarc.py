@@ -29,17 +29,19 @@ from http.server import BaseHTTPRequestHandler, HTTPServer
 from lazr.config import as_timedelta
 from mailman.app.lifecycle import create_list
 from mailman.config import config
+from mailman.interfaces.cache import ICacheManager
 from mailman.interfaces.mailinglist import DMARCMitigateAction
 from mailman.rules import dmarc
 from mailman.testing.helpers import (
     LogFileMark, configuration, specialized_message_from_string as mfs,
     wait_for_webservice)
 from mailman.testing.layers import ConfigLayer
-from mailman.utilities.datetime import now
+from mailman.utilities.datetime import factory, now
 from pkg_resources import resource_filename
 from public import public
 from unittest import TestCase
 from unittest.mock import patch
+from zope.component import getUtility
 
 
 @public
@@ -84,6 +86,7 @@ def get_dns_resolver(
             self.rdtype = rtype
             self.items = [Item(rdata, cname)]
             self.name = Name(name)
+            self.ttl = 3600
 
     class Answer:
         # Mock answer.
@@ -203,6 +206,15 @@ class TestDMARCRules(TestCase):
             dmarc.get_organizational_domain('ssub.sub.city.kobe.jp'),
             'city.kobe.jp')
 
+    def test_punctuation_labels(self):
+        # The labels of a From: domain can be anything, including the
+        # characters the suffix list uses for exceptions and wildcards.
+        self.assertEqual(dmarc.get_organizational_domain('x.!.com'), '!.com')
+        self.assertEqual(
+            dmarc.get_organizational_domain('x.!.kobe.jp'), 'x.!.kobe.jp')
+        self.assertEqual(
+            dmarc.get_organizational_domain('x.*.kobe.jp'), 'x.*.kobe.jp')
+
     def test_no_at_sign_in_from_address(self):
         # If there's no @ sign in the From: address, the rule can't hit.
         mlist = create_list('ant@example.com')
@@ -385,11 +397,279 @@ To: ant@example.com
         dmarc.parse_suffix_list(data_file)
         # There is no entry for example.biz because that line starts with
         # whitespace.
-        self.assertNotIn('biz.example', self.cache)
+        self.assertEqual(self.cache['biz'], {dmarc.RULE: False})
         # The file had !city.kobe.jp so the flag says there's an exception.
-        self.assertTrue(self.cache['jp.kobe.city'])
+        self.assertTrue(self.cache['jp']['kobe']['city'][dmarc.RULE])
         # The file had *.kobe.jp so there's no exception.
-        self.assertFalse(self.cache['jp.kobe.*'])
+        self.assertFalse(self.cache['jp']['kobe']['*'][dmarc.RULE])
+        # There is no rule for kobe.jp itself.
+        self.assertNotIn(dmarc.RULE, self.cache['jp']['kobe'])
+
+    def test_compiled_suffix_list(self):
+        # The parsed suffix list is saved next to the cached copy, and used
+        # by other processes for as long as the cached copy doesn't change.
+        dmarc.get_organizational_domain('example.com')
+        compiled_path = os.path.join(
+            config.VAR_DIR, dmarc.COMPILED_FILE_NAME)
+        self.assertTrue(os.path.exists(compiled_path))
+        self.cache.clear()
+        with patch('mailman.rules.dmarc._parse') as parse:
+            self.assertEqual(
+                dmarc.get_organizational_domain('ssub.sub.city.kobe.jp'),
+                'city.kobe.jp')
+        self.assertFalse(parse.called)
+        # Changing the cached copy invalidates the compiled file.
+        cache_path = os.path.join(config.VAR_DIR, dmarc.LOCAL_FILE_NAME)
+        with open(cache_path, 'a', encoding='utf-8') as fp:
+            print('example.com', file=fp)
+        self.cache.clear()
+        self.assertEqual(
+            dmarc.get_organizational_domain('a.b.example.com'),
+            'b.example.com')
+
+    def test_bad_compiled_suffix_list(self):
+        # A corrupt compiled file is logged and replaced.
+        compiled_path = os.path.join(
+            config.VAR_DIR, dmarc.COMPILED_FILE_NAME)
+        with open(compiled_path, 'wb') as fp:
+            fp.write(b'xyz')
+        mark = LogFileMark('mailman.error')
+        self.assertEqual(
+            dmarc.get_organizational_domain('ssub.sub.foo.kobe.jp'),
+            'sub.foo.kobe.jp')
+        self.assertIn('Ignoring bad compiled public suffix list',
+                      mark.readline())
+        self.cache.clear()
+        with patch('mailman.rules.dmarc._parse') as parse:
+            dmarc.get_organizational_domain('example.com')
+        self.assertFalse(parse.called)
+
+    def test_corrupt_compiled_suffix_list(self):
+        # A compiled file which is cut short, e.g. by a full disk, or
+        # otherwise corrupt is replaced too.
+        dmarc.get_organizational_domain('example.com')
+        compiled_path = os.path.join(
+            config.VAR_DIR, dmarc.COMPILED_FILE_NAME)
+        with open(compiled_path, 'rb') as fp:
+            data = fp.read()
+        for corrupt in (data[:1], data[:len(data) // 2], data[:-1],
+                        b'cmailman.rules.dmarc\nno_such_name\n.',
+                        b'cno_such_module\nno_such_name\n.',
+                        b'(l.', b'h\x00.'):
+            with open(compiled_path, 'wb') as fp:
+                fp.write(corrupt)
+            self.cache.clear()
+            self.assertEqual(
+                dmarc.get_organizational_domain('ssub.sub.foo.kobe.jp'),
+                'sub.foo.kobe.jp')
+            with open(compiled_path, 'rb') as fp:
+                self.assertEqual(fp.read(), data)
+
+    def test_compiled_suffix_list_written_apart(self):
+        # Each writer of the compiled file uses its own temporary file, and
+        # doesn't leave it behind.
+        dmarc.get_organizational_domain('example.com')
+        compiled_path = os.path.join(
+            config.VAR_DIR, dmarc.COMPILED_FILE_NAME)
+        names = []
+        write_new = dmarc._write_new
+        def record(path, data):                             # noqa: E306
+            names.append(write_new(path, data))
+            return names[-1]
+        with patch('mailman.rules.dmarc._write_new', record):
+            for i in range(2):
+                os.remove(compiled_path)
+                self.cache.clear()
+                dmarc.get_organizational_domain('example.com')
+        self.assertEqual(len(set(names)), 2)
+        for name in names:
+            self.assertEqual(os.path.dirname(name), config.VAR_DIR)
+            self.assertFalse(os.path.exists(name))
+
+
+class TestPolicyCache(TestCase):
+    """Test the caching of DMARC policy records."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._mlist = create_list('ant@example.com')
+        self._mlist.dmarc_mitigate_action = DMARCMitigateAction.reject
+        self._rule = dmarc.DMARCMitigation()
+        resources = ExitStack()
+        self.addCleanup(resources.close)
+        resources.enter_context(
+            patch('mailman.rules.dmarc.suffix_cache', {}))
+        resources.enter_context(use_test_organizational_data())
+        resources.enter_context(get_dns_resolver())
+        self._query = resources.enter_context(patch(
+            'mailman.rules.dmarc._query_records',
+            wraps=dmarc._query_records))
+
+    def _check(self, sender):
+        msg = mfs("""\
+From: {}
+To: ant@example.com
+
+""".format(sender))
+        return self._rule.check(self._mlist, msg, {})
+
+    def test_policy_is_cached(self):
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertTrue(self._check('bart@example.biz'))
+        self.assertEqual(self._query.call_count, 1)
+
+    def test_missing_policy_is_cached(self):
+        # There's no record for the domain, nor its organizational domain.
+        self.assertFalse(self._check('anne@sub.example.org'))
+        self.assertEqual(self._query.call_count, 2)
+        self.assertFalse(self._check('bart@sub.example.org'))
+        self.assertEqual(self._query.call_count, 2)
+
+    @configuration('dmarc', policy_cache_lifetime='10d',
+                   policy_negative_lifetime='10d')
+    def test_time_to_live(self):
+        # The records are cached for their time to live in the DNS, and the
+        # missing records for the configured negative lifetime.
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertFalse(self._check('anne@example.org'))
+        self.assertEqual(self._query.call_count, 2)
+        factory.fast_forward(days=1)
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertFalse(self._check('anne@example.org'))
+        self.assertEqual(self._query.call_count, 3)
+        self._query.assert_called_with('_dmarc.example.biz')
+
+    def test_errors_are_not_cached(self):
+        self.assertTrue(self._check('anne@example.info'))
+        self.assertTrue(self._check('anne@example.info'))
+        self.assertEqual(self._query.call_count, 2)
+
+    @configuration('dmarc', policy_cache_size='0')
+    def test_cache_disabled(self):
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertEqual(self._query.call_count, 2)
+
+    @configuration('dmarc', policy_cache_shared='yes')
+    def test_shared_cache(self):
+        # Other processes find the records in the file cache.
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertFalse(self._check('anne@example.org'))
+        self.assertIsNotNone(getUtility(ICacheManager).get(
+            dmarc.SHARED_KEY.format('_dmarc.example.biz')))
+        dmarc.policy_cache.clear()
+        self.assertTrue(self._check('anne@example.biz'))
+        self.assertFalse(self._check('anne@example.org'))
+        self.assertEqual(self._query.call_count, 2)
+
+    @configuration('dmarc', policy_cache_shared='yes')
+    def test_prefetch_policies(self):
+        # Both the domain's and the organizational domain's policies are
+        # looked up.
+        dmarc.prefetch_policies('anne@sub.domain.example.biz')
+        self.assertEqual(
+            [call[0][0] for call in self._query.call_args_list],
+            ['_dmarc.sub.domain.example.biz', '_dmarc.example.biz'])
+        dmarc.policy_cache.clear()
+        self.assertTrue(self._check('anne@sub.domain.example.biz'))
+        self.assertEqual(self._query.call_count, 2)
+
+    def test_prefetch_ignores_errors(self):
+        dmarc.prefetch_policies('anne@example.info')
+        dmarc.prefetch_policies('anne')
+        self.assertEqual(self._query.call_count, 1)
+
+
+def _linear_organizational_domain(rules, domain):
+    # The original implementation, which matches the domain against each of
+    # the rules in turn, for comparison.
+    hits = []
+    parts = domain.lower().split('.')
+    parts.reverse()
+    for key in rules:
+        key_parts = key.split('.')
+        if len(parts) >= len(key_parts):
+            for i in range(len(key_parts) - 1):
+                if parts[i] != key_parts[i] and key_parts[i] != '*':
+                    break
+            else:
+                if (parts[len(key_parts) - 1] == key_parts[-1] or
+                        key_parts[-1] == '*'):
+                    hits.append(key)
+    if not hits:
+        return dmarc.get_domain(parts, 1)
+    label = 0
+    for key in hits:
+        key_parts = key.split('.')
+        if rules[key]:
+            return dmarc.get_domain(parts, len(key_parts) - 1)
+        if len(key_parts) > label:
+            label = len(key_parts)
+    return dmarc.get_domain(parts, label)
+
+
+class TestOrganizationalDomainTrie(TestCase):
+    """Compare the suffix trie with the original linear search.
+
+    See contrib/benchmarks/suffix_trie.py for their timings.
+    """
+
+    layer = ConfigLayer
+
+    # A mix of From: domains, from the common to the unlikely.
+    domains = [
+        'gmail.com', 'mail.yahoo.co.uk', 'example.org', 'lists.example.com',
+        'a.b.c.example.net', 'gov.uk', 'cs.univ.ac.jp', 'city.kobe.jp',
+        'www.city.kobe.jp', 'ssub.sub.foo.kobe.jp', 'blogspot.com',
+        'me.blogspot.co.uk', 'example.nxtld', 'localhost', 'EXAMPLE.De',
+        'x.y.s3.amazonaws.com', 'foo.ck', 'www.ck', 'a.b.bd',
+        ]
+
+    def setUp(self):
+        self.cache = {}
+        patcher = patch('mailman.rules.dmarc.suffix_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dmarc.parse_suffix_list(resource_filename(
+            'mailman.rules.data', dmarc.LOCAL_FILE_NAME))
+        # Flatten the trie into the original map of rules to exceptions.
+        self.rules = {}
+        def flatten(node, labels):                          # noqa: E306
+            for label, child in node.items():
+                if label == dmarc.RULE:
+                    self.rules['.'.join(labels)] = child
+                else:
+                    flatten(child, labels + [label])
+        flatten(self.cache, [])
+
+    def test_same_results(self):
+        for domain in self.domains:
+            self.assertEqual(
+                dmarc.get_organizational_domain(domain),
+                _linear_organizational_domain(self.rules, domain),
+                domain)
+
+    def test_lookups_follow_the_labels(self):
+        # Each label is looked up in at most a few nodes, rather than in
+        # each of the thousands of rules.
+        lookups = []
+        class Node(dict):                                   # noqa: E306
+            def get(self, key, default=None):
+                lookups.append(key)
+                return super().get(key, default)
+        def convert(node):                                  # noqa: E306
+            return Node((label, child if label == dmarc.RULE
+                         else convert(child))
+                        for label, child in node.items())
+        trie = convert(self.cache)
+        self.cache.clear()
+        self.cache.update(trie)
+        for domain in self.domains:
+            del lookups[:]
+            dmarc.get_organizational_domain(domain)
+            labels = domain.count('.') + 1
+            self.assertLessEqual(len(lookups), 6 * labels, domain)
 
 
 # New in Python 3.5.
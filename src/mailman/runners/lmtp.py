@@ -34,20 +34,30 @@ so that the peer mail server can provide better diagnostics.
     http://www.faqs.org/rfcs/rfc2033.html
 """
 
+import os
+import time
 import email
 import asyncio
 import logging
+import threading
 
 from aiosmtpd.controller import Controller
 from aiosmtpd.lmtp import LMTP
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
+from datetime import timedelta
 from email.utils import parseaddr
+from lazr.config import as_boolean, as_timedelta
 from mailman.config import config
 from mailman.core.runner import Runner
 from mailman.database.transaction import transactional
 from mailman.email.message import Message
+from mailman.interfaces.changes import ChangeKind, IChangeLog
 from mailman.interfaces.listmanager import IListManager
+from mailman.interfaces.mailinglist import DMARCMitigateAction
+from mailman.interfaces.recentmessages import IRecentMessages
 from mailman.interfaces.runner import RunnerInterrupt
+from mailman.rules.dmarc import prefetch_policies
 from mailman.utilities.datetime import now
 from mailman.utilities.email import add_message_hash
 from public import public
@@ -86,7 +96,11 @@ SUBADDRESS_QUEUES = dict(
 
 DASH = '-'
 CRLF = '\r\n'
+MEGABYTE = 1024 * 1024
+OK_250 = '250 Ok'
 ERR_451 = '451 Requested action aborted: error in processing'
+ERR_451_BUSY = '451 Requested action aborted: too busy, try again later'
+ERR_452 = '452 Requested action not taken: insufficient system storage'
 ERR_501 = '501 Message has defects'
 ERR_502 = '502 Error: command HELO not implemented'
 ERR_550 = '550 Requested action not taken: mailbox unavailable'
@@ -117,30 +131,279 @@ def split_recipient(address):
     return listname, subaddress, domain
 
 
+def _prefetch_policies(address):
+    # Look up the DMARC policies of the sender in a worker thread, which
+    # needs its own database session for the shared cache.
+    try:
+        prefetch_policies(address)
+        config.db.commit()
+    except Exception:
+        elog.exception('DMARC policy prefetch: %s', address)
+        config.db.abort()
+    finally:
+        config.db.release()
+
+
+def _should_prefetch(mlist):
+    return (as_boolean(config.dmarc.policy_prefetch) and
+            as_boolean(config.dmarc.policy_cache_shared) and
+            mlist.dmarc_mitigate_action is not
+            DMARCMitigateAction.no_mitigation)
+
+
+class ListIndex:
+    """The list-ids of all the mailing lists, by posting address.
+
+    The index is only rebuilt when the change log shows that mailing lists
+    have been created or deleted, which takes one cheap query per check.
+    Looking up an address which is not in the index, or whose list has gone
+    away, still falls back to the database, in case a change was missed.
+    The index is shared by the worker threads.
+    """
+
+    def __init__(self):
+        self._list_ids = {}
+        self._token = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Rebuild the index if mailing lists were created or deleted."""
+        changelog = getUtility(IChangeLog)
+        token = changelog.latest
+        with self._lock:
+            if token == self._token:
+                return
+            # The token goes backward when the change log is emptied.
+            if (self._token is None or token < self._token or any(
+                    change.kind is ChangeKind.mailing_list
+                    for change in changelog.since(self._token, token))):
+                self._list_ids = dict(
+                    getUtility(IListManager).names_and_list_ids)
+            self._token = token
+
+    def get(self, fqdn_listname):
+        """Return the mailing list with the given posting address.
+
+        :param fqdn_listname: The posting address.
+        :type fqdn_listname: str
+        :return: The mailing list, or None if there is no such list.
+        :rtype: `IMailingList`
+        """
+        list_manager = getUtility(IListManager)
+        list_id = self._list_ids.get(fqdn_listname)
+        if list_id is not None:
+            mlist = list_manager.get_by_list_id(list_id)
+            if mlist is None:
+                with self._lock:
+                    self._list_ids.pop(fqdn_listname, None)
+            return mlist
+        mlist = list_manager.get_by_fqdn(fqdn_listname)
+        if mlist is not None:
+            with self._lock:
+                self._list_ids[fqdn_listname] = mlist.list_id
+        return mlist
+
+
+def _queue_depth(queue_directory):
+    # Count the queued messages, but not the temporary or backup files.
+    with os.scandir(queue_directory) as entries:
+        return sum(1 for entry in entries if entry.name.endswith('.pck'))
+
+
+class AdmissionControl:
+    """Hold off incoming mail while Mailman is backed up.
+
+    Mail is refused with a temporary failure when a queue grows past its high
+    watermark, or the free space on the queue's file system falls below its
+    minimum.  It is accepted again only once every queue has drained to its
+    low watermark and there is enough free space to resume, so that intake
+    doesn't flap around a single threshold.
+    """
+
+    def __init__(self):
+        self._watermarks = {}
+        for section in config.runner_configs:
+            name = section.name.split('.')[-1]
+            high = int(section.high_watermark)
+            if high > 0 and name in config.switchboards:
+                low = min(int(section.low_watermark), high)
+                self._watermarks[name] = (high, low)
+        self._min_free = int(config.mta.lmtp_min_free_space) * MEGABYTE
+        self._resume_free = max(
+            int(config.mta.lmtp_resume_free_space) * MEGABYTE,
+            self._min_free)
+        self._interval = as_timedelta(
+            config.mta.lmtp_admission_interval).total_seconds()
+        self._lock = threading.Lock()
+        self._checked = None
+        self._status = None
+
+    def check(self):
+        """Return whether mail can be accepted right now.
+
+        :return: None when mail can be accepted, otherwise the temporary
+            failure status to answer with.
+        :rtype: str
+        """
+        if not self._watermarks and self._min_free == 0:
+            return None
+        with self._lock:
+            when = time.monotonic()
+            if self._checked is None or when - self._checked >= self._interval:
+                status = self._measure()
+                if status != self._status:
+                    if status is None:
+                        qlog.info('LMTP accepting mail again')
+                    else:
+                        qlog.warning('LMTP refusing mail: %s', status)
+                self._status = status
+                self._checked = when
+            return self._status
+
+    def _measure(self):
+        # While mail is being refused, it takes the low watermarks to be
+        # reached before it is accepted again.
+        refusing = self._status is not None
+        for name, (high, low) in self._watermarks.items():
+            depth = _queue_depth(config.switchboards[name].queue_directory)
+            if depth >= high or (refusing and depth > low):
+                return ERR_451_BUSY
+        if self._min_free > 0:
+            stat = os.statvfs(config.QUEUE_DIR)
+            free = stat.f_bavail * stat.f_frsize
+            if (free < self._min_free or
+                    (refusing and free < self._resume_free)):
+                return ERR_452
+        return None
+
+
 class LMTPHandler:
+    """Handle the LMTP transactions.
+
+    The event loop only shuttles data to and from the mail server.  The
+    recipients are checked, and the messages parsed and queued, in a pool of
+    worker threads, each with its own database session.  When all the
+    workers are busy and enough work is waiting for them, the handler
+    answers with temporary failures, so that the mail server tries again
+    later.  It does the same while the queues are backed up.
+    """
+
+    def __init__(self):
+        self._lists = ListIndex()
+        self._admission = AdmissionControl()
+        workers = int(config.mta.lmtp_workers)
+        self._limit = workers + int(config.mta.lmtp_backlog)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # The number of jobs in the workers or waiting for them.  This is
+        # only touched in the event loop's thread.
+        self._pending = 0
+
+    def close(self):
+        """Let the jobs in progress complete, then stop the workers."""
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, loop, function, *args):
+        # Run the function in a worker thread and return its future, or
+        # return None right away when the pool is saturated.
+        if self._pending >= self._limit:
+            return None
+        self._pending += 1
+        future = loop.run_in_executor(self._executor, function, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._pending -= 1
+
+    @asyncio.coroutine
+    def _run(self, loop, function, *args):
+        # Run the function in a worker thread and return its result, or
+        # return None right away when the pool is saturated.
+        future = self._submit(loop, function, *args)
+        if future is None:
+            return None
+        return (yield from future)
+
+    def _find_list(self, to):
+        # Return the mailing list a recipient address is destined for, or
+        # None, and the subaddress.
+        if '@' not in to:
+            return None, None
+        local, subaddress, domain = split_recipient(to)
+        if subaddress is not None:
+            # Check that local-subaddress is not an actual list name.
+            mlist = self._lists.get(
+                '{}-{}@{}'.format(local, subaddress, domain))
+            if mlist is not None:
+                return mlist, None
+        return self._lists.get('{}@{}'.format(local, domain)), subaddress
+
     @asyncio.coroutine
+    def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        # Reject the recipients which are not list addresses right away,
+        # before the message is received.
+        status = yield from self._run(
+            server.loop, self._check_recipient, address)
+        if status is None:
+            return ERR_451_BUSY
+        if status == OK_250:
+            envelope.rcpt_tos.append(address)
+            envelope.rcpt_options.extend(rcpt_options)
+        return status
+
     @transactional
+    def _check_recipient(self, address):
+        try:
+            status = self._admission.check()
+            if status is not None:
+                return status
+            self._lists.refresh()
+            mlist, subaddress = self._find_list(parseaddr(address)[1].lower())
+        except Exception:
+            elog.exception('LMTP recipient: %s', address)
+            config.db.abort()
+            return ERR_451
+        return (ERR_550 if mlist is None else OK_250)
+
+    @asyncio.coroutine
     def handle_DATA(self, server, session, envelope):
+        result = yield from self._run(server.loop, self._deliver, envelope)
+        if result is None:
+            return CRLF.join(ERR_451_BUSY for to in envelope.rcpt_tos)
+        status, prefetch_address = result
+        # While the message waits in the incoming queue, look up the DMARC
+        # policy of its sender so that the incoming runner finds it cached.
+        # This is skipped while the workers are saturated.
+        if prefetch_address:
+            self._submit(server.loop, _prefetch_policies, prefetch_address)
+        return status
+
+    @transactional
+    def _deliver(self, envelope):
+        # Parse and queue the message.  Return the LMTP status and the
+        # sender address whose DMARC policy should be prefetched, if any.
         try:
-            # Refresh the list of list names every time we process a message
-            # since the set of mailing lists could have changed.
-            listnames = set(getUtility(IListManager).names)
+            # The set of mailing lists could have changed since the
+            # recipients were checked.
+            self._lists.refresh()
             # Parse the message data.  If there are any defects in the
             # message, reject it right away; it's probably spam.
             msg = email.message_from_bytes(envelope.content, Message)
         except Exception:
             elog.exception('LMTP message parsing')
             config.db.abort()
-            return CRLF.join(ERR_451 for to in envelope.rcpt_tos)
+            return CRLF.join(ERR_451 for to in envelope.rcpt_tos), None
         # Do basic post-processing of the message, checking it for defects or
         # other missing information.
         message_id = msg.get('message-id')
         if message_id is None:
-            return ERR_550_MID
+            return ERR_550_MID, None
         if msg.defects:
-            return ERR_501
+            return ERR_501, None
         msg.original_size = len(envelope.content)
-        add_message_hash(msg)
+        message_id_hash = add_message_hash(msg)
+        deduplicate = as_timedelta(
+            config.mta.lmtp_duplicate_window) > timedelta(0)
         msg['X-MailFrom'] = envelope.mail_from
         # RFC 2033 requires us to return a status code for every recipient.
         status = []
@@ -149,65 +412,75 @@ class LMTPHandler:
         # the message to the appropriate place and record a 250 status for
         # that recipient.  If not, record a failure status for that recipient.
         received_time = now()
+        prefetch = False
         for to in envelope.rcpt_tos:
+            # Each recipient gets a savepoint, so that a failure only undoes
+            # its own changes, not the messages already recorded for the
+            # recipients before it.
             try:
-                to = parseaddr(to)[1].lower()
-                local, subaddress, domain = split_recipient(to)
-                if subaddress is not None:
-                    # Check that local-subaddress is not an actual list name.
-                    listname = '{}-{}@{}'.format(local, subaddress, domain)
-                    if listname in listnames:
-                        local = '{}-{}'.format(local, subaddress)
-                        subaddress = None
-                slog.debug('%s to: %s, list: %s, sub: %s, dom: %s',
-                           message_id, to, local, subaddress, domain)
-                listname = '{}@{}'.format(local, domain)
-                if listname not in listnames:
-                    status.append(ERR_550)
-                    continue
-                mlist = getUtility(IListManager).get_by_fqdn(listname)
-                # The recipient is a valid mailing list.  Find the subaddress
-                # if there is one, and set things up to enqueue to the proper
-                # queue.
-                queue = None
-                msgdata = dict(listid=mlist.list_id,
-                               original_size=msg.original_size,
-                               received_time=received_time)
-                canonical_subaddress = SUBADDRESS_NAMES.get(subaddress)
-                queue = SUBADDRESS_QUEUES.get(canonical_subaddress)
-                if subaddress is None:
-                    # The message is destined for the mailing list.
-                    msgdata['to_list'] = True
-                    queue = 'in'
-                elif canonical_subaddress is None:
-                    # The subaddress was bogus.
-                    slog.error('%s unknown sub-address: %s',
-                               message_id, subaddress)
-                    status.append(ERR_550)
-                    continue
-                else:
-                    # A valid subaddress.
-                    msgdata['subaddress'] = canonical_subaddress
-                    if canonical_subaddress == 'owner':
-                        msgdata.update(dict(
-                            to_owner=True,
-                            envsender=config.mailman.site_owner,
-                            ))
+                with config.db.store.begin_nested():
+                    to = parseaddr(to)[1].lower()
+                    mlist, subaddress = self._find_list(to)
+                    slog.debug('%s to: %s, list: %s, sub: %s',
+                               message_id, to,
+                               None if mlist is None else mlist.fqdn_listname,
+                               subaddress)
+                    if mlist is None:
+                        status.append(ERR_550)
+                        continue
+                    # The recipient is a valid mailing list.  Find the
+                    # subaddress if there is one, and set things up to
+                    # enqueue to the proper queue.
+                    queue = None
+                    msgdata = dict(listid=mlist.list_id,
+                                   original_size=msg.original_size,
+                                   received_time=received_time)
+                    canonical_subaddress = SUBADDRESS_NAMES.get(subaddress)
+                    queue = SUBADDRESS_QUEUES.get(canonical_subaddress)
+                    if subaddress is None:
+                        # The message is destined for the mailing list.
+                        # Copies of a message the list recently accepted are
+                        # dropped, but the mail server is told they were
+                        # delivered.
+                        recent_messages = getUtility(IRecentMessages)
+                        if deduplicate and not recent_messages.record(
+                                mlist.list_id, message_id_hash):
+                            slog.info('%s duplicate dropped, list: %s',
+                                      message_id, mlist.fqdn_listname)
+                            status.append(OK_250)
+                            continue
+                        msgdata['to_list'] = True
                         queue = 'in'
-                # If we found a valid destination, enqueue the message and add
-                # a success status for this recipient.
-                if queue is not None:
-                    config.switchboards[queue].enqueue(msg, msgdata)
-                    slog.debug('%s subaddress: %s, queue: %s',
-                               message_id, canonical_subaddress, queue)
-                    status.append('250 Ok')
+                        prefetch = prefetch or _should_prefetch(mlist)
+                    elif canonical_subaddress is None:
+                        # The subaddress was bogus.
+                        slog.error('%s unknown sub-address: %s',
+                                   message_id, subaddress)
+                        status.append(ERR_550)
+                        continue
+                    else:
+                        # A valid subaddress.
+                        msgdata['subaddress'] = canonical_subaddress
+                        if canonical_subaddress == 'owner':
+                            msgdata.update(dict(
+                                to_owner=True,
+                                envsender=config.mailman.site_owner,
+                                ))
+                            queue = 'in'
+                    # If we found a valid destination, enqueue the message
+                    # and add a success status for this recipient.
+                    if queue is not None:
+                        config.switchboards[queue].enqueue(msg, msgdata)
+                        slog.debug('%s subaddress: %s, queue: %s',
+                                   message_id, canonical_subaddress, queue)
+                        status.append(OK_250)
             except Exception:
                 slog.exception('Queue detection: %s', msg['message-id'])
-                config.db.abort()
                 status.append(ERR_550)
         # All done; returning this big status string should give the expected
         # response to the LMTP client.
-        return CRLF.join(status)
+        from_address = parseaddr(msg.get('from', ''))[1]
+        return CRLF.join(status), (from_address if prefetch else None)
 
 
 class LMTPController(Controller):
@@ -229,7 +502,8 @@ class LMTPRunner(Runner):
         super().__init__(name, slice)
         hostname = config.mta.lmtp_host
         port = int(config.mta.lmtp_port)
-        self.lmtp = LMTPController(LMTPHandler(), hostname=hostname, port=port)
+        self._handler = LMTPHandler()
+        self.lmtp = LMTPController(self._handler, hostname=hostname, port=port)
         qlog.debug('LMTP server listening on %s:%s', hostname, port)
 
     def run(self):
@@ -239,3 +513,4 @@ class LMTPRunner(Runner):
             while not self._stop:
                 self._snooze(0)
             self.lmtp.stop()
+            self._handler.close()
@@ -40,10 +40,12 @@ class RESTRunner(Runner):
     def __init__(self, name, slice=None):
         """See `IRunner`."""
         super().__init__(name, slice)
-        # Both the REST server and the signal handlers must run in the main
-        # thread; the former because of SQLite requirements (objects created
-        # in one thread cannot be shared with the other threads), and the
-        # latter because of Python's signal handling semantics.
+        # Both the REST server loop and the signal handlers must run in the
+        # main thread; the former because of SQLite requirements (objects
+        # created in one thread cannot be shared with the other threads), and
+        # the latter because of Python's signal handling semantics.  When the
+        # server is configured with more than one worker, requests are handed
+        # off to worker threads, each of which has its own database session.
         #
         # Unfortunately, we cannot issue a TCPServer shutdown in the main
         # thread, because that will cause a deadlock.  Yay.   So what we do is
@@ -63,6 +65,7 @@ class RESTRunner(Runner):
         """See `IRunner`."""
         with suppress(RunnerInterrupt):
             self._server.serve_forever()
+        self._server.server_close()
 
     def signal_handler(self, signum, frame):
         with suppress(RunnerInterrupt):
@@ -18,15 +18,27 @@
 """Tests for the LMTP server."""
 
 import os
+import asyncio
 import smtplib
 import unittest
+import threading
 
 from datetime import datetime
 from mailman.app.lifecycle import create_list
 from mailman.config import config
 from mailman.database.transaction import transaction
-from mailman.testing.helpers import get_lmtp_client, get_queue_messages
-from mailman.testing.layers import LMTPLayer
+from mailman.interfaces.listmanager import IListManager
+from mailman.interfaces.mailinglist import DMARCMitigateAction
+from mailman.model.listmanager import ListManager
+from mailman.runners.lmtp import (
+    AdmissionControl, ERR_451_BUSY, ERR_452, LMTPHandler, ListIndex)
+from mailman.testing.helpers import (
+    configuration, get_lmtp_client, get_queue_messages,
+    specialized_message_from_string as mfs, subscribe)
+from mailman.testing.layers import ConfigLayer, LMTPLayer
+from types import SimpleNamespace
+from unittest.mock import PropertyMock, patch
+from zope.component import getUtility
 
 
 class TestLMTP(unittest.TestCase):
@@ -104,8 +116,9 @@ Message-ID: <ant>
         self.assertFalse(os.path.isdir(queue_directory))
 
     def test_nonexistent_mailing_list(self):
-        # Trying to post to a nonexistent mailing list is an error.
-        with self.assertRaises(smtplib.SMTPDataError) as cm:
+        # Trying to post to a nonexistent mailing list is an error.  The
+        # recipient is rejected before the message is sent.
+        with self.assertRaises(smtplib.SMTPRecipientsRefused) as cm:
             self._lmtp.sendmail('anne@example.com',
                                 ['notalist@example.com'], """\
 From: anne.person@example.com
@@ -114,13 +127,14 @@ Subject: An interesting message
 Message-ID: <aardvark>
 
 """)
-        self.assertEqual(cm.exception.smtp_code, 550)
-        self.assertEqual(cm.exception.smtp_error,
-                         b'Requested action not taken: mailbox unavailable')
+        self.assertEqual(cm.exception.recipients, {
+            'notalist@example.com': (
+                550, b'Requested action not taken: mailbox unavailable'),
+            })
 
     def test_missing_subaddress(self):
         # Trying to send a message to a bogus subaddress is an error.
-        with self.assertRaises(smtplib.SMTPDataError) as cm:
+        with self.assertRaises(smtplib.SMTPRecipientsRefused) as cm:
             self._lmtp.sendmail('anne@example.com',
                                 ['test-bogus@example.com'], """\
 From: anne.person@example.com
@@ -129,9 +143,50 @@ Subject: An interesting message
 Message-ID: <aardvark>
 
 """)
-        self.assertEqual(cm.exception.smtp_code, 550)
-        self.assertEqual(cm.exception.smtp_error,
-                         b'Requested action not taken: mailbox unavailable')
+        self.assertEqual(cm.exception.recipients, {
+            'test-bogus@example.com': (
+                550, b'Requested action not taken: mailbox unavailable'),
+            })
+
+    def test_some_recipients_refused(self):
+        # The message is delivered to the recipients which are list
+        # addresses.
+        refused = self._lmtp.sendmail(
+            'anne@example.com',
+            ['notalist@example.com', 'test@example.com'], """\
+From: anne.person@example.com
+To: test@example.com
+Subject: An interesting message
+Message-ID: <aardvark>
+
+""")
+        self.assertEqual(refused, {
+            'notalist@example.com': (
+                550, b'Requested action not taken: mailbox unavailable'),
+            })
+        items = get_queue_messages('in', expected_count=1)
+        self.assertEqual(items[0].msgdata['listid'], 'test.example.com')
+
+    def test_new_and_deleted_lists(self):
+        # The server notices mailing lists which are created and deleted.
+        with transaction():
+            create_list('ant@example.com')
+        self._lmtp.sendmail('anne@example.com', ['ant@example.com'], """\
+From: anne.person@example.com
+To: ant@example.com
+Message-ID: <aardvark>
+
+""")
+        get_queue_messages('in', expected_count=1)
+        with transaction():
+            getUtility(IListManager).delete(self._mlist)
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            self._lmtp.sendmail('anne@example.com', ['test@example.com'], """\
+From: anne.person@example.com
+To: test@example.com
+Message-ID: <bee>
+
+""")
 
     def test_mailing_list_with_subaddress(self):
         # A mailing list with a subaddress in its name should be recognized as
@@ -215,6 +270,40 @@ Subject: This should be accepted.
         items = get_queue_messages('in', expected_count=1)
         self.assertEqual(items[0].msgdata['listid'], 'test.example.com')
 
+    def test_duplicate_message_dropped(self):
+        # A copy of a message the list recently accepted is acknowledged,
+        # but not queued again.
+        message = """\
+From: anne@example.com
+To: test@example.com
+Message-ID: <ant>
+
+"""
+        with transaction():
+            create_list('other@example.com')
+        self._lmtp.sendmail('anne@example.com', ['test@example.com'], message)
+        refused = self._lmtp.sendmail(
+            'anne@example.com', ['test@example.com', 'other@example.com'],
+            message)
+        self.assertEqual(refused, {})
+        items = get_queue_messages('in', expected_count=2)
+        self.assertEqual(
+            sorted(item.msgdata['listid'] for item in items),
+            ['other.example.com', 'test.example.com'])
+
+    def test_duplicate_owner_message_accepted(self):
+        # Only posts to the list are checked for duplicates.
+        message = """\
+From: anne@example.com
+To: test-owner@example.com
+Message-ID: <ant>
+
+"""
+        for i in range(2):
+            self._lmtp.sendmail(
+                'anne@example.com', ['test-owner@example.com'], message)
+        get_queue_messages('in', expected_count=2)
+
 
 class TestBugs(unittest.TestCase):
     """Test some LMTP related bugs."""
@@ -254,3 +343,308 @@ Message-ID: <alpha>
 """)
         items = get_queue_messages('in', expected_count=1)
         self.assertEqual(items[0].msg['message-id'], '<alpha>')
+
+
+class TestListIndex(unittest.TestCase):
+    """Test the index of list names of the LMTP server."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._mlist = create_list('test@example.com')
+        self._index = ListIndex()
+
+    def test_rebuilt_on_list_changes(self):
+        with patch.object(ListManager, 'names_and_list_ids',
+                          new_callable=PropertyMock,
+                          return_value=[]) as names:
+            self._index.refresh()
+            self._index.refresh()
+            self.assertEqual(names.call_count, 1)
+            # Other changes don't rebuild the index.
+            subscribe(self._mlist, 'Anne')
+            self._index.refresh()
+            self.assertEqual(names.call_count, 1)
+            create_list('ant@example.com')
+            self._index.refresh()
+            self.assertEqual(names.call_count, 2)
+            getUtility(IListManager).delete(self._mlist)
+            self._index.refresh()
+            self.assertEqual(names.call_count, 3)
+
+    def test_get(self):
+        self._index.refresh()
+        self.assertEqual(self._index.get('test@example.com'), self._mlist)
+        self.assertIsNone(self._index.get('ant@example.com'))
+
+    def test_missing_list(self):
+        # A list missing from the index is looked up in the database.
+        self._index.refresh()
+        mlist = create_list('ant@example.com')
+        self.assertEqual(self._index.get('ant@example.com'), mlist)
+
+    def test_deleted_list(self):
+        self._index.refresh()
+        getUtility(IListManager).delete(self._mlist)
+        self.assertIsNone(self._index.get('test@example.com'))
+
+    def test_deleted_list_concurrently(self):
+        # Another worker thread drops the deleted list from the index first.
+        self._index.refresh()
+        getUtility(IListManager).delete(self._mlist)
+        get_by_list_id = ListManager.get_by_list_id
+        def drop(list_manager, list_id):                    # noqa: E306
+            self._index._list_ids.pop('test@example.com')
+            return get_by_list_id(list_manager, list_id)
+        with patch.object(ListManager, 'get_by_list_id', drop):
+            self.assertIsNone(self._index.get('test@example.com'))
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Test the worker threads of the LMTP server."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        with transaction():
+            create_list('test@example.com')
+        self._loop = asyncio.new_event_loop()
+        self.addCleanup(self._loop.close)
+        self._server = SimpleNamespace(loop=self._loop)
+        self._envelope = SimpleNamespace(content=b"""\
+From: anne@example.com
+To: test@example.com
+Message-ID: <ant>
+
+""", mail_from='anne@example.com', rcpt_tos=['test@example.com'])
+
+    def _handler(self):
+        handler = LMTPHandler()
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_work_is_done_in_worker_threads(self):
+        handler = self._handler()
+        threads = []
+        deliver = handler._deliver
+        def record(envelope):                               # noqa: E306
+            threads.append(threading.current_thread())
+            return deliver(envelope)
+        with patch.object(handler, '_deliver', record):
+            status = self._loop.run_until_complete(
+                handler.handle_DATA(self._server, None, self._envelope))
+        self.assertEqual(status, '250 Ok')
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.current_thread())
+        get_queue_messages('in', expected_count=1)
+
+    def test_recipients(self):
+        handler = self._handler()
+        envelope = SimpleNamespace(rcpt_tos=[], rcpt_options=[])
+        for address in ('test@example.com', 'notalist@example.com'):
+            status = self._loop.run_until_complete(handler.handle_RCPT(
+                self._server, None, envelope, address, []))
+            self.assertEqual(status[:3], (
+                '250' if address == 'test@example.com' else '550'))
+        self.assertEqual(envelope.rcpt_tos, ['test@example.com'])
+
+    @configuration('mta', lmtp_duplicate_window='0s')
+    def test_duplicates_accepted(self):
+        # Checking for duplicates can be disabled.
+        handler = self._handler()
+        for i in range(2):
+            status = self._loop.run_until_complete(
+                handler.handle_DATA(self._server, None, self._envelope))
+            self.assertEqual(status, '250 Ok')
+        get_queue_messages('in', expected_count=2)
+
+    def test_failed_recipient_keeps_others(self):
+        # A recipient which fails only undoes what was recorded for it, not
+        # for the recipients before it.
+        handler = self._handler()
+        with transaction():
+            create_list('other@example.com')
+        self._envelope.rcpt_tos.append('other@example.com')
+        switchboard = config.switchboards['in']
+        enqueue = switchboard.enqueue
+        def fail_other(msg, msgdata):                       # noqa: E306
+            if msgdata['listid'] == 'other.example.com':
+                raise RuntimeError
+            return enqueue(msg, msgdata)
+        with patch.object(switchboard, 'enqueue', fail_other):
+            status = self._loop.run_until_complete(
+                handler.handle_DATA(self._server, None, self._envelope))
+        self.assertEqual(status.split('\r\n')[1][:3], '550')
+        get_queue_messages('in', expected_count=1)
+        # The copy to the list is a duplicate, but not the one to the other
+        # list, whose failed delivery wasn't recorded.
+        status = self._loop.run_until_complete(
+            handler.handle_DATA(self._server, None, self._envelope))
+        self.assertEqual(status, '250 Ok\r\n250 Ok')
+        items = get_queue_messages('in', expected_count=1)
+        self.assertEqual(items[0].msgdata['listid'], 'other.example.com')
+
+    @configuration('mta', lmtp_workers='1', lmtp_backlog='0')
+    def test_busy(self):
+        # When the pool is saturated, the mail server is told to try again.
+        handler = self._handler()
+        event = threading.Event()
+        def deliver(envelope):                              # noqa: E306
+            event.wait()
+            return '250 Ok', None
+        with patch.object(handler, '_deliver', deliver):
+            first = self._loop.create_task(
+                handler.handle_DATA(self._server, None, self._envelope))
+            # Let the first message reach the worker.
+            self._loop.run_until_complete(asyncio.sleep(0))
+            status = self._loop.run_until_complete(
+                handler.handle_DATA(self._server, None, self._envelope))
+            self.assertEqual(status, ERR_451_BUSY)
+            envelope = SimpleNamespace(rcpt_tos=[], rcpt_options=[])
+            status = self._loop.run_until_complete(handler.handle_RCPT(
+                self._server, None, envelope, 'test@example.com', []))
+            self.assertEqual(status, ERR_451_BUSY)
+            self.assertEqual(envelope.rcpt_tos, [])
+            event.set()
+            self.assertEqual(self._loop.run_until_complete(first), '250 Ok')
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Test the refusal of mail while the queues are backed up."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        self._loop = asyncio.new_event_loop()
+        self.addCleanup(self._loop.close)
+
+    def _fill(self, count):
+        # Leave exactly this many messages in the incoming queue.
+        get_queue_messages('in')
+        for i in range(count):
+            config.switchboards['in'].enqueue(mfs("""\
+From: anne@example.com
+Message-ID: <ant{}>
+
+""".format(i)), {})
+
+    def test_disabled(self):
+        self._fill(3)
+        self.assertIsNone(AdmissionControl().check())
+
+    @configuration('mta', lmtp_admission_interval='0s')
+    @configuration('runner.in', high_watermark='3', low_watermark='1')
+    def test_queue_watermarks(self):
+        admission = AdmissionControl()
+        self._fill(2)
+        self.assertIsNone(admission.check())
+        self._fill(3)
+        self.assertEqual(admission.check(), ERR_451_BUSY)
+        # Mail is refused until the queue drains to the low watermark.
+        self._fill(2)
+        self.assertEqual(admission.check(), ERR_451_BUSY)
+        self._fill(1)
+        self.assertIsNone(admission.check())
+        self._fill(2)
+        self.assertIsNone(admission.check())
+        get_queue_messages('in')
+
+    @configuration('mta', lmtp_admission_interval='1h')
+    @configuration('runner.in', high_watermark='1')
+    def test_interval(self):
+        # The queues are only measured once per interval.
+        admission = AdmissionControl()
+        self.assertIsNone(admission.check())
+        self._fill(1)
+        self.assertIsNone(admission.check())
+        get_queue_messages('in')
+
+    @configuration('mta', lmtp_admission_interval='0s',
+                   lmtp_min_free_space='10', lmtp_resume_free_space='20')
+    def test_free_space(self):
+        admission = AdmissionControl()
+        for megabytes, status in ((15, None), (5, ERR_452), (15, ERR_452),
+                                  (20, None), (15, None)):
+            stat = SimpleNamespace(f_bavail=megabytes, f_frsize=1024 * 1024)
+            with patch('mailman.runners.lmtp.os.statvfs', return_value=stat):
+                self.assertEqual(admission.check(), status, megabytes)
+
+    @configuration('runner.in', high_watermark='1')
+    def test_recipients_refused(self):
+        with transaction():
+            create_list('test@example.com')
+        self._fill(1)
+        handler = LMTPHandler()
+        self.addCleanup(handler.close)
+        server = SimpleNamespace(loop=self._loop)
+        envelope = SimpleNamespace(rcpt_tos=[], rcpt_options=[])
+        status = self._loop.run_until_complete(handler.handle_RCPT(
+            server, None, envelope, 'test@example.com', []))
+        self.assertEqual(status, ERR_451_BUSY)
+        self.assertEqual(envelope.rcpt_tos, [])
+        get_queue_messages('in')
+
+
+class TestDMARCPrefetch(unittest.TestCase):
+    """Test the prefetching of DMARC policies."""
+
+    layer = ConfigLayer
+
+    def setUp(self):
+        with transaction():
+            self._mlist = create_list('test@example.com')
+            self._mlist.dmarc_mitigate_action = DMARCMitigateAction.reject
+        self._loop = asyncio.new_event_loop()
+        self.addCleanup(self._loop.close)
+
+    def _handle(self, *rcpt_tos):
+        handler = LMTPHandler()
+        self.addCleanup(handler.close)
+        server = SimpleNamespace(loop=self._loop)
+        envelope = SimpleNamespace(content=b"""\
+From: Anne Person <anne@example.biz>
+To: test@example.com
+Message-ID: <ant>
+
+""", mail_from='anne@example.biz', rcpt_tos=rcpt_tos)
+        submit = handler._executor.submit
+        self._submit = patch.object(
+            handler._executor, 'submit', wraps=submit).start()
+        self.addCleanup(patch.stopall)
+        with patch('mailman.runners.lmtp._prefetch_policies') as prefetch:
+            status = self._loop.run_until_complete(
+                handler.handle_DATA(server, None, envelope))
+            # Wait for the prefetching in the handler's workers.
+            handler.close()
+        self.assertEqual(status, '250 Ok')
+        return prefetch
+
+    @configuration('dmarc', policy_cache_shared='yes')
+    def test_prefetch(self):
+        prefetch = self._handle('test@example.com')
+        prefetch.assert_called_once_with('anne@example.biz')
+        # The prefetching takes a turn in the handler's workers.
+        functions = [call[0][0] for call in self._submit.call_args_list]
+        self.assertIn(prefetch, functions)
+
+    def test_no_prefetch_without_shared_cache(self):
+        prefetch = self._handle('test@example.com')
+        self.assertFalse(prefetch.called)
+
+    @configuration('dmarc', policy_cache_shared='yes', policy_prefetch='no')
+    def test_prefetch_disabled(self):
+        prefetch = self._handle('test@example.com')
+        self.assertFalse(prefetch.called)
+
+    @configuration('dmarc', policy_cache_shared='yes')
+    def test_no_prefetch_without_mitigation(self):
+        with transaction():
+            self._mlist.dmarc_mitigate_action = (
+                DMARCMitigateAction.no_mitigation)
+        prefetch = self._handle('test@example.com')
+        self.assertFalse(prefetch.called)
+
+    @configuration('dmarc', policy_cache_shared='yes')
+    def test_no_prefetch_for_subaddress(self):
+        prefetch = self._handle('test-request@example.com')
+        self.assertFalse(prefetch.called)
@@ -44,6 +44,7 @@ from mailman.runners.digest import DigestRunner
 from mailman.utilities.mailbox import Mailbox
 from public import public
 from requests import request
+from sqlalchemy import event as sa_event
 from unittest import mock
 from urllib.error import HTTPError
 from zope import event
@@ -272,7 +273,8 @@ def wait_for_webservice(hostname=None, port=None):
 
 
 @public
-def call_api(url, data=None, method=None, username=None, password=None):
+def call_api(url, data=None, method=None, username=None, password=None,
+             headers=None):
     """'Call a URL with a given HTTP method and return the resulting object.
 
     The object will have been JSON decoded.
@@ -289,6 +291,8 @@ def call_api(url, data=None, method=None, username=None, password=None):
     :param password: The HTTP Basic Auth password.  None means use the value
         from the configuration.
     :type username: str
+    :param headers: Additional HTTP request headers.
+    :type headers: dict
     :return: A 2-tuple containing the JSON decoded content (if there is any,
         else None) and the response object.
     :rtype: 2-tuple of (dict, response)
@@ -303,7 +307,8 @@ def call_api(url, data=None, method=None, username=None, password=None):
     basic_auth = (
         (config.webservice.admin_user if username is None else username),
         (config.webservice.admin_pass if password is None else password))
-    response = request(method, url, data=data, auth=basic_auth)
+    response = request(
+        method, url, data=data, auth=basic_auth, headers=headers)
     # For backward compatibility with existing doctests, turn non-2xx response
     # codes into a urllib.error exceptions.
     if response.status_code // 100 != 2:
@@ -331,6 +336,23 @@ def event_subscribers(*subscribers):
         event.subscribers[:] = old_subscribers
 
 
+@public
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed against the database.
+
+    This yields a list to which every executed statement is appended.
+    """
+    statements = []
+    def counter(connection, cursor, statement, *args):        # noqa: E306
+        statements.append(statement)
+    sa_event.listen(config.db.engine, 'before_cursor_execute', counter)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(config.db.engine, 'before_cursor_execute', counter)
+
+
 @public
 class configuration:
     """A decorator/context manager for temporarily setting configurations."""
@@ -435,6 +457,7 @@ def reset_the_world():
     * Clear out the database
     * Remove all residual queue and digest files
     * Clear the message store
+    * Clear the in-memory caches
     * Reset the global style manager
 
     This should be as thorough a reset of the system as necessary to keep
@@ -465,15 +488,24 @@ def reset_the_world():
     # Remove all the cache subdirectories, recursively.
     for dirname in os.listdir(config.CACHE_DIR):
         shutil.rmtree(os.path.join(config.CACHE_DIR, dirname))
+    # Clear the in-memory caches.
+    from mailman.model.cache import memory_cache
+    from mailman.model.template import template_cache
+    from mailman.rest.cache import response_cache
+    from mailman.rules.dmarc import policy_cache
+    memory_cache.clear()
+    template_cache.clear()
+    response_cache.clear()
+    policy_cache.clear()
     # Reset the global style manager.
     getUtility(IStyleManager).populate()
     # Remove all dynamic header-match rules.
     config.chains['header-match'].flush()
-    # Remove cached organizational domain suffix file.
-    from mailman.rules.dmarc import LOCAL_FILE_NAME
-    suffix_file = os.path.join(config.VAR_DIR, LOCAL_FILE_NAME)
-    with suppress(FileNotFoundError):
-        os.remove(suffix_file)
+    # Remove cached organizational domain suffix files.
+    from mailman.rules.dmarc import COMPILED_FILE_NAME, LOCAL_FILE_NAME
+    for filename in (LOCAL_FILE_NAME, COMPILED_FILE_NAME):
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(config.VAR_DIR, filename))
 
 
 @public
@@ -86,6 +86,10 @@ def list_members_to_unicode(value):
     return [bytes_to_str(item) for item in value]
 
 
+def topics_to_unicode(value):
+    return [list_members_to_unicode(topic) for topic in value]
+
+
 def filter_action_mapping(value):
     # The filter_action enum values have changed.  In Mailman 2.1 the order
     # was 'Discard', 'Reject', 'Forward to List Owner', 'Preserve'.  In MM3
@@ -161,6 +165,7 @@ enabled: yes
 # Attributes in Mailman 2 which have a different type in Mailman 3.  Some
 # types (e.g. bools) are autodetected from their SA column types.
 TYPES = dict(
+    accept_these_nonmembers=list_members_to_unicode,
     autorespond_owner=ResponseAction,
     autorespond_postings=ResponseAction,
     autorespond_requests=ResponseAction,
@@ -169,18 +174,22 @@ TYPES = dict(
     bounce_you_are_disabled_warnings_interval=seconds_to_delta,
     default_nonmember_action=nonmember_action_mapping,
     digest_volume_frequency=DigestFrequency,
+    discard_these_nonmembers=list_members_to_unicode,
     filter_action=filter_action_mapping,
     filter_extensions=list_members_to_unicode,
     filter_types=list_members_to_unicode,
     forward_unrecognized_bounces_to=UnrecognizedBounceDisposition,
+    hold_these_nonmembers=list_members_to_unicode,
     moderator_password=str_to_bytes,
     newsgroup_moderation=NewsgroupModeration,
     pass_extensions=list_members_to_unicode,
     pass_types=list_members_to_unicode,
     personalize=Personalization,
     preferred_language=check_language_code,
+    reject_these_nonmembers=list_members_to_unicode,
     reply_goes_to_list=ReplyToMunging,
     subscription_policy=SubscriptionPolicy,
+    topics=topics_to_unicode,
     )
 
 
@@ -0,0 +1,181 @@
+# Copyright (C) 2017 by the Free Software Foundation, Inc.
+#
+# This file is part of GNU Mailman.
+#
+# GNU Mailman is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# GNU Mailman is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# GNU Mailman.  If not, see <http://www.gnu.org/licenses/>.
+"""A size-bounded in-memory cache."""
+
+import threading
+
+from collections import OrderedDict
+from lazr.config import as_timedelta
+from mailman.config import config
+from mailman.utilities.datetime import now
+from public import public
+
+
+@public
+class LRUCache:
+    """A thread-safe, size-bounded LRU cache.
+
+    Keys are tuples whose first item names the group of entries the value
+    depends on.  Invalidating a group drops all of its entries.  Entries also
+    expire after a while, which bounds how long changes made by other
+    processes go unseen.
+
+    The maximum size and the lifetime of the entries are read from the
+    configuration each time, so that they can be changed at run time.  A
+    size of 0 disables the cache.
+
+    Each group also has a generation, which changes whenever the group is
+    invalidated, so that a value calculated from data read before an
+    invalidation isn't cached after it.
+    """
+
+    def __init__(self, section, size='cache_size', lifetime='cache_lifetime'):
+        """Create the cache.
+
+        :param section: The configuration section with the settings.
+        :type section: str
+        :param size: The name of the maximum size variable.
+        :type size: str
+        :param lifetime: The name of the entry lifetime variable.
+        :type lifetime: str
+        """
+        self._section = section
+        self._size = size
+        self._lifetime = lifetime
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # {group -> generation}, and the number of times the whole cache was
+        # cleared.
+        self._generations = {}
+        self._clears = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_size(self):
+        return int(getattr(getattr(config, self._section), self._size))
+
+    def _generation(self, group):
+        return self._clears, self._generations.get(group, 0)
+
+    def generation(self, group):
+        """Return the current generation of a group.
+
+        :param group: The group, i.e. the first item of the keys.
+        :type group: str
+        :return: An opaque value, which changes whenever the group is
+            invalidated or the cache is cleared.
+        """
+        with self._lock:
+            return self._generation(group)
+
+    def get(self, key):
+        """Return the cached value.
+
+        :param key: The cache key, starting with the group.
+        :type key: tuple
+        :return: The value, or None if there is no unexpired entry for the
+            key.
+        """
+        if self.max_size == 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expiration=None, generation=None):
+        """Cache a value.
+
+        :param key: The cache key, starting with the group.
+        :type key: tuple
+        :param value: The value to cache.  This may not be None.
+        :param expiration: When the entry expires.  The entry never outlives
+            the configured lifetime, which is also the default.
+        :type expiration: datetime
+        :param generation: The generation of the key's group, as returned by
+            `generation()`, from before the value was calculated.  The value
+            isn't cached if the group has been invalidated since.
+        """
+        assert value is not None, key
+        size = self.max_size
+        if size == 0:
+            return
+        lifetime = getattr(getattr(config, self._section), self._lifetime)
+        latest = now() + as_timedelta(lifetime)
+        if expiration is None or expiration > latest:
+            expiration = latest
+        with self._lock:
+            if (generation is not None and
+                    generation != self._generation(key[0])):
+                return
+            self._entries[key] = (expiration, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Drop the cached value, if there is one.
+
+        :param key: The cache key, starting with the group.
+        :type key: tuple
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def fetch(self, key, function):
+        """Return the cached value, calculating it if necessary.
+
+        :param key: The cache key, starting with the group.
+        :type key: tuple
+        :param function: Called with no arguments to produce the value on a
+            cache miss.  None results are not cached.
+        :return: The value.
+        """
+        value = self.get(key)
+        if value is None:
+            generation = self.generation(key[0])
+            value = function()
+            if value is not None:
+                self.put(key, value, generation=generation)
+        return value
+
+    def invalidate(self, group):
+        """Drop all the cached entries in a group.
+
+        :param group: The group, i.e. the first item of the keys.
+        :type group: str
+        """
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for key in [key for key in self._entries if key[0] == group]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all the cached entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._clears += 1
+            self.hits = self.misses = 0
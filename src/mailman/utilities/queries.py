@@ -45,3 +45,13 @@ class QuerySequence(Sequence):
         if self._query is None:
             return []
         yield from self._query
+
+    def yield_per(self, count):
+        """Iterate over the results, fetching `count` rows at a time.
+
+        Unlike plain iteration, this does not load the entire result set
+        into memory before returning the first row.
+        """
+        if self._query is None:
+            return
+        yield from self._query.yield_per(count)
@@ -185,3 +185,16 @@ def wrap(text, column=70, honor_leading_ws=True):
             wrapped_paragraphs.append(wrapper.fill(paragraph_text))
             add_paragraph_break = True
     return EMPTYSTRING.join(wrapped_paragraphs)
+
+
+@public
+def trigrams(text):
+    """Return the set of three character substrings of a string.
+
+    :param text: The string.
+    :type text: str
+    :return: The trigrams of the text, which is empty when the text is
+        shorter than three characters.
+    :rtype: set of str
+    """
+    return {text[i:i+3] for i in range(len(text) - 2)}